@@ -0,0 +1,3 @@
+-- Analyses by content, to requeue the analyses of the contents matching new keywords
+CREATE INDEX IF NOT EXISTS document_analyses_content
+  ON idetect_analyses (content_id);
@@ -0,0 +1,6 @@
+-- Triage priority for analyses, scored from the GKG themes and counts
+ALTER TABLE idetect_analyses ADD COLUMN IF NOT EXISTS priority NUMERIC;
+ALTER TABLE idetect_analysis_histories ADD COLUMN IF NOT EXISTS priority NUMERIC;
+
+CREATE INDEX IF NOT EXISTS document_analyses_status_priority
+  ON idetect_analyses (status, priority DESC NULLS LAST, updated);
@@ -0,0 +1,3 @@
+-- Time and calls per fact extraction stage, stored when IDETECT_PROFILE_STORE is set
+ALTER TABLE idetect_analyses ADD COLUMN IF NOT EXISTS processing_profile VARCHAR;
+ALTER TABLE idetect_analysis_histories ADD COLUMN IF NOT EXISTS processing_profile VARCHAR;
@@ -0,0 +1,53 @@
+"""
+Compile the pickled classifier models into compact artifacts for run_classifier.py,
+checking that the compiled models reproduce the predictions of the originals.
+"""
+import logging
+import os
+import sys
+
+from sqlalchemy import create_engine
+
+from idetect.model import db_url, Base, Session, DocumentContent
+from idetect.nlp_models.category import *
+from idetect.nlp_models.relevance import *
+from idetect.nlp_models.base_model import CustomSklLsiModel
+from idetect.nlp_models.compiled import CompiledModel
+from idetect.nlp_models.export import export_model, verify_model, compiled_path
+
+SAMPLE_SIZE = 500
+
+if __name__ == "__main__":
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.root.addHandler(handler)
+
+    engine = create_engine(db_url())
+    Session.configure(bind=engine)
+    Base.metadata.create_all(engine)
+    session = Session()
+    contents = session.query(DocumentContent) \
+        .filter(DocumentContent.content.isnot(None)) \
+        .filter(DocumentContent.content_clean.isnot(None)) \
+        .order_by(DocumentContent.id.desc()) \
+        .limit(SAMPLE_SIZE).all()
+    session.close()
+
+    failed = False
+    for model_class, texts in [(CategoryModel, [c.content for c in contents]),
+                               (RelevanceModel, [c.content_clean for c in contents])]:
+        model = model_class()
+        path = compiled_path(model.model_path)
+        export_model(model.model, path, model.model_hash)
+        mismatches = verify_model(model.model, CompiledModel(path), texts)
+        if mismatches:
+            logger.error("{}: {} of {} predictions differ, removing {}".format(
+                model_class.__name__, len(mismatches), len(texts), path))
+            os.remove(path)
+            failed = True
+        else:
+            logger.info("{}: exported to {}, {} predictions verified".format(
+                model_class.__name__, path, len(texts)))
+    sys.exit(1 if failed else 0)
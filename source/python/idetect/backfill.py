@@ -0,0 +1,191 @@
+'''Method(s) for re-extracting facts from the articles matching new keywords.
+
+Keywords added to idetect_fact_keywords, such as by db/add_eviction_keywords.sql,
+only change the facts of articles extracted afterwards. Rather than
+re-extracting every article, the backfill searches the content_ts full text
+index for the contents that use the new keywords, and requeues their analyses
+for extraction, so the time taken grows with the matches rather than with the
+corpus.
+
+content_ts is built from the cleaned content without stemming and with some
+words removed (see remove_wordcloud_stopwords), so each keyword word is
+searched by the prefix it shares with its Porter stem, after the same
+removals, which also matches its inflections.
+
+Analyses are requeued in chunks, each moved back to CLASSIFIED in one
+transaction with its facts cleared. The extractor workers then process each
+chunk in parallel, oldest updated first. To leave room for live traffic,
+a chunk is only requeued once fewer than max_queue analyses are waiting for
+extraction.
+
+Run the backfill once the extractors have picked up the new keywords, which
+they check for every fact_extractor.KEYWORD_CHECK_INTERVAL seconds.
+'''
+import logging
+import os
+import re
+import time
+
+from nltk.stem import PorterStemmer
+
+from idetect.keyword_screen import IRREGULAR_FORMS
+from idetect.model import Analysis, DocumentContent, FactKeyword, KeywordType, Status, remove_wordcloud_stopwords
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Statuses of the analyses whose extraction has already been done with the old keywords.
+# Edited analyses are left alone so that manual edits are kept.
+EXTRACTED_STATUSES = (Status.EXTRACTED, Status.EXTRACTING_FAILED, Status.GEOTAGGED, Status.GEOTAGGING_FAILED)
+
+# Number of analyses requeued per transaction
+CHUNK_SIZE = 100
+# Number of analyses waiting for extraction above which requeueing waits
+MAX_QUEUE = 200
+# How often the extraction queue is checked while waiting, in seconds
+POLL_SECONDS = 10
+
+TERM_TYPES = (KeywordType.PERSON_TERM, KeywordType.STRUCTURE_TERM)
+UNIT_TYPES = (KeywordType.PERSON_UNIT, KeywordType.STRUCTURE_UNIT)
+# Article keywords only matter for facts reported with this verb, see Interpreter.verb_relevance
+ARTICLE_KEYWORD_VERB = 'affect'
+
+WORD = re.compile(r'[a-z]+')
+
+_stemmer = PorterStemmer()
+
+
+def word_prefixes(word):
+    '''Return the content_ts prefixes matching a word and its inflections'''
+    stem = _stemmer.stem(word)
+    forms = [word]
+    for irregular in IRREGULAR_FORMS:
+        if stem in (_stemmer.stem(f) for f in irregular):
+            forms.extend(irregular)
+    prefixes = set()
+    for form in forms:
+        form = remove_wordcloud_stopwords(form)
+        prefix = os.path.commonprefix([form, _stemmer.stem(form)])
+        if len(prefix) > 0:
+            prefixes.add(prefix)
+    return prefixes
+
+
+def keyword_prefixes(keywords):
+    '''Return the content_ts prefixes matching any word of the keywords, which
+    like the Interpreter's lemma sets match each word of a keyword on its own
+    '''
+    prefixes = set()
+    for keyword in keywords:
+        for word in WORD.findall(keyword.lower()):
+            word_prefix = word_prefixes(word)
+            if len(word_prefix) == 0:
+                logger.warning("Keyword '{}' cannot be searched for in content_ts".format(keyword))
+            prefixes.update(word_prefix)
+    return prefixes
+
+
+def any_prefix(prefixes):
+    return '(' + ' | '.join('{}:*'.format(p) for p in sorted(prefixes)) + ')'
+
+
+def backfill_query(new_keywords, all_keywords):
+    '''Return the to_tsquery text matching the contents whose facts may change with new keywords
+    :params new_keywords: list of new FactKeyword
+    :params all_keywords: list of every FactKeyword, including the new ones
+    :return: String, or None if no content can be affected
+    '''
+    def prefixes(keywords, keyword_types):
+        return keyword_prefixes(k.description for k in keywords if k.keyword_type in keyword_types)
+
+    # Facts are anchored on reporting terms, so new units only matter alongside
+    # a term, and new article keywords alongside the verb they qualify
+    new_terms = prefixes(new_keywords, TERM_TYPES)
+    new_units = prefixes(new_keywords, UNIT_TYPES)
+    new_article_keywords = prefixes(new_keywords, (KeywordType.ARTICLE_KEYWORD,))
+    all_terms = prefixes(all_keywords, TERM_TYPES)
+    clauses = []
+    if new_terms:
+        clauses.append(any_prefix(new_terms))
+    if new_units and all_terms:
+        clauses.append('({} & {})'.format(any_prefix(new_units), any_prefix(all_terms)))
+    if new_article_keywords:
+        clauses.append('({} & {})'.format(any_prefix(new_article_keywords),
+                                          any_prefix(word_prefixes(ARTICLE_KEYWORD_VERB))))
+    if len(clauses) == 0:
+        return None
+    return ' | '.join(clauses)
+
+
+def matching_content_ids(session, query):
+    '''Return the ids of the contents matching a to_tsquery text, found through the content_ts GIN index'''
+    return [content_id for content_id, in session.query(DocumentContent.id)
+            .filter(DocumentContent.content_ts.match(query, postgresql_regconfig='simple_english'))
+            .order_by(DocumentContent.id)]
+
+
+def queue_depth(session):
+    '''Return the number of analyses waiting for extraction'''
+    return session.query(Analysis).filter(Analysis.status == Status.CLASSIFIED).count()
+
+
+def wait_for_queue(session, max_queue, poll_seconds):
+    '''Wait until fewer than max_queue analyses are waiting for extraction'''
+    while True:
+        depth = queue_depth(session)
+        session.commit()  # end the transaction so the next count sees the extractors' progress
+        if depth < max_queue:
+            return
+        logger.info("Backfill waiting: {} analyses queued for extraction".format(depth))
+        time.sleep(poll_seconds)
+
+
+def requeue(session, content_ids):
+    '''Move the extracted analyses of some contents back to CLASSIFIED, clearing their facts
+    :params session: session object
+    :params content_ids: list of DocumentContent ids
+    :return: number of analyses requeued
+    '''
+    analyses = session.query(Analysis) \
+        .filter(Analysis.content_id.in_(content_ids)) \
+        .filter(Analysis.status.in_(EXTRACTED_STATUSES)) \
+        .all()
+    return len(Analysis.create_new_versions(analyses, Status.CLASSIFIED, clear_facts=True))
+
+
+def new_keywords(session, since_id=None, descriptions=None):
+    '''Return the FactKeywords with an id greater than since_id, or with the given descriptions'''
+    query = session.query(FactKeyword)
+    if since_id is not None:
+        query = query.filter(FactKeyword.id > since_id)
+    if descriptions:
+        query = query.filter(FactKeyword.description.in_(descriptions))
+    return query.order_by(FactKeyword.id).all()
+
+
+def backfill(session, keywords, chunk_size=CHUNK_SIZE, max_queue=MAX_QUEUE, poll_seconds=POLL_SECONDS,
+             dry_run=False):
+    '''Requeue for extraction the analyses of the contents whose facts may change with new keywords
+    :params session: session object
+    :params keywords: list of the new FactKeywords
+    :params chunk_size: number of contents requeued per transaction
+    :params max_queue: number of analyses waiting for extraction above which requeueing waits
+    :params poll_seconds: how often the queue is checked while waiting
+    :params dry_run: only count the matching contents
+    :return: number of analyses requeued, or of matching contents for a dry run
+    '''
+    query = backfill_query(keywords, session.query(FactKeyword).all())
+    if query is None:
+        logger.info("Backfill: no content can be affected by {}".format([k.description for k in keywords]))
+        return 0
+    content_ids = matching_content_ids(session, query)
+    logger.info("Backfill: {} contents match {}".format(len(content_ids), query))
+    if dry_run:
+        return len(content_ids)
+    requeued = 0
+    for start in range(0, len(content_ids), chunk_size):
+        wait_for_queue(session, max_queue, poll_seconds)
+        requeued += requeue(session, content_ids[start:start + chunk_size])
+        logger.info("Backfill: requeued {} analyses, {} of {} contents done".format(
+            requeued, min(start + chunk_size, len(content_ids)), len(content_ids)))
+    return requeued
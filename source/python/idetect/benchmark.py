@@ -0,0 +1,315 @@
+'''Benchmark of fact extraction, classification and geotagging lookups.
+
+Every stage runs over the same fixed corpus: the sentences of the fact
+extraction and geotagging tests as articles of their own, followed by
+synthetic articles combining those sentences with other places and numbers,
+drawn from a seeded random generator so that every run of a given size sees
+the same text.
+
+No database or network is used. The Interpreter gets its keywords from
+idetect.load_data.DEFAULT_KEYWORDS, the geotagger stage only looks names up
+in the pycountry indexes, and the classifiers are skipped unless
+export_models.py has compiled them locally. The parse stages time spaCy with
+each profile of idetect.doc_cache.
+
+Each stage runs in a process of its own, so that its peak resident set size,
+which includes loading the models and any setup such as parsing the corpus
+for the Interpreter, is not inflated by the other stages. The results can be saved as a JSON
+baseline and later runs compared against it.
+'''
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+from idetect.doc_cache import FULL, ENTITIES, TAGS, profile_kwargs
+from idetect.load_data import DEFAULT_KEYWORDS
+from idetect.model import Relevance
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Sentences of test_fact_extractor and test_geo_tagging
+FIXTURE_SENTENCES = [
+    "It was early Saturday when a flash flood hit the area and washed away more than 500 houses.",
+    "The election results were announced on Monday.",
+    "2000 people have been evicted from their homes in Bosnia.",
+    "Fighting in Aleppo forced 15,000 families to flee to Turkey on Monday.",
+    "Heavy fighting broke out in Aleppo on Monday.",
+    "More than 2000 people were displaced.",
+    "It was early Saturday when government troops entered the area and forced more than 20000 refugees to flee.",
+    "ordered eviction for 2000 people from their homes in Bosnia.",
+    "ordered forced eviction for 2000 people from their homes in Bosnia.",
+    "2000 people were forcibly evicted from their homes in Bosnia.",
+    "last week 2000 people have been sacked from their homes in Nigeria.",
+    "It was early Saturday when a flash flood hit large parts of London and Middlesex "
+    "and washed away more than 500 houses.",
+    "It was early Saturday when a flash flood hit large parts of Bosnia and washed away more than 500 houses.",
+    "It was early Saturday when a flash flood hit large parts of India and Pakistan "
+    "and washed away more than 500 houses.",
+]
+
+# Places substituted into the synthetic articles: countries, subdivisions,
+# cities and a name the geotagger cannot find
+PLACES = ['Syria', 'Aleppo', 'Homs', 'Bosnia', 'Sarajevo', 'Nigeria', 'Borno', 'Turkey', 'India', 'Pakistan',
+          'Sindh', 'London', 'Middlesex', 'Texas', 'Bavaria', 'Quebec', 'Ontario', 'Bolivia', 'Atlantis']
+PLACE = re.compile(r'\b(?:{})\b'.format('|'.join(PLACES)))
+NUMBER = re.compile(r'\d[\d,]*')
+SENTENCE_END = re.compile(r'[.!?](?:\s|$)')
+
+# Default corpus size
+ARTICLES = 200
+SENTENCES_PER_ARTICLE = 20
+SEED = 0
+BATCH_SIZE = 32
+# Relative change in throughput or peak RSS reported as a regression
+TOLERANCE = 0.1
+BASELINE_PATH = 'benchmark_baseline.json'
+
+CATEGORY_PATH = '/home/idetect/python/idetect/nlp_models/category.npz'
+RELEVANCE_PATH = '/home/idetect/python/idetect/nlp_models/relevance_classifier_svm_10132017.npz'
+
+
+def vary(sentence, rng):
+    '''Replace the places and numbers of a sentence with random ones'''
+    sentence = PLACE.sub(lambda m: rng.choice(PLACES), sentence)
+    return NUMBER.sub(lambda m: str(rng.randint(2, 50000)), sentence)
+
+
+def build_corpus(articles=ARTICLES, sentences=SENTENCES_PER_ARTICLE, seed=SEED):
+    '''Return the benchmark articles: each fixture sentence, then synthetic
+    articles of the given number of sentences up to the given total
+    '''
+    rng = random.Random(seed)
+    corpus = FIXTURE_SENTENCES[:articles]
+    while len(corpus) < articles:
+        corpus.append(" ".join(vary(rng.choice(FIXTURE_SENTENCES), rng) for _ in range(sentences)))
+    return corpus
+
+
+def count_sentences(texts):
+    return sum(len(SENTENCE_END.findall(text)) for text in texts)
+
+
+def place_names(texts):
+    '''Every mention of a place in the texts, in order'''
+    return [name for text in texts for name in PLACE.findall(text)]
+
+
+def peak_rss_mb():
+    '''Peak resident set size of this process, in MB (ru_maxrss is in KB on Linux)'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Each stage is set up with the corpus, outside of the timing, and returns
+# the function to time, or None when it cannot run here. That function
+# returns a dict of counts describing its output.
+
+def parse_stage(profile):
+    '''Return the stage parsing with the spaCy components of a profile from idetect.doc_cache'''
+    def stage(texts):
+        from idetect.fact_extractor import nlp
+
+        def run():
+            docs = list(nlp.pipe(texts, batch_size=BATCH_SIZE, n_threads=1, **profile_kwargs(profile)))
+            return {'tokens': sum(len(doc) for doc in docs)}
+        return run
+    return stage
+
+
+def extract_stage(texts):
+    '''Time the Interpreter alone, over articles parsed beforehand'''
+    from idetect.fact_extractor import nlp
+    from idetect.interpreter import Interpreter
+    interpreter = Interpreter(None, nlp, keywords=DEFAULT_KEYWORDS)
+    docs = interpreter.parse_articles(texts, BATCH_SIZE, 1)
+
+    def run():
+        reports = [interpreter.process_parsed(text, doc) for text, doc in zip(texts, docs)]
+        return {'reports': sum(len(r) for r in reports)}
+    return run
+
+
+def screen_stage(texts):
+    from idetect.keyword_screen import KeywordScreen, SCREEN_KEYWORD_TYPES
+    keyword_screen = KeywordScreen([k for t in SCREEN_KEYWORD_TYPES for k in DEFAULT_KEYWORDS[t]])
+
+    def run():
+        return {'matches': sum(1 for text in texts if keyword_screen.matches(text))}
+    return run
+
+
+def classify_stage(texts):
+    '''Time the category and relevance models compiled by export_models.py, including their parses'''
+    if not (os.path.isfile(CATEGORY_PATH) and os.path.isfile(RELEVANCE_PATH)):
+        return None
+    from idetect.nlp_models.compiled import CompiledCategoryModel, CompiledRelevanceModel
+    models = [CompiledCategoryModel(CATEGORY_PATH), CompiledRelevanceModel(RELEVANCE_PATH)]
+
+    def run():
+        predictions = []
+        for start in range(0, len(texts), BATCH_SIZE):
+            batch = texts[start:start + BATCH_SIZE]
+            predictions.extend(zip(*[model.predict_batch(batch) for model in models]))
+        return {'relevant': sum(1 for _, relevance in predictions if relevance == Relevance.DISPLACEMENT)}
+    return run
+
+
+def geotag_stage(texts):
+    '''Time the pycountry lookups of the place names in the corpus, including building the indexes'''
+    from idetect.geotagger import city_subdivision_country
+    names = place_names(texts)
+
+    def run():
+        return {'lookups': len(names),
+                'matched': sum(1 for name in names if city_subdivision_country(name) is not None)}
+    return run
+
+
+def geotag_scan_stage(texts):
+    '''Time the linear scans replaced by the geotag indexes, as a reference for
+    the geotag stage. Only the distinct place names are scanned, which already
+    takes much longer than looking up every mention.
+    '''
+    from idetect.tests.gazetteer_reference import linear_country_name, linear_subdivision_country_code
+    names = sorted(set(place_names(texts)))
+
+    def run():
+        return {'lookups': len(names),
+                'matched': sum(1 for name in names if linear_country_name(name)[0] is not None
+                               or linear_subdivision_country_code(name)[0] is not None)}
+    return run
+
+
+STAGES = OrderedDict([
+    ('parse', parse_stage(FULL)),
+    ('parse_entities', parse_stage(ENTITIES)),
+    ('parse_tags', parse_stage(TAGS)),
+    ('extract', extract_stage),
+    ('screen', screen_stage),
+    ('classify', classify_stage),
+    ('geotag', geotag_stage),
+    ('geotag_scan', geotag_scan_stage),
+])
+
+
+def measure(stage, texts):
+    '''Run a stage over the texts in this process and return its measurements'''
+    run = STAGES[stage](texts)
+    if run is None:
+        return {'skipped': True}
+    start = time.perf_counter()
+    counts = run()
+    # guard against a clock too coarse for the smallest corpora
+    seconds = max(time.perf_counter() - start, 1e-6)
+    sentences = count_sentences(texts)
+    result = {
+        'seconds': round(seconds, 3),
+        'articles': len(texts),
+        'sentences': sentences,
+        'articles_per_second': round(len(texts) / seconds, 2),
+        'sentences_per_second': round(sentences / seconds, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    result.update(counts)
+    if 'lookups' in counts:
+        result['microseconds_per_lookup'] = round(1e6 * seconds / max(counts['lookups'], 1), 2)
+    return result
+
+
+def run_stage(stage, articles=ARTICLES, sentences=SENTENCES_PER_ARTICLE, seed=SEED):
+    '''Measure a stage in a new process, without the shared Doc store so that every text is parsed'''
+    env = dict(os.environ)
+    env.pop('IDETECT_DOC_STORE', None)
+    env.pop('IDETECT_PROFILE', None)
+    with tempfile.NamedTemporaryFile(suffix='.json') as output:
+        subprocess.check_call(
+            [sys.executable, '-m', 'idetect.benchmark', stage, output.name,
+             '--articles', str(articles), '--sentences', str(sentences), '--seed', str(seed)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env)
+        with open(output.name) as f:
+            return json.load(f)
+
+
+def run_benchmark(stages=None, articles=ARTICLES, sentences=SENTENCES_PER_ARTICLE, seed=SEED):
+    '''Measure each stage in turn
+    :return: dict with the corpus parameters and the measurements of each stage
+    '''
+    results = OrderedDict()
+    for stage in stages or STAGES:
+        logger.info("Benchmarking {}".format(stage))
+        results[stage] = run_stage(stage, articles, sentences, seed)
+    return {'corpus': {'articles': articles, 'sentences': sentences, 'seed': seed},
+            'stages': results}
+
+
+def load_baseline(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def compare(baseline, results, tolerance=TOLERANCE):
+    '''Compare measurements with a baseline of the same corpus
+    :return: list of (stage, measure, baseline value, value, relative change, regressed)
+    '''
+    if baseline['corpus'] != results['corpus']:
+        raise ValueError("Baseline corpus {} differs from {}".format(baseline['corpus'], results['corpus']))
+    rows = []
+    for stage, result in results['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before is None or before.get('skipped') or result.get('skipped'):
+            continue
+        for measure, higher_is_better in [('articles_per_second', True),
+                                          ('sentences_per_second', True),
+                                          ('peak_rss_mb', False)]:
+            change = (result[measure] - before[measure]) / before[measure]
+            regressed = -change > tolerance if higher_is_better else change > tolerance
+            rows.append((stage, measure, before[measure], result[measure], change, regressed))
+    return rows
+
+
+def report(results):
+    lines = ['{:<10} {:>9} {:>12} {:>13} {:>9}'.format('stage', 'seconds', 'articles/s', 'sentences/s', 'RSS MB')]
+    for stage, result in results['stages'].items():
+        if result.get('skipped'):
+            lines.append('{:<10} skipped'.format(stage))
+        else:
+            lines.append('{:<10} {:>9.3f} {:>12.2f} {:>13.2f} {:>9.1f}'.format(
+                stage, result['seconds'], result['articles_per_second'],
+                result['sentences_per_second'], result['peak_rss_mb']))
+    return '\n'.join(lines)
+
+
+def report_comparison(rows):
+    return '\n'.join('{:<10} {:<21} {:>10.2f} -> {:>10.2f} {:>+7.1%}{}'.format(
+        stage, measure, before, after, change, '  REGRESSION' if regressed else '')
+        for stage, measure, before, after, change, regressed in rows)
+
+
+if __name__ == "__main__":
+    # Entry point of the process measuring one stage, started by run_stage
+    parser = argparse.ArgumentParser()
+    parser.add_argument('stage', choices=list(STAGES))
+    parser.add_argument('output')
+    parser.add_argument('--articles', type=int, default=ARTICLES)
+    parser.add_argument('--sentences', type=int, default=SENTENCES_PER_ARTICLE)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+    result = measure(args.stage, build_corpus(args.articles, args.sentences, args.seed))
+    with open(args.output, 'w') as f:
+        json.dump(result, f)
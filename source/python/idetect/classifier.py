@@ -1,21 +1,125 @@
+import json
+from datetime import timedelta
+
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import object_session
+from sqlalchemy.sql import func
+
+from idetect.doc_cache import content_hash
+from idetect.model import CachedPrediction, Relevance
 
 
 '''Method(s) for running classifier on extracted content.
 '''
 
-def classify(analysis, category_model, relevance_model):
+# Recorded in Analysis.analyzer to show which stage decided the relevance
+KEYWORD_SCREEN_ANALYZER = 'keyword_screen'
+RELEVANCE_MODEL_ANALYZER = 'relevance_model'
+
+def predict_cached(session, model, texts):
+    """
+    Predict texts with a model, reusing predictions stored for the same content
+    and model file and storing the new ones.
+
+    :params session: SQLAlchemy session
+    :params model: A DownloadableModel with a predict_batch method
+    :params texts: A list of Strings
+    :return: A list of predictions, one per text
+    """
+    model_hash = getattr(model, 'model_hash', None)
+    if model_hash is None:
+        return model.predict_batch(texts)
+    keys = [content_hash(t or '') for t in texts]
+    cached = {
+        p.content_hash: json.loads(p.prediction)
+        for p in session.query(CachedPrediction)
+            .filter(CachedPrediction.model_hash == model_hash)
+            .filter(CachedPrediction.content_hash.in_(set(keys)))
+    }
+    if len(cached) > 0:
+        session.query(CachedPrediction) \
+            .filter(CachedPrediction.model_hash == model_hash) \
+            .filter(CachedPrediction.content_hash.in_(cached.keys())) \
+            .update({CachedPrediction.last_used: func.now()}, synchronize_session=False)
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached:
+            missing.setdefault(key, text)
+    if len(missing) > 0:
+        predictions = model.predict_batch(list(missing.values()))
+        new = dict(zip(missing.keys(), predictions))
+        session.execute(
+            insert(CachedPrediction.__table__)
+                .values([{'content_hash': k, 'model_hash': model_hash, 'prediction': json.dumps(p)}
+                         for k, p in new.items()])
+                .on_conflict_do_nothing()
+        )
+        cached.update(new)
+    return [cached[k] for k in keys]
+
+
+def evict_predictions(session, max_age=timedelta(days=90), max_rows=1000000):
+    """
+    Delete cached predictions that have not been used for max_age, then the
+    least recently used ones beyond max_rows. Predictions used at the same
+    time as the most recent max_rows are kept, so slightly more may remain.
+
+    :params session: SQLAlchemy session
+    :return: number of deleted predictions
+    """
+    deleted = session.query(CachedPrediction) \
+        .filter(CachedPrediction.last_used < func.now() - max_age) \
+        .delete(synchronize_session=False)
+    cutoff = session.query(CachedPrediction.last_used) \
+        .order_by(CachedPrediction.last_used.desc()) \
+        .offset(max_rows - 1).limit(1).scalar()
+    if cutoff is not None:
+        deleted += session.query(CachedPrediction) \
+            .filter(CachedPrediction.last_used < cutoff) \
+            .delete(synchronize_session=False)
+    session.commit()
+    return deleted
+
+
+def classify(analysis, category_model, relevance_model, keyword_screen=None):
     """
     Tag and categorize analysis using its content.
-    
+    If a KeywordScreen is given, content without any of its keywords is
+    marked not relevant without running the relevance model.
+
     :params analysis: An Analysis instance
     :return: None
     """
-    session = object_session(analysis)
-    content = analysis.content.content
-    category = category_model.predict(content)
-    content_clean = analysis.content.content_clean
-    relevance = relevance_model.predict(content_clean)
-    analysis.category = category
-    analysis.relevance = relevance
+    classify_batch([analysis], category_model, relevance_model, keyword_screen)
+
+
+def classify_batch(analyses, category_model, relevance_model, keyword_screen=None):
+    """
+    Tag and categorize several analyses at once, running each model a single time
+    over all of their contents and saving the results in one transaction.
+    If a KeywordScreen is given, contents without any of its keywords are
+    marked not relevant without running the relevance model.
+
+    :params analyses: A list of Analysis instances from the same session
+    :return: None
+    """
+    if len(analyses) == 0:
+        return
+    session = object_session(analyses[0])
+    categories = predict_cached(session, category_model, [a.content.content for a in analyses])
+    if keyword_screen is None:
+        screened = analyses
+    else:
+        screened = [a for a in analyses if keyword_screen.screen(a.content.content_clean)]
+    relevances = predict_cached(session, relevance_model, [a.content.content_clean for a in screened]) \
+        if len(screened) > 0 else []
+    relevances = dict(zip((a.gkg_id for a in screened), relevances))
+    for analysis, category in zip(analyses, categories):
+        analysis.category = category
+        if analysis.gkg_id in relevances:
+            analysis.relevance = relevances[analysis.gkg_id]
+            analysis.analyzer = RELEVANCE_MODEL_ANALYZER
+        else:
+            analysis.relevance = Relevance.NOT_DISPLACEMENT
+            analysis.analyzer = KEYWORD_SCREEN_ANALYZER
     session.commit()
@@ -0,0 +1,93 @@
+'''Ancestor and distance queries over the dependency trees of a parsed document.
+
+spaCy answers Token.is_ancestor_of and Token.ancestors by walking up the
+heads, and Token.subtree by walking down, so the Interpreter's location
+and distance helpers were quadratic or worse in the sentence length. The
+index records each token's parent, depth and position in a depth first
+traversal once per document. Ancestor tests and subtree sizes then take
+constant time, and lowest common ancestors take logarithmic time.
+'''
+
+
+class DependencyIndex(object):
+    """Depth first traversal and ancestor tables of a Doc's dependency trees.
+
+    Every sentence is a separate tree whose root is its own head. Tokens are
+    referred to by their index in the Doc.
+
+    Attributes:
+        parent (list): index of each token's head, or its own index for roots.
+        depth (list): number of edges between each token and its root.
+        tin (list): position of each token in the depth first traversal.
+        tout (list): largest traversal position within each token's subtree.
+        up (list): up[k][i] is the index of the 2**k-th ancestor of token i,
+            or of its root when the tree is not that deep.
+    """
+
+    def __init__(self, doc):
+        n = len(doc)
+        self.parent = [t.head.i for t in doc]
+        self.depth = [0] * n
+        self.tin = [0] * n
+        self.tout = [0] * n
+        children = [[] for _ in range(n)]
+        roots = []
+        for i, p in enumerate(self.parent):
+            if p == i:
+                roots.append(i)
+            else:
+                children[p].append(i)
+        counter = 0
+        for root in roots:
+            self.tin[root] = counter
+            counter += 1
+            stack = [(root, iter(children[root]))]
+            while stack:
+                node, remaining = stack[-1]
+                child = next(remaining, None)
+                if child is None:
+                    self.tout[node] = counter - 1
+                    stack.pop()
+                else:
+                    self.depth[child] = self.depth[node] + 1
+                    self.tin[child] = counter
+                    counter += 1
+                    stack.append((child, iter(children[child])))
+        self.up = [self.parent]
+        for _ in range(1, max(self.depth, default=0).bit_length()):
+            previous = self.up[-1]
+            self.up.append([previous[previous[i]] for i in range(n)])
+
+    def is_ancestor(self, a, b):
+        """Whether token a is a strict ancestor of token b"""
+        return a != b and self.tin[a] <= self.tin[b] <= self.tout[a]
+
+    def is_ancestor_or_self(self, a, b):
+        return self.tin[a] <= self.tin[b] <= self.tout[a]
+
+    def subtree_size(self, i):
+        """Number of tokens in token i's subtree, including itself"""
+        return self.tout[i] - self.tin[i] + 1
+
+    def lca(self, a, b):
+        """Index of the lowest common ancestor of tokens a and b, which may be
+        one of them, or None if they are in different trees
+        """
+        if self.is_ancestor_or_self(a, b):
+            return a
+        if self.is_ancestor_or_self(b, a):
+            return b
+        for level in reversed(self.up):
+            if not self.is_ancestor_or_self(level[a], b):
+                a = level[a]
+        a = self.parent[a]
+        return a if self.is_ancestor_or_self(a, b) else None
+
+    def distance(self, a, b):
+        """Number of edges on the path between tokens a and b, or None if
+        they are in different trees
+        """
+        common = self.lca(a, b)
+        if common is None:
+            return None
+        return self.depth[a] + self.depth[b] - 2 * self.depth[common]
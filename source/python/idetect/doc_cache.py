@@ -0,0 +1,128 @@
+'''Process-wide cache of parsed spaCy documents.
+
+The relevance transformers all parse the same article text, and so do the
+steps of fact extraction. Keeping the most recent parses lets each article
+be parsed once per process and tokenization, and shared by every consumer
+using it (see idetect.spacy_pipeline).
+
+Consumers that need only some of the pipeline components ask for a profile,
+and the components they do not need are skipped at call time. A cached parse
+is reused by any profile whose components it already covers.
+
+With a DocStore, full parses are also written to disk and read back by
+later processes, which deserialize them instead of parsing again.
+'''
+import hashlib
+from collections import OrderedDict
+
+TAGGER = 'tagger'
+PARSER = 'parser'
+ENTITY = 'entity'
+
+# Pipeline components each consumer needs. spaCy's parser and entity
+# recognizer use the tagger's output as features, so it is always kept.
+FULL = frozenset((TAGGER, PARSER, ENTITY))  # Interpreter, PhraseProcessor: dependencies, sentences and entities
+ENTITIES = frozenset((TAGGER, ENTITY))  # LocationProcessor: named entities only
+TAGS = frozenset((TAGGER,))  # POSProcessor and lemma lookups: tags and lemmas only
+
+
+def content_hash(text):
+    '''Return a hex digest identifying a text'''
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def profile_kwargs(profile):
+    '''Return the keyword arguments that make a spaCy 1.x pipeline run only the components in profile'''
+    return {'tag': TAGGER in profile, 'parse': PARSER in profile, 'entity': ENTITY in profile}
+
+
+class DocCache(object):
+    """Bounded LRU cache of spaCy Docs keyed by the hash of their text.
+
+    Attributes:
+        nlp (spacy Language): the pipeline used to parse texts on a miss.
+        max_size (int): maximum number of Docs kept; should be larger than
+            the batches passed to pipe so a batch survives until every
+            consumer has seen it.
+        store (DocStore): optional on-disk store of full parses, consulted
+            before parsing.
+    """
+
+    def __init__(self, nlp, max_size=256, store=None):
+        self.nlp = nlp
+        self.max_size = max_size
+        self.store = store
+        self.docs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, profile=FULL):
+        """Return the cached Doc for key if it was parsed with at least the components in profile"""
+        cached = self.docs.get(key)
+        if cached is None or not cached[1] >= profile:
+            return None
+        self.docs.move_to_end(key)
+        self.hits += 1
+        return cached[0]
+
+    def put(self, key, doc, profile=FULL):
+        self.docs[key] = (doc, profile)
+        self.docs.move_to_end(key)
+        while len(self.docs) > self.max_size:
+            self.docs.popitem(last=False)
+
+    def clear(self):
+        self.docs.clear()
+
+    def load(self, key):
+        """Return the full parse for key from the store, or None"""
+        if self.store is None:
+            return None
+        data = self.store.get(key)
+        if data is None:
+            return None
+        from spacy.tokens import Doc
+        doc = Doc(self.nlp.vocab).from_bytes(data)
+        self.put(key, doc, FULL)
+        return doc
+
+    def save(self, key, doc, profile):
+        """Write a full parse to the store"""
+        if self.store is not None and profile == FULL:
+            self.store.put(key, doc.to_bytes())
+
+    def __call__(self, text, profile=FULL):
+        """Return the parsed Doc for text, parsing it only if it is not cached"""
+        key = content_hash(text)
+        doc = self.get(key, profile)
+        if doc is None:
+            doc = self.load(key)
+        if doc is None:
+            self.misses += 1
+            doc = self.nlp(text, **profile_kwargs(profile))
+            self.put(key, doc, profile)
+            self.save(key, doc, profile)
+        return doc
+
+    def pipe(self, texts, profile=FULL, **kwargs):
+        """Return a list of parsed Docs for texts, parsing the uncached ones
+        together with nlp.pipe. Extra keyword arguments are passed to nlp.pipe.
+        """
+        texts = list(texts)
+        keys = [content_hash(t) for t in texts]
+        docs = [self.get(k, profile) for k in keys]
+        missing = OrderedDict()
+        for i, (key, text, doc) in enumerate(zip(keys, texts, docs)):
+            if doc is None:
+                doc = docs[i] = self.load(key)
+            if doc is None:
+                missing.setdefault(key, text)
+        if len(missing) > 0:
+            self.misses += len(missing)
+            kwargs.update(profile_kwargs(profile))
+            for key, doc in zip(missing.keys(), self.nlp.pipe(list(missing.values()), **kwargs)):
+                self.put(key, doc, profile)
+                self.save(key, doc, profile)
+                missing[key] = doc
+            docs = [missing[k] if d is None else d for k, d in zip(keys, docs)]
+        return docs
@@ -0,0 +1,160 @@
+'''On-disk store of serialized spaCy documents.
+
+Classification, fact extraction and reprocessing of the same article each
+happen in a different process, often long after one another, so the
+in-memory DocCache cannot share their parses. The store keeps the bytes of
+fully parsed Docs in files named by the hash of their text, under a
+directory per spaCy model version, so that a stage that finds an article
+there deserializes it instead of parsing it again.
+
+Several model versions can share the store, such as during a rolling
+deploy, so the directory of another version is only removed once no
+process has used it for the store's maximum age.
+
+The store is optional: set IDETECT_DOC_STORE to a directory to enable it.
+'''
+import hashlib
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Defaults for the size and age limits, overridden by
+# IDETECT_DOC_STORE_MB and IDETECT_DOC_STORE_DAYS
+MAX_MEGABYTES = 2048
+MAX_DAYS = 30
+# How often the limits are enforced, in Docs stored
+EVICT_EVERY = 1000
+
+
+def model_version(nlp, tokenizer=''):
+    '''Return a short identifier of a spaCy pipeline and tokenizer, so that
+    parses made by another spaCy version, model or tokenizer are never deserialized'''
+    from spacy import about
+    meta = getattr(nlp, 'meta', None) or {}
+    description = '{} {} {}'.format(about.__version__, getattr(nlp, 'path', ''), meta.get('version', ''))
+    if tokenizer:
+        description += ' ' + tokenizer
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()[:12]
+
+
+class DocStore(object):
+    """Directory of serialized Docs keyed by content hash.
+
+    Attributes:
+        path (str): directory holding one subdirectory per model version.
+        version (str): model version whose Docs are read and written.
+        max_bytes (int): total size the store is trimmed to.
+        max_age (float): seconds since last use after which a Doc is removed.
+    """
+
+    def __init__(self, path, version, max_bytes=MAX_MEGABYTES << 20, max_age=MAX_DAYS * 86400):
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.mark_used()
+
+    @classmethod
+    def from_environment(cls, version):
+        '''Return the store configured by the environment, or None if it is not enabled'''
+        path = os.environ.get('IDETECT_DOC_STORE')
+        if not path:
+            return None
+        return cls(path, version,
+                   max_bytes=int(os.environ.get('IDETECT_DOC_STORE_MB', MAX_MEGABYTES)) << 20,
+                   max_age=float(os.environ.get('IDETECT_DOC_STORE_DAYS', MAX_DAYS)) * 86400)
+
+    def version_path(self):
+        return os.path.join(self.path, self.version)
+
+    def mark_used(self):
+        """Record that this version is in use, so that the eviction of other versions keeps its Docs"""
+        try:
+            os.utime(self.version_path())
+        except OSError:
+            pass
+
+    def file_path(self, key):
+        return os.path.join(self.version_path(), key[:2], '{}.bin'.format(key))
+
+    def get(self, key):
+        """Return the stored bytes for key, or None"""
+        path = self.file_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            # Record the use, so eviction removes the least recently used Docs first
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store bytes for key, replacing the file atomically so readers never see a partial Doc"""
+        path = self.file_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.puts += 1
+        if self.puts % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Remove the Docs of other model versions unused for longer than max_age,
+        this version's Docs unused for longer than max_age, then the least
+        recently used Docs until the store fits max_bytes
+        """
+        if not os.path.isdir(self.path):
+            return
+        self.mark_used()
+        cutoff = time.time() - self.max_age
+        for name in os.listdir(self.path):
+            other = os.path.join(self.path, name)
+            try:
+                retired = name != self.version and os.path.isdir(other) and os.stat(other).st_mtime < cutoff
+            except FileNotFoundError:
+                continue
+            if retired:
+                shutil.rmtree(other, ignore_errors=True)
+        files = []
+        total = 0
+        removed = 0
+        for directory, _, names in os.walk(self.version_path()):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                        continue
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        if removed > 0:
+            logger.info("Doc store: removed {} Docs, {:.1f} MB remain".format(removed, total / (1 << 20)))
@@ -3,17 +3,50 @@
 How to ensure has access to pre-loaded models?
 '''
 import json
+import time
 
-import spacy
 from itertools import groupby
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import object_session
 from sqlalchemy.exc import IntegrityError
 
 from idetect.interpreter import Interpreter
-from idetect.model import Fact, Location, Country
+from idetect.location_cache import location_cache
+from idetect.model import Fact, Location, Country, analysis_fact, fact_location, keyword_version
+from idetect import profiling
+from idetect.profiling import profiled
+from idetect.spacy_pipeline import get_extraction_nlp, get_extraction_doc_cache
 
-nlp = spacy.load("en_default")
-print("Loaded Spacy English Language NLP Models.")
+nlp = get_extraction_nlp()
+# Parses shared by the Interpreters, tokenized with the custom cases
+doc_cache = get_extraction_doc_cache()
+
+# How often, in seconds, the keywords are checked for changes
+KEYWORD_CHECK_INTERVAL = 60
+# Profile name of committing the facts, which flushes them to the database
+COMMIT = 'save_facts.commit'
+_interpreter = None
+_keywords_checked = None
+
+
+def get_interpreter(session):
+    '''Return the Interpreter of this process, recreating it only when the
+    keywords in the database have changed since it was created.
+    :params session: session object
+    :return: instance of Interpreter
+    '''
+    global _interpreter, _keywords_checked
+    now = time.monotonic()
+    if _interpreter is None:
+        _interpreter = Interpreter(session, nlp, doc_cache)
+    elif now - _keywords_checked > KEYWORD_CHECK_INTERVAL:
+        if keyword_version(session) != _interpreter.keyword_version:
+            _interpreter = Interpreter(session, nlp, doc_cache)
+    else:
+        return _interpreter
+    _keywords_checked = now
+    return _interpreter
 
 
 def extract_facts(analysis):
@@ -22,33 +55,150 @@ def extract_facts(analysis):
     :return: None
     '''
     session = object_session(analysis)
-    interpreter = Interpreter(session, nlp)
+    interpreter = get_interpreter(session)
     content = analysis.content.content_clean # Use the cleaned content field
-    facts = interpreter.process_article_new(content)
-    if len(facts) > 0:
-        save_facts(analysis, facts, session)
+    with profiling.collect() as profile:
+        facts = interpreter.process_article_new(content)
+        if len(facts) > 0:
+            save_facts(analysis, facts, session)
+    record_profile(analysis, profile)
+
+
+def extract_facts_batch(analyses, batch_size=32, n_threads=2):
+    '''Extract facts for several instances of Analysis, parsing their contents together
+    :params analyses: list of instances of Analysis from the same session
+    :params batch_size: number of contents spaCy parses per batch
+    :params n_threads: number of threads spaCy parses with
+    :return: None
+    '''
+    if len(analyses) == 0:
+        return
+    session = object_session(analyses[0])
+    interpreter = get_interpreter(session)
+    contents = [analysis.content.content_clean for analysis in analyses]  # Use the cleaned content field
+    with profiling.collect() as batch_profile:
+        docs = interpreter.parse_articles(contents, batch_size, n_threads)
+    extracted = []
+    for analysis, content, doc in zip(analyses, contents, docs):
+        with profiling.collect() as profile:
+            facts = interpreter.process_parsed(content, doc)
+        extracted.append((analysis, facts, profile))
+    # Add the new names of the whole batch in one sorted insert, so that
+    # concurrent extractors lock the names they share in the same order
+    with profiling.collect() as locations_profile:
+        locations = save_locations([name for _, facts, _ in extracted for f in facts for name in f.locations],
+                                   session)
+    for analysis, facts, profile in extracted:
+        if len(facts) > 0:
+            with profiling.collect() as save_profile:
+                add_facts(analysis, facts, locations, session)
+            profile.merge(save_profile)
+    # Commit the whole batch at once, so that if any article fails none of
+    # their facts are kept and the batch can be retried without duplicates
+    with profiling.collect() as commit_profile:
+        with profiling.timed(COMMIT):
+            session.commit()
+    cache_locations(locations)
+    for analysis, facts, profile in extracted:
+        # Each article's share of parsing, saving locations and committing for the batch together
+        for shared in (batch_profile, locations_profile, commit_profile):
+            profile.merge(shared, 1 / len(analyses))
+        record_profile(analysis, profile)
+
+
+def record_profile(analysis, profile):
+    '''Keep the profile of an article on its Analysis if profiles are stored
+    :params analysis: instance of Analysis
+    :params profile: the Profile of extracting its facts
+    :return: None
+    '''
+    if profiling.STORE:
+        analysis.processing_profile = profile.to_json()
+    profiling.article_done()
 
 
 def save_facts(analysis, facts, session):
-    '''Loop through extracted facts and save them to database
+    '''Save extracted facts and their locations to database in one transaction
     :params article: instance of Article
     :params facts: list of extracted facts
     :params session: session object corresponding to the article
     :return: None
     '''
-    for f in facts:
-        fact = Fact(unit=f.reporting_unit, term=f.reporting_term,
-                    excerpt_start=f.sentence_start, excerpt_end=f.sentence_end,
-                    specific_reported_figure=f.quantity[0],
-                    vague_reported_figure=f.quantity[1],
-                    tag_locations=json.dumps(f.tag_spans))
-        session.add(fact)
-        analysis.facts.append(fact)
-
-        # Process the locations and add new ones to the locations table
-        locations = { process_location(location, session) for location in f.locations }
-        fact.locations.extend(locations)
+    locations = save_locations([name for f in facts for name in f.locations], session)
+    add_facts(analysis, facts, locations, session)
+    with profiling.timed(COMMIT):
         session.commit()
+    cache_locations(locations)
+
+
+@profiled()
+def add_facts(analysis, facts, locations, session):
+    '''Add extracted facts and their links to saved locations to database, without committing
+    :params article: instance of Article
+    :params facts: list of extracted facts
+    :params locations: dict from location name to location id, from save_locations
+    :params session: session object corresponding to the article
+    :return: None
+    '''
+    # Allocate the ids up front so the facts and their links are each one multi-row insert
+    fact_ids = [row[0] for row in session.execute(
+        select([func.nextval('idetect_facts_id_seq')]).select_from(func.generate_series(1, len(facts))))]
+    fact_rows = []
+    link_rows = []
+    for fact_id, f in zip(fact_ids, facts):
+        fact_rows.append(dict(id=fact_id, unit=f.reporting_unit, term=f.reporting_term,
+                              excerpt_start=f.sentence_start, excerpt_end=f.sentence_end,
+                              specific_reported_figure=f.quantity[0],
+                              vague_reported_figure=f.quantity[1],
+                              tag_locations=json.dumps(f.tag_spans)))
+        for location_id in {locations[name] for name in f.locations}:
+            link_rows.append(dict(fact=fact_id, location=location_id))
+    session.execute(Fact.__table__.insert().values(fact_rows))
+    if len(link_rows) > 0:
+        session.execute(fact_location.insert().values(link_rows))
+    session.execute(analysis_fact.insert().values([dict(analysis=analysis.gkg_id, fact=fact_id)
+                                                   for fact_id in fact_ids]))
+
+
+def cache_locations(locations):
+    '''Cache the locations of committed facts. Only called after committing,
+    so a rolled back location is never reused'''
+    for name, location_id in locations.items():
+        location_cache.put(name, location_id)
+
+
+@profiled()
+def save_locations(location_names, session):
+    '''Add any new location names to database, without committing.
+    Names in the location cache are not queried.
+    :params location_names: list of location names, Strings
+    :params session: session object
+    :return: dict from location name to location id
+    '''
+    locations = {}
+    uncached = []
+    # Sorted so that concurrent extractors lock new names in the same order
+    for name in sorted(set(location_names)):
+        location_id = location_cache.get(name)
+        if location_id is None:
+            uncached.append(name)
+        else:
+            locations[name] = location_id
+    location_cache.hits += len(locations)
+    if len(uncached) == 0:
+        return locations
+    location_cache.misses += len(uncached)
+    inserted = session.execute(
+        insert(Location.__table__).values([dict(location_name=name) for name in uncached])
+            .on_conflict_do_nothing(index_elements=['location_name'])
+            .returning(Location.id, Location.location_name))
+    locations.update((name, location_id) for location_id, name in inserted)
+    existing = [name for name in uncached if name not in locations]
+    if len(existing) > 0:
+        locations.update((name, location_id) for location_id, name in
+                         session.query(Location.id, Location.location_name)
+                         .filter(Location.location_name.in_(existing)))
+    return locations
 
 
 def process_location(location_name, session):
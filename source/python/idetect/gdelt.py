@@ -0,0 +1,116 @@
+'''Method(s) for parsing the delimited fields of GDELT GKG records.
+'''
+from idetect.model import LocationType
+
+# GDELT identifies countries with FIPS 10-4 codes, the rest of idetect uses ISO 3166 alpha-3
+FIPS_TO_ISO3 = {
+    'AA': 'ABW', 'AC': 'ATG', 'AE': 'ARE', 'AF': 'AFG', 'AG': 'DZA', 'AJ': 'AZE', 'AL': 'ALB', 'AM': 'ARM',
+    'AN': 'AND', 'AO': 'AGO', 'AQ': 'ASM', 'AR': 'ARG', 'AS': 'AUS', 'AU': 'AUT', 'AV': 'AIA', 'AY': 'ATA',
+    'BA': 'BHR', 'BB': 'BRB', 'BC': 'BWA', 'BD': 'BMU', 'BE': 'BEL', 'BF': 'BHS', 'BG': 'BGD', 'BH': 'BLZ',
+    'BK': 'BIH', 'BL': 'BOL', 'BM': 'MMR', 'BN': 'BEN', 'BO': 'BLR', 'BP': 'SLB', 'BR': 'BRA', 'BT': 'BTN',
+    'BU': 'BGR', 'BV': 'BVT', 'BX': 'BRN', 'BY': 'BDI', 'CA': 'CAN', 'CB': 'KHM', 'CD': 'TCD', 'CE': 'LKA',
+    'CF': 'COG', 'CG': 'COD', 'CH': 'CHN', 'CI': 'CHL', 'CJ': 'CYM', 'CK': 'CCK', 'CM': 'CMR', 'CN': 'COM',
+    'CO': 'COL', 'CQ': 'MNP', 'CS': 'CRI', 'CT': 'CAF', 'CU': 'CUB', 'CV': 'CPV', 'CW': 'COK', 'CY': 'CYP',
+    'DA': 'DNK', 'DJ': 'DJI', 'DO': 'DMA', 'DR': 'DOM', 'EC': 'ECU', 'EG': 'EGY', 'EI': 'IRL', 'EK': 'GNQ',
+    'EN': 'EST', 'ER': 'ERI', 'ES': 'SLV', 'ET': 'ETH', 'EZ': 'CZE', 'FG': 'GUF', 'FI': 'FIN', 'FJ': 'FJI',
+    'FK': 'FLK', 'FM': 'FSM', 'FO': 'FRO', 'FP': 'PYF', 'FR': 'FRA', 'FS': 'ATF', 'GA': 'GMB', 'GB': 'GAB',
+    'GG': 'GEO', 'GH': 'GHA', 'GI': 'GIB', 'GJ': 'GRD', 'GK': 'GGY', 'GL': 'GRL', 'GM': 'DEU', 'GP': 'GLP',
+    'GQ': 'GUM', 'GR': 'GRC', 'GT': 'GTM', 'GV': 'GIN', 'GY': 'GUY', 'GZ': 'PSE', 'HA': 'HTI', 'HK': 'HKG',
+    'HM': 'HMD', 'HO': 'HND', 'HR': 'HRV', 'HU': 'HUN', 'IC': 'ISL', 'ID': 'IDN', 'IM': 'IMN', 'IN': 'IND',
+    'IO': 'IOT', 'IR': 'IRN', 'IS': 'ISR', 'IT': 'ITA', 'IV': 'CIV', 'IZ': 'IRQ', 'JA': 'JPN', 'JE': 'JEY',
+    'JM': 'JAM', 'JO': 'JOR', 'KE': 'KEN', 'KG': 'KGZ', 'KN': 'PRK', 'KR': 'KIR', 'KS': 'KOR', 'KT': 'CXR',
+    'KU': 'KWT', 'KV': 'XKS', 'KZ': 'KAZ', 'LA': 'LAO', 'LE': 'LBN', 'LG': 'LVA', 'LH': 'LTU', 'LI': 'LBR',
+    'LO': 'SVK', 'LS': 'LIE', 'LT': 'LSO', 'LU': 'LUX', 'LY': 'LBY', 'MA': 'MDG', 'MB': 'MTQ', 'MC': 'MAC',
+    'MD': 'MDA', 'MF': 'MYT', 'MG': 'MNG', 'MH': 'MSR', 'MI': 'MWI', 'MJ': 'MNE', 'MK': 'MKD', 'ML': 'MLI',
+    'MN': 'MCO', 'MO': 'MAR', 'MP': 'MUS', 'MR': 'MRT', 'MT': 'MLT', 'MU': 'OMN', 'MV': 'MDV', 'MX': 'MEX',
+    'MY': 'MYS', 'MZ': 'MOZ', 'NC': 'NCL', 'NE': 'NIU', 'NF': 'NFK', 'NG': 'NER', 'NH': 'VUT', 'NI': 'NGA',
+    'NL': 'NLD', 'NN': 'SXM', 'NO': 'NOR', 'NP': 'NPL', 'NR': 'NRU', 'NS': 'SUR', 'NU': 'NIC', 'NZ': 'NZL',
+    'OD': 'SSD', 'PA': 'PRY', 'PC': 'PCN', 'PE': 'PER', 'PK': 'PAK', 'PL': 'POL', 'PM': 'PAN', 'PO': 'PRT',
+    'PP': 'PNG', 'PS': 'PLW', 'PU': 'GNB', 'QA': 'QAT', 'RE': 'REU', 'RI': 'SRB', 'RM': 'MHL', 'RN': 'MAF',
+    'RO': 'ROU', 'RP': 'PHL', 'RQ': 'PRI', 'RS': 'RUS', 'RW': 'RWA', 'SA': 'SAU', 'SB': 'SPM', 'SC': 'KNA',
+    'SE': 'SYC', 'SF': 'ZAF', 'SG': 'SEN', 'SH': 'SHN', 'SI': 'SVN', 'SL': 'SLE', 'SM': 'SMR', 'SN': 'SGP',
+    'SO': 'SOM', 'SP': 'ESP', 'ST': 'LCA', 'SU': 'SDN', 'SV': 'SJM', 'SW': 'SWE', 'SX': 'SGS', 'SY': 'SYR',
+    'SZ': 'CHE', 'TB': 'BLM', 'TD': 'TTO', 'TH': 'THA', 'TI': 'TJK', 'TK': 'TCA', 'TL': 'TKL', 'TN': 'TON',
+    'TO': 'TGO', 'TP': 'STP', 'TS': 'TUN', 'TT': 'TLS', 'TU': 'TUR', 'TV': 'TUV', 'TW': 'TWN', 'TX': 'TKM',
+    'TZ': 'TZA', 'UC': 'CUW', 'UG': 'UGA', 'UK': 'GBR', 'UP': 'UKR', 'US': 'USA', 'UV': 'BFA', 'UY': 'URY',
+    'UZ': 'UZB', 'VC': 'VCT', 'VE': 'VEN', 'VI': 'VGB', 'VM': 'VNM', 'VQ': 'VIR', 'VT': 'VAT', 'WA': 'NAM',
+    'WE': 'PSE', 'WF': 'WLF', 'WI': 'ESH', 'WS': 'WSM', 'WZ': 'SWZ', 'YM': 'YEM', 'ZA': 'ZMB', 'ZI': 'ZWE',
+}
+
+# GDELT location types, see the GKG codebook
+GKG_LOCATION_TYPES = {
+    '1': LocationType.COUNTRY,
+    '2': LocationType.SUBDIVISION,  # US state
+    '3': LocationType.CITY,  # US city
+    '4': LocationType.CITY,  # world city
+    '5': LocationType.SUBDIVISION,  # world state / ADM1
+}
+
+
+def parse_themes(v2_themes):
+    '''Split a GKG themes field into a list of theme codes.
+    Accepts both the V1 format ("THEME;THEME;") and the V2 enhanced
+    format, where each theme carries a character offset ("THEME,123;").
+    :params v2_themes: the raw themes field, a String or None
+    :return: list of theme codes in order of appearance
+    '''
+    if not v2_themes:
+        return []
+    themes = []
+    for block in v2_themes.split(';'):
+        theme = block.split(',')[0].strip()
+        if theme:
+            themes.append(theme)
+    return themes
+
+
+def parse_counts(v2_counts):
+    '''Split a GKG counts field into (count_type, number, object_type) tuples.
+    Each block looks like "COUNTTYPE#NUMBER#OBJECTTYPE#LOCATIONTYPE#...".
+    Blocks that cannot be parsed are skipped.
+    :params v2_counts: the raw counts field, a String or None
+    :return: list of tuples (count_type, number, object_type)
+    '''
+    if not v2_counts:
+        return []
+    counts = []
+    for block in v2_counts.split(';'):
+        fields = block.split('#')
+        if len(fields) < 3 or not fields[0]:
+            continue
+        try:
+            number = int(fields[1])
+        except ValueError:
+            continue
+        counts.append((fields[0].strip(), number, fields[2].strip().lower()))
+    return counts
+
+
+def parse_locations(locations):
+    '''Split a GKG locations field into geocoded places.
+    Accepts both the V1 format ("TYPE#FULLNAME#COUNTRY#ADM1#LAT#LONG#FEATUREID")
+    and the V2 enhanced format, which adds ADM2 before LAT and an offset at the end.
+    Places without coordinates or with an unknown country are skipped.
+    :params locations: the raw locations field, a String or None
+    :return: list of dicts with place_name, country_code, type and coordinates,
+        in the same format as geotagger.get_geo_info
+    '''
+    if not locations:
+        return []
+    places = []
+    for block in locations.split(';'):
+        fields = block.split('#')
+        if len(fields) == 7:
+            loc_type, full_name, fips, _, lat, lon, _ = fields
+        elif len(fields) == 9:
+            loc_type, full_name, fips, _, _, lat, lon, _, _ = fields
+        else:
+            continue
+        country_code = FIPS_TO_ISO3.get(fips)
+        place_name = full_name.split(',')[0].strip()
+        if not (country_code and place_name and lat and lon):
+            continue
+        places.append({'place_name': place_name, 'country_code': country_code,
+                       'type': GKG_LOCATION_TYPES.get(loc_type, LocationType.UNKNOWN),
+                       'coordinates': '{},{}'.format(lat, lon)})
+    return places
@@ -4,8 +4,10 @@ import unicodedata
 
 import pycountry
 from itertools import groupby
-from idetect.model import LocationType, Fact
+from idetect.model import LocationType, Fact, GkgLocation
+from idetect.gdelt import parse_locations
 from idetect.geo_external import nominatim_coordinates, GeotagException
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import object_session
 
 
@@ -30,13 +32,14 @@ def process_fact(fact, analysis, session):
     :params session: object session for Analysis
     :return: None
     '''
+    # Compare the country column rather than loading each location's Country
     for location in fact.locations:
-        if location.country == '' or location.country is None:
+        if location.country_iso3 == '' or location.country_iso3 is None:
             process_location(location, session)
 
     country_locations = fact.locations
-    country_locations.sort(key=lambda x: x.country.iso3)
-    country_groups = [(key, [loc for loc in group]) for key, group in groupby(country_locations, lambda x: x.country.iso3)]
+    country_locations.sort(key=lambda x: x.country_iso3)
+    country_groups = [(key, [loc for loc in group]) for key, group in groupby(country_locations, lambda x: x.country_iso3)]
     # If all locations from same country
     # Update the Fact iso3 field, then done
     if len(country_groups) == 1:
@@ -67,18 +70,22 @@ def process_location(location, session):
     :params session: session object
     :return: None
     '''
-    loc_info = get_geo_info(location.location_name)
+    loc_info = get_geo_info(location.location_name, session)
     location.location_type = loc_info['type']
     location.country_iso3 = loc_info['country_code']
     location.latlong = loc_info['coordinates']
     session.commit()
 
 
-def get_geo_info(place_name):
+def get_geo_info(place_name, session=None):
     '''This exposes the internal geo tagging functionality.
     In fact extraction, the geo tagging solution can be internal or external.
+    Names of countries and subdivisions are matched exactly first; other names
+    are looked up among the locations geocoded by GDELT, when a session is
+    given, before falling back to Nominatim.
 
     :params place_name: A place name to get info for
+    :params session: session object, or None to skip the GDELT locations
     :return: Dict of geo_info for each place name:
         place_name: original place name provided as param
         country_code: 3-letter ISO country code
@@ -93,21 +100,76 @@ def get_geo_info(place_name):
         country_info['coordinates'] = coords['coordinates']
         country_info['flag'] = coords['flag']
     else:
-        country_info = nominatim_coordinates(place_name)
+        if session is not None:
+            country_info = get_gkg_geo_info(place_name, session)
+        if country_info is None:
+            country_info = nominatim_coordinates(place_name)
 
     return country_info
 
 
+def get_gkg_geo_info(place_name, session):
+    '''Look up a place name among the locations already geocoded by GDELT.
+
+    :params place_name: A place name to get info for
+    :params session: session object
+    :return: Dict of geo_info in the same format as get_geo_info,
+        or None if GDELT has not (unambiguously) geocoded the place
+    '''
+    gkg_location = session.query(GkgLocation) \
+        .filter(GkgLocation.location_name == place_name) \
+        .filter(GkgLocation.ambiguous.isnot(True)) \
+        .one_or_none()
+    if gkg_location is None:
+        return None
+    return {'place_name': place_name, 'country_code': gkg_location.country_iso3,
+            'type': gkg_location.location_type, 'coordinates': gkg_location.latlong,
+            'flag': 'gdelt'}
+
+
+def seed_gkg_locations(session, gkgs):
+    '''Store the locations geocoded by GDELT for the given records, so that
+    geotagging can resolve them without an external call.
+    Names seen in more than one country are marked ambiguous and not used.
+    Does not commit; the caller's transaction covers the inserts.
+
+    :params session: session object
+    :params gkgs: list of Gkg instances
+    :return: None
+    '''
+    places = {}
+    ambiguous = set()
+    for gkg in gkgs:
+        for place in parse_locations(gkg.locations):
+            seen = places.setdefault(place['place_name'], place)
+            if seen['country_code'] != place['country_code']:
+                ambiguous.add(place['place_name'])
+    if len(places) == 0:
+        return
+    stmt = insert(GkgLocation).values([
+        {'location_name': name, 'location_type': place['type'], 'country_iso3': place['country_code'],
+         'latlong': place['coordinates'], 'ambiguous': name in ambiguous}
+        for name, place in places.items()])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GkgLocation.location_name],
+        set_={'ambiguous': True},
+        where=GkgLocation.country_iso3 != stmt.excluded.country_iso3)
+    session.execute(stmt)
+
+
 def strip_accents(s):
     '''Strip out accents from text'''
     return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
 
 
+def normalize_name(name):
+    '''Normalize a place name for comparison by stripping accents and case'''
+    return strip_accents(name).lower()
+
+
 def compare_strings(s1, s2):
     '''Compare two strings by first stripping out accents'''
-    s1_clean = strip_accents(s1).lower()
-    s2_clean = strip_accents(s2).lower()
-    return s1_clean == s2_clean
+    return normalize_name(s1) == normalize_name(s2)
 
 
 def strip_words(place_name):
@@ -122,37 +184,59 @@ def strip_words(place_name):
     return place_name.strip().title()
 
 
+_country_index = None
+_subdivision_index = None
+
+
+def country_index():
+    '''Return a dict from country name, common name or official name to
+    (alpha_3, name), built on first use. Where several countries share a
+    name, the first one in pycountry order is kept.
+    '''
+    global _country_index
+    if _country_index is None:
+        index = {}
+        for country in pycountry.countries:
+            index.setdefault(country.name, (country.alpha_3, country.name))
+            # In some cases the country also has a common name
+            if hasattr(country, 'common_name'):
+                index.setdefault(country.common_name, (country.alpha_3, country.common_name))
+            # In some cases the country also has an official name
+            if hasattr(country, 'official_name'):
+                index.setdefault(country.official_name, (country.alpha_3, country.name))
+        _country_index = index
+    return _country_index
+
+
+def subdivision_index():
+    '''Return a dict from normalized subdivision name to the (alpha_3, name)
+    of its country, built on first use. Where several subdivisions share a
+    name, the first one in pycountry order is kept.
+    '''
+    global _subdivision_index
+    if _subdivision_index is None:
+        index = {}
+        for sub_division in pycountry.subdivisions:
+            key = normalize_name(sub_division.name)
+            if key not in index:
+                index[key] = (sub_division.country.alpha_3, sub_division.country.name)
+        _subdivision_index = index
+    return _subdivision_index
+
+
 def subdivision_country_code(place_name):
     '''Try and extract the country code by looking
     at country subdivisions i.e. States, Provinces etc.
     return the country code if found
     '''
-    subdivisions = (s for s in list(pycountry.subdivisions))
-    for sub_division in subdivisions:
-        if compare_strings(sub_division.name, place_name):
-            return sub_division.country.alpha_3, sub_division.country.name
-            break
-    return None, None
+    return subdivision_index().get(normalize_name(place_name), (None, None))
 
 
 def match_country_name(place_name):
     '''Try and match the country name directly
     return the country code if found
     '''
-    countries = (c for c in list(pycountry.countries))
-    for country in countries:  # Loop through all countries
-        if country.name == place_name:  # Look directly at country name
-            return country.alpha_3, country.name
-            break
-        # In some cases the country also has a common name
-        elif hasattr(country, 'common_name') and country.common_name == place_name:
-            return country.alpha_3, country.common_name
-            break
-        # In some cases the country also has an official name
-        elif hasattr(country, 'official_name') and country.official_name == place_name:
-            return country.alpha_3, country.name
-            break
-    return None, None
+    return country_index().get(place_name, (None, None))
 
 
 def city_subdivision_country(place_name):
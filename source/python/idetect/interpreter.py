@@ -1,16 +1,41 @@
+import copy
 import re
 import string
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 import parsedatetime
 from spacy.tokens import Token, Span
-from spacy.symbols import ORTH, LEMMA, POS
 from textacy.extract import pos_regex_matches
 from textacy.spacy_utils import get_main_verbs_of_sent, get_objects_of_verb, get_subjects_of_verb
 
-from idetect.model import FactUnit, FactTerm, KeywordType, FactKeyword
+from idetect.dependency_index import DependencyIndex
+from idetect.doc_cache import FULL, ENTITIES, TAGS, profile_kwargs
+from idetect.model import FactUnit, FactTerm, KeywordType, FactKeyword, keyword_version
+from idetect.profiling import profiled
+from idetect.spacy_pipeline import load_custom_tokenizer_cases
 
 
+# Lemmas besides the reporting terms that verb_relevance can anchor a report on,
+# as a verb or as the object of one
+VERB_TRIGGER_LEMMAS = frozenset(('leave', 'render', 'become', 'affect', 'fear', 'assume', 'claim', 'eviction'))
+
+# Articles longer than this many characters are parsed and processed in
+# sentence-aligned chunks of at most this size, so memory stays bounded
+CHUNK_SIZE = 100000
+# Where a chunk may end: after a sentence's final punctuation, or at a blank line
+SENTENCE_BREAK = re.compile(r'[.!?]["\')\]]*\s+|\n\s*\n')
+# The verb whose reports depend on the article_relevance of the whole article
+ARTICLE_RELEVANCE_VERB = 'affect'
+
+# One parsedatetime Calendar per process; building one loads its locale tables
+calendar = parsedatetime.Calendar()
+# Number of (date string, publication date) resolutions remembered
+DATE_CACHE_SIZE = 10000
+
+
+@profiled()
 def get_absolute_date(relative_date_string, publication_date=None):
     """
     Turn relative dates into absolute datetimes.
@@ -29,9 +54,19 @@ def get_absolute_date(relative_date_string, publication_date=None):
             the publication_date
         - None, if parse is not successful
     """
+    # parsedatetime lower cases its input, so case does not change the result
+    date_string = relative_date_string.strip().lower()
+    if publication_date is None:
+        # Resolved relative to the current time, so not cached
+        return resolve_date(date_string, publication_date)
+    return cached_resolve_date(date_string, publication_date)
 
-    cal = parsedatetime.Calendar()
-    parsed_result = cal.nlp(relative_date_string, publication_date)
+
+def resolve_date(relative_date_string, publication_date=None):
+    """
+    Resolve a normalized date string as get_absolute_date does.
+    """
+    parsed_result = calendar.nlp(relative_date_string, publication_date)
     if parsed_result is not None:
         # Parse is successful
         parsed_absolute_date = parsed_result[0][0]
@@ -72,50 +107,135 @@ def get_absolute_date(relative_date_string, publication_date=None):
         return None
 
 
-def tokenizer_add_hyphened_numbers(nlp, pre, post):
-    for p1, p2 in [(pre, post), (pre.capitalize(), post), (pre.capitalize(), post.capitalize())]:
-        nlp.tokenizer.add_special_case(u'{}-{}'.format(p1, p2),
-                                       [{
-                                           ORTH: u'{}-{}'.format(p1, p2),
-                                           LEMMA: u'{}'.format(pre, post),
-                                           POS: u'NUM'
-                                       }])
+cached_resolve_date = lru_cache(maxsize=DATE_CACHE_SIZE)(resolve_date)
 
 
-def load_custom_tokenizer_cases(nlp):
-    for pre in ['twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']:
-        for post in ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine']:
-            tokenizer_add_hyphened_numbers(nlp, pre, post)
+def keyword_lemmas(nlp, keywords):
+    return frozenset(t.lemma_ for t in nlp(" ".join(keywords), **profile_kwargs(TAGS)))
 
 
 def load_keywords(nlp, session, keyword_type):
     keywords = [t.description for t in session.query(
         FactKeyword).filter_by(keyword_type=keyword_type).all()]
-    return [t.lemma_ for t in nlp(" ".join(keywords))]
+    return keyword_lemmas(nlp, keywords)
 
 
 class Interpreter(object):
+    """Extracts facts from articles.
+    The keyword lemma tables are loaded when the Interpreter is created, so it
+    is meant to be kept for as long as keyword_version stays the same.
+    Keywords can also be given as a dict from KeywordType to descriptions, in
+    which case no database is needed and keyword_version is None.
+    """
 
-    def __init__(self, session, nlp):
+    def __init__(self, session, nlp, doc_cache=None, keywords=None):
         self.nlp = nlp
-        self.person_term_lemmas = load_keywords(
-            self.nlp, session, KeywordType.PERSON_TERM)
-        self.structure_term_lemmas = load_keywords(
-            self.nlp, session, KeywordType.STRUCTURE_TERM)
-        self.joint_term_lemmas = list(
-            set(self.structure_term_lemmas) & set(self.person_term_lemmas))
-        self.person_unit_lemmas = load_keywords(
-            self.nlp, session, KeywordType.PERSON_UNIT)
-        self.structure_unit_lemmas = load_keywords(
-            self.nlp, session, KeywordType.STRUCTURE_UNIT)
-        self.household_lemmas = [t.lemma_ for t in self.nlp(
-            " ".join(["families", "households"]))]
-        self.reporting_term_lemmas = self.person_term_lemmas + self.structure_term_lemmas
-        self.reporting_unit_lemmas = self.person_unit_lemmas + self.structure_unit_lemmas
-        self.relevant_article_lemmas = load_keywords(
-            self.nlp, session, KeywordType.ARTICLE_KEYWORD)
+        # Articles are parsed through the cache when given, so parses are shared with the classifier
+        self.doc_cache = doc_cache
+        self.lemmas = {}
+        self.spans_doc = None
+        self.spans = None
+        self.index_doc = None
+        self.index = None
+        self.chunk_size = CHUNK_SIZE
+        if keywords is None:
+            self.keyword_version = keyword_version(session)
+
+            def lemmas(keyword_type):
+                return load_keywords(self.nlp, session, keyword_type)
+        else:
+            self.keyword_version = None
+
+            def lemmas(keyword_type):
+                return keyword_lemmas(self.nlp, keywords.get(keyword_type, []))
+        self.person_term_lemmas = lemmas(KeywordType.PERSON_TERM)
+        self.structure_term_lemmas = lemmas(KeywordType.STRUCTURE_TERM)
+        self.joint_term_lemmas = self.structure_term_lemmas & self.person_term_lemmas
+        self.person_unit_lemmas = lemmas(KeywordType.PERSON_UNIT)
+        self.structure_unit_lemmas = lemmas(KeywordType.STRUCTURE_UNIT)
+        self.household_lemmas = frozenset(t.lemma_ for t in self.nlp(
+            " ".join(["families", "households"]), **profile_kwargs(TAGS)))
+        self.reporting_term_lemmas = self.person_term_lemmas | self.structure_term_lemmas
+        self.reporting_unit_lemmas = self.person_unit_lemmas | self.structure_unit_lemmas
+        self.sentence_trigger_lemmas = self.reporting_term_lemmas | VERB_TRIGGER_LEMMAS
+        self.relevant_article_lemmas = lemmas(KeywordType.ARTICLE_KEYWORD)
         load_custom_tokenizer_cases(self.nlp)
 
+    @profiled()
+    def parse(self, text, profile=FULL):
+        """
+        Parse a text, reusing a cached parse when available.
+        param: text     A string
+        param: profile  The spaCy pipeline components needed, from idetect.doc_cache
+        return: A Spacy Doc
+        """
+        if self.doc_cache is not None:
+            return self.doc_cache(text, profile)
+        return self.nlp(text, **profile_kwargs(profile))
+
+    def doc_spans(self, doc):
+        """
+        Named entities and noun chunks of a parsed article, kept for the
+        most recent article so each sentence does not iterate the whole Doc.
+        param: doc      A Spacy Doc
+        return: A tuple of lists of Spacy Spans (entities, noun chunks)
+        """
+        if self.spans_doc is not doc:
+            self.spans = (list(doc.ents), list(doc.noun_chunks))
+            self.spans_doc = doc
+        return self.spans
+
+    def dependency_index(self, doc):
+        """
+        Ancestor and distance index of a parsed article's dependency trees,
+        kept for the most recent article.
+        param: doc      A Spacy Doc
+        return: A DependencyIndex
+        """
+        if self.index_doc is not doc:
+            self.index = DependencyIndex(doc)
+            self.index_doc = doc
+        return self.index
+
+    def release_parse(self):
+        """
+        Drop the spans and dependency index kept for the most recent article,
+        so that they do not keep its parse alive.
+        """
+        self.spans_doc = None
+        self.spans = None
+        self.index_doc = None
+        self.index = None
+
+    def sentence_entities(self, sentence):
+        """
+        Named entities of the article that lie within a sentence.
+        param: sentence     A Spacy Span
+        return: A list of Spacy Spans
+        """
+        ents, _ = self.doc_spans(sentence.doc)
+        return [e for e in ents if e.start >= sentence.start and e.end <= sentence.end]
+
+    def sentence_noun_chunks(self, sentence):
+        """
+        Noun chunks of the article that lie within a sentence.
+        param: sentence     A Spacy Span
+        return: A list of Spacy Spans
+        """
+        _, noun_chunks = self.doc_spans(sentence.doc)
+        return [np for np in noun_chunks if np.start >= sentence.start and np.end <= sentence.end]
+
+    def lemmatize(self, word):
+        """
+        Lemmatize a single word on its own, remembering the result.
+        param: word     A string
+        return: The lemma of the word, a string
+        """
+        lemma = self.lemmas.get(word)
+        if lemma is None:
+            lemma = self.nlp(word, **profile_kwargs(TAGS))[0].lemma_
+            self.lemmas[word] = lemma
+        return lemma
 
     def check_if_collection_contains_token(self, token, collection):
         for c in collection:
@@ -132,7 +252,8 @@ class Interpreter(object):
         """
         if not root:
             root = sentence.root
-        return [t for t in sentence if root.is_ancestor_of(t)]
+        index = self.dependency_index(sentence.doc)
+        return [t for t in sentence if index.is_ancestor(root.i, t.i)]
 
     def check_if_entity_contains_token(self, tokens, entity):
         """
@@ -156,37 +277,56 @@ class Interpreter(object):
 
         returns: an integer distance
         """
-        if token == root:
-            return 0
-        d = 1
-        p = token.head
-        while p is not root:
-            d += 1
-            p = p.head
-        return d
+        index = self.dependency_index(token.doc)
+        return index.depth[token.i] - index.depth[root.i]
+
+    def get_lowest_common_ancestor(self, tokens):
+        """
+        Index of the lowest token that is an ancestor of, or one of, every token.
+        param: tokens: a non-empty list of tokens from one Doc
+
+        returns: a token index, or None if the tokens are in different sentences
+        """
+        index = self.dependency_index(tokens[0].doc)
+        common = tokens[0].i
+        for t in tokens[1:]:
+            common = index.lca(common, t.i)
+            if common is None:
+                break
+        return common
 
     def get_common_ancestors(self, tokens):
-        ancestors = [set(t.ancestors) for t in tokens]
-        if len(ancestors) == 0:
+        """
+        Tokens that are ancestors of every one of the tokens.
+        param: tokens: a list of tokens from one Doc
+
+        returns: a set of tokens
+        """
+        if len(tokens) == 0:
             return []
-        common_ancestors = ancestors[0].intersection(*ancestors)
-        return common_ancestors
+        common = self.get_lowest_common_ancestor(tokens)
+        if common is None:
+            return set()
+        doc = tokens[0].doc
+        index = self.dependency_index(doc)
+        token_indices = {t.i for t in tokens}
+        common_ancestors = set()
+        while True:
+            if common not in token_indices:
+                common_ancestors.add(doc[common])
+            if index.parent[common] == common:
+                return common_ancestors
+            common = index.parent[common]
 
     def get_distance_between_tokens(self, token_a, token_b):
+        """
+        Gets the parse tree distance between two tokens.
 
-        if token_b in token_a.subtree:
-            distance = self.get_distance_from_root(token_b, token_a)
-        elif token_a in token_b.subtree:
-            distance = self.get_distance_from_root(token_a, token_b)
-        else:
-            common_ancestors = self.get_common_ancestors([token_a, token_b])
-            distance = 10000
-            for ca in common_ancestors:
-                distance_a = self.get_distance_from_root(ca, token_a)
-                distance_b = self.get_distance_from_root(ca, token_b)
-                distance_ab = distance_a + distance_b
-                if distance_ab < distance:
-                    distance = distance_ab
+        returns: an integer distance, or 10000 if they are in different sentences
+        """
+        distance = self.dependency_index(token_a.doc).distance(token_a.i, token_b.i)
+        if distance is None:
+            return 10000
         return distance
 
     def get_closest_contiguous_location_block(self, entity_list, root_node):
@@ -196,40 +336,52 @@ class Interpreter(object):
             item for sublist in location_entity_tokens for item in sublist]
         location_tokens_by_distance = sorted([(token, self.get_distance_between_tokens(token, root_node))
                                               for token in token_list], key=lambda x: x[1])
-        closest_location = location_tokens_by_distance[0]
+        closest_location = location_tokens_by_distance[0][0]
+        index = self.dependency_index(closest_location.doc)
         contiguous_block = [closest_location]
+        block_indices = {closest_location.i}
         added_tokens = 1
         while added_tokens > 0:
-            contiguous_block_ancestors = [[token for token in token_list if token.is_ancestor_of(toke)] for toke in
-                                          contiguous_block]
-            contiguous_block_subtrees = [
-                token.subtree for token in contiguous_block]
-            contiguous_block_neighbours = contiguous_block_ancestors + contiguous_block_subtrees
-            contiguous_block_neighbours = [
-                item for sublist in contiguous_block_neighbours for item in sublist]
             added_tokens = 0
             for toke in token_list:
-                if not self.check_if_collection_contains_token(toke, contiguous_block):
-                    if toke in contiguous_block_neighbours:
+                if toke.i not in block_indices:
+                    # neighbours are ancestors of, or within the subtree of, a block token
+                    if any(index.is_ancestor_or_self(toke.i, b) or index.is_ancestor_or_self(b, toke.i)
+                           for b in block_indices):
                         added_tokens += 1
                         contiguous_block.append(toke)
+                        block_indices.add(toke.i)
         return contiguous_block
 
     def get_contiguous_tokens(self, token_list):
-        common_ancestor_tokens = self.get_common_ancestors(token_list)
-        highest_contiguous_block = []
-        for toke in token_list:
-            if self.check_if_collection_contains_token(toke.head, common_ancestor_tokens):
-                highest_contiguous_block.append(toke)
-        added_tokens = 1
-        while added_tokens > 0:
-            added_tokens = 0
-            for toke in token_list:
-                if self.check_if_collection_contains_token(toke.head, highest_contiguous_block):
-                    if not self.check_if_collection_contains_token(toke, highest_contiguous_block):
-                        highest_contiguous_block.append(toke)
-                        added_tokens += 1
-        return highest_contiguous_block
+        """
+        Tokens whose heads are common ancestors of all the tokens, together
+        with the tokens below them connected through heads in the list.
+        param: token_list: a list of tokens from one Doc
+
+        returns: a list of tokens
+        """
+        if len(token_list) == 0:
+            return []
+        common = self.get_lowest_common_ancestor(token_list)
+        if common is None:
+            return []
+        index = self.dependency_index(token_list[0].doc)
+        token_indices = {t.i for t in token_list}
+        # a head is a common ancestor if it is the lowest one or above it,
+        # and is not itself one of the tokens
+        block = {t.i for t in token_list
+                 if index.is_ancestor_or_self(t.head.i, common) and t.head.i not in token_indices}
+        children = {}
+        for t in token_list:
+            children.setdefault(t.head.i, []).append(t.i)
+        stack = list(block)
+        while stack:
+            for child in children.get(stack.pop(), []):
+                if child not in block:
+                    block.add(child)
+                    stack.append(child)
+        return [t for t in token_list if t.i in block]
 
     def match_entities_in_block(self, entities, token_block):
         matched = []
@@ -260,6 +412,7 @@ class Interpreter(object):
                     Fact(fact[0], fact, fact.lemma_, fact_type, start_offset))
         return facts
 
+    @profiled()
     def extract_locations(self, sentence, root=None):
         """
         Examine a sentence and identifies if any of its constituent tokens describe a location.
@@ -273,8 +426,7 @@ class Interpreter(object):
         if not root:
             root = sentence.root
         descendents = self.get_descendents(sentence, root)
-        location_entities = [e for e in self.nlp(
-            sentence.text).ents if e.label_ == "GPE"]
+        location_entities = [e for e in self.sentence_entities(sentence) if e.label_ == "GPE"]
         if len(location_entities) > 1:
             descendent_location_tokens = []
             for location_ent in location_entities:
@@ -287,13 +439,13 @@ class Interpreter(object):
             block_locations = self.match_entities_in_block(
                 location_entities, contiguous_token_block)
             if len(block_locations) > 0:
-                return self.convert_to_facts(block_locations, "loc", sentence[0].idx)
+                return self.convert_to_facts(block_locations, "loc")
             else:
                 # If we cannot decide which one is correct, choose them all
-                return self.convert_to_facts(location_entities, "loc", sentence[0].idx)
+                return self.convert_to_facts(location_entities, "loc")
                 # and figure it out at the report merging stage.
         elif len(location_entities) == 1:
-            return self.convert_to_facts(location_entities, "loc", sentence[0].idx)
+            return self.convert_to_facts(location_entities, "loc")
         else:
             return []
 
@@ -334,22 +486,39 @@ class Interpreter(object):
         else:
             return False
 
-    def process_sentence_new(self, sentence, locations_memory, story):
+    @profiled()
+    def process_sentence_new(self, sentence, locations_memory, story, article_relevant=None):
         """
         Extracts the main verbs from a sentence as a starting point
         for report extraction.
+        article_relevant is the article_relevance of the whole article, when
+        story is only a chunk of it.
         """
         sentence_reports = []
+        if not self.sentence_relevance(sentence):
+            return sentence_reports
         # Find the verbs
         main_verbs = get_main_verbs_of_sent(sentence)
         for v in main_verbs:
-            unit_type, verb = self.verb_relevance(v, story)
+            unit_type, verb = self.verb_relevance(v, story, article_relevant)
             if unit_type:
                 reports = self.branch_search_new(verb, unit_type, locations_memory, sentence,
                                                  story)
                 sentence_reports.extend(reports)
         return sentence_reports
 
+    def sentence_relevance(self, sentence):
+        """
+        Screen a sentence for a lemma that verb_relevance could accept, so
+        sentences without one skip verb and branch analysis.
+        param: sentence     A Spacy Span
+        return: True if the sentence may contain a report
+        """
+        for token in sentence:
+            if token.lemma_ in self.sentence_trigger_lemmas:
+                return True
+        return False
+
     def article_relevance(self, article):
         """
         Test article for relevance based on certain pre-defined terms.
@@ -360,22 +529,24 @@ class Interpreter(object):
             if token.lemma_ in self.relevant_article_lemmas:
                 return True
 
-    def verb_relevance(self, verb, article):
+    def verb_relevance(self, verb, article, article_relevant=None):
         """
         Checks a verb for relevance by:
         1. Comparing to structure term lemmas
         2. Comparing to person term lemmas
         3. Looking for special cases such as 'leave homeless'
+        Lemmas of special cases must also be in VERB_TRIGGER_LEMMAS.
+        article_relevant overrides article_relevance(article), for chunks of an article.
         """
         # case for eviction first because we have 'forced eviction' case which would be picked by the 'elif' below
         if 'eviction' in [obj.lemma_ for obj in get_objects_of_verb(verb)]:
             verb_objects = get_objects_of_verb(verb)
             for verb_object in verb_objects:
                 if verb_object.text == 'eviction' or verb_object.text == 'evictions':
-                    return self.structure_unit_lemmas + self.person_unit_lemmas, Fact(verb, article[verb.i: verb_object.i + 1],
+                    return self.reporting_unit_lemmas, Fact(verb, article[verb.i: verb_object.i + 1],
                                                         verb.lemma_ + " " + "eviction", "term")
         elif verb.lemma_ in self.joint_term_lemmas:
-            return self.structure_unit_lemmas + self.person_unit_lemmas, Fact(verb, verb, verb.lemma_, "term")
+            return self.reporting_unit_lemmas, Fact(verb, verb, verb.lemma_, "term")
         elif verb.lemma_ in self.structure_term_lemmas:
             return self.structure_unit_lemmas, Fact(verb, verb, verb.lemma_, "term")
         elif verb.lemma_ in self.person_term_lemmas:
@@ -396,8 +567,9 @@ class Interpreter(object):
                     return self.person_unit_lemmas, Fact(verb, article[verb.i: obj_predicate.i + 1],
                                                          'leave ' + obj_predicate.lemma_, "term")
 
-        elif verb.lemma_ == 'affect' and self.article_relevance(article):
-            return self.structure_unit_lemmas + self.person_unit_lemmas, Fact(verb, verb, verb.lemma_, "term")
+        elif verb.lemma_ == ARTICLE_RELEVANCE_VERB and (self.article_relevance(article) if article_relevant is None
+                                                        else article_relevant):
+            return self.reporting_unit_lemmas, Fact(verb, verb, verb.lemma_, "term")
 
         elif verb.lemma_ in ('fear', 'assume'):
             verb_objects = get_objects_of_verb(verb)
@@ -433,6 +605,7 @@ class Interpreter(object):
         else:
             return Fact(None)
 
+    @profiled()
     def get_quantity(self, sentence, unit):
         """
         Split a sentence into noun phrases.
@@ -441,18 +614,16 @@ class Interpreter(object):
         search for quantity within preceding noun phrase
         """
         quantity = Fact(None)
-        noun_phrases = list(self.nlp(sentence.text).noun_chunks)
+        noun_phrases = self.sentence_noun_chunks(sentence)
         # Case one - if the unit is a conjugated noun phrase,
         # look for numeric tokens descending from the root of the phrase.
         for i, np in enumerate(noun_phrases):
             if self.check_if_collection_contains_token(unit, np):
                 ## Try getting quantity from current noun phrase
-                quantity = self.get_quantity_from_phrase(
-                        np, offset=sentence[0].idx)
+                quantity = self.get_quantity_from_phrase(np)
                 ## If that fails, look in the preceding noun phrase
                 if not quantity.token:
-                    quantity = self.get_quantity_from_phrase(
-                        noun_phrases[i - 1], offset=sentence[0].idx)
+                    quantity = self.get_quantity_from_phrase(noun_phrases[i - 1])
         # Case two - get any numeric child of the unit noun.
         if quantity.token:
             return quantity
@@ -490,6 +661,7 @@ class Interpreter(object):
                     if token.tag_ == 'NNS':
                         return token
 
+    @profiled()
     def get_subjects_and_objects(self, story, sentence, verb):
         """
         Identify subjects and objects for a verb
@@ -583,11 +755,12 @@ class Interpreter(object):
                 report_span.extend(sub_spans)
             # Make sure that the fact is not None (specifically for the case of
             # Quantities)
-            elif f.token:
+            elif f.token or f.text:
                 span = {'type': f.type_, 'start': f.start_idx, 'end': f.end_idx}
                 report_span.append(span)
         return report_span
 
+    @profiled()
     def branch_search_new(self, verb, search_type, locations_memory, sentence, story):
         """
         Extract reports based upon an identified verb (reporting term).
@@ -606,7 +779,8 @@ class Interpreter(object):
         # If there are multiple possible nouns and it is unclear which is the correct one
         # choose the one with the fewest descendents. A verb object with many descendents is more likely to
         # have its own verb as a descendent.
-        verb_descendent_counts = [(v, len(list(v.subtree)))
+        index = self.dependency_index(story)
+        verb_descendent_counts = [(v, index.subtree_size(v.i))
                                   for v in verb_objects]
         verb_objects = [x[0] for x in sorted(
             verb_descendent_counts, key=lambda x: x[1])]
@@ -651,6 +825,7 @@ class Interpreter(object):
                 break
         return reports
 
+    @profiled()
     def extract_all_dates(self, story, publication_date=None):
         """
         Extract all dates from an article.
@@ -659,7 +834,7 @@ class Interpreter(object):
         return: A list of dates
         """
         date_times = []
-        story = self.nlp(story)
+        story = self.parse(story, ENTITIES)
         date_entities = [e for e in story.ents if e.label_ == "DATE"]
         for ent in date_entities:
             abs_date = get_absolute_date(ent.text, publication_date)
@@ -687,9 +862,9 @@ class Interpreter(object):
         return: An attribute of ReportTerm
         """
         reporting_term = reporting_term.split(" ")
-        reporting_term = [self.nlp(t)[0].lemma_ for t in reporting_term]
+        reporting_term = [self.lemmatize(t) for t in reporting_term]
         reporting_unit = reporting_unit.split(" ")
-        reporting_unit = [self.nlp(t)[0].lemma_ for t in reporting_unit]
+        reporting_unit = [self.lemmatize(t) for t in reporting_unit]
         if "refugee" in reporting_unit:
             return FactTerm.REFUGEE
         elif "asylum" in reporting_unit:
@@ -744,20 +919,172 @@ class Interpreter(object):
         ----------
         story:      the article content:String
         """
-        processed_reports = []
-        story = self.nlp(story)
-        sentences = list(story.sents)  # Split into sentences
+        if len(story) > self.chunk_size:
+            return self.process_chunked(story)
+        return self.process_doc(self.parse(story))
+
+    def process_parsed(self, story, doc):
+        """
+        Process a story parsed by parse_articles
+        Returns a list of reports in the story
+
+        Parameters
+        ----------
+        story:      the article content:String
+        doc:        its parse, or None if it is processed in chunks:Spacy Doc
+        """
+        if doc is None:
+            return self.process_chunked(story)
+        return self.process_doc(doc)
+
+    def process_articles(self, stories, batch_size=32, n_threads=2):
+        """
+        Process several stories, parsing them together with nlp.pipe
+        Returns a list of lists of reports, one per story
+
+        Parameters
+        ----------
+        stories:        the article contents:list of Strings
+        batch_size:     number of stories spaCy parses per batch:int
+        n_threads:      number of threads spaCy parses with:int
+        """
+        docs = self.parse_articles(stories, batch_size, n_threads)
+        return [self.process_parsed(story, doc) for story, doc in zip(stories, docs)]
+
+    @profiled()
+    def parse_articles(self, stories, batch_size=32, n_threads=2):
+        """
+        Parse several stories together with nlp.pipe
+        Returns a list with the parse of each story, or None for the
+        stories too long to parse at once, which are processed in chunks
+
+        Parameters
+        ----------
+        stories:        the article contents:list of Strings
+        batch_size:     number of stories spaCy parses per batch:int
+        n_threads:      number of threads spaCy parses with:int
+        """
+        short_stories = [s for s in stories if len(s) <= self.chunk_size]
+        if self.doc_cache is not None:
+            docs = self.doc_cache.pipe(short_stories, batch_size=batch_size, n_threads=n_threads)
+        else:
+            docs = self.nlp.pipe(short_stories, batch_size=batch_size, n_threads=n_threads)
+        docs = iter(docs)
+        return [next(docs) if len(s) <= self.chunk_size else None for s in stories]
+
+    @profiled()
+    def process_doc(self, story):
+        """
+        Process a parsed story one sentence at a time
+        Returns a list of reports in the story
+
+        Parameters
+        ----------
+        story:      the parsed article content:Spacy Doc
+        """
         # Keep a running track of the most recent locations found in articles
-        locations_memory = []
-        for i, sentence in enumerate(sentences):  # Process sentence
-            reports = []
+        processed_reports, _ = self.process_sentences(story, [])
+        return merge_reports(processed_reports)
+
+    def process_sentences(self, story, locations_memory, article_relevant=None):
+        """
+        Process each sentence of a parsed story or chunk of a story
+        Returns a list of reports and the most recent locations
+
+        Parameters
+        ----------
+        story:              the parsed article content:Spacy Doc
+        locations_memory:   the most recent locations before the story:list of Facts
+        article_relevant:   the article_relevance of the whole article, for a chunk:Boolean
+        """
+        processed_reports = []
+        for sentence in story.sents:  # Process sentence
             reports = self.process_sentence_new(
-                sentence, locations_memory, story)
+                sentence, locations_memory, story, article_relevant)
             current_locations = self.extract_locations(sentence)
             if current_locations:
                 locations_memory = current_locations
             processed_reports.extend(reports)
-        return list(set(processed_reports))
+        return processed_reports, locations_memory
+
+    @profiled()
+    def process_chunked(self, story):
+        """
+        Process a long story in sentence-aligned chunks, parsing one chunk at
+        a time and carrying the most recent locations from chunk to chunk
+        Returns a list of reports in the story, with offsets into the whole story
+
+        Parameters
+        ----------
+        story:      the article content:String
+        """
+        # Per chunk: offset, text, remembered locations at its start, reports, and
+        # whether the article was known to be relevant when it was processed
+        chunks = []
+        article_relevant = False
+        locations_memory = []
+        previous_offset = 0
+        for offset, chunk in chunk_text(story, self.chunk_size):
+            # Make the remembered locations relative to this chunk
+            locations_memory = [shift_fact(f, previous_offset - offset) for f in locations_memory]
+            doc = self.nlp(chunk)
+            article_relevant = article_relevant or bool(self.article_relevance(doc))
+            reports, next_memory = self.process_sentences(doc, locations_memory, article_relevant)
+            chunks.append([offset, chunk, locations_memory, reports, article_relevant])
+            locations_memory = next_memory
+            previous_offset = offset
+            # Release this chunk's parse before parsing the next
+            doc = None
+            self.release_parse()
+        if article_relevant:
+            # Relevance depends on the whole article, so reprocess the earlier
+            # chunks whose reports it could change. The remembered locations
+            # do not depend on it.
+            for entry in chunks:
+                offset, chunk, memory, reports, relevant = entry
+                if not relevant and ARTICLE_RELEVANCE_VERB in chunk.lower():
+                    entry[3], _ = self.process_sentences(self.nlp(chunk), memory, True)
+                    self.release_parse()
+        processed_reports = []
+        for offset, _, _, reports, _ in chunks:
+            for report in reports:
+                report.shift(offset)
+            processed_reports.extend(reports)
+        return merge_reports(processed_reports)
+
+
+def chunk_text(text, max_chars):
+    """
+    Split a text into chunks of at most max_chars characters, ending each
+    at the last sentence break within it, or failing that at a space
+    Yields tuples of the offset of the chunk in the text and the chunk
+    """
+    start = 0
+    while len(text) - start > max_chars:
+        limit = start + max_chars
+        end = None
+        for match in SENTENCE_BREAK.finditer(text, start, limit):
+            end = match.end()
+        if end is None or end <= start:
+            end = text.rfind(' ', start, limit) + 1
+        if end <= start:
+            end = limit
+        yield start, text[start:end]
+        start = end
+    if start < len(text):
+        yield start, text[start:]
+
+
+def shift_fact(fact, offset):
+    """
+    Copy of a Fact with its character offsets moved by offset, keeping its
+    text but not its token, so that it does not keep the parse it came from
+    """
+    shifted = Fact(None, lemma_=fact.lemma_, fact_type=fact.type_)
+    shifted.text = fact.text
+    shifted.start_idx = fact.start_idx + offset
+    shifted.end_idx = fact.end_idx + offset
+    return shifted
 
 
 class Fact(object):
@@ -816,6 +1143,44 @@ class Report(object):
             locations, self.reporting_unit, self.reporting_term, self.quantity)
         return rep
 
+    def shift(self, offset):
+        '''Move the report's character offsets, for a report found in a chunk starting at offset'''
+        self.sentence_start += offset
+        self.sentence_end += offset
+        for span in self.tag_spans:
+            span['start'] += offset
+            span['end'] += offset
+
+    def fact_key(self):
+        '''What the report states, apart from where'''
+        return (self.reporting_unit, self.reporting_term, self.quantity, self.sentence_start, self.sentence_end)
+
+    def key(self):
+        return self.fact_key() + (frozenset(self.locations),)
+
+    def __eq__(self, other):
+        return isinstance(other, Report) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+def merge_reports(reports):
+    '''Remove duplicate reports, in the order they were found.
+    Reports of the same unit, term and quantity in the same sentence are
+    merged into the one with the most locations when their locations are
+    contained in its locations.
+    '''
+    groups = OrderedDict()
+    for report in reports:
+        group = groups.setdefault(report.fact_key(), [])
+        locations = set(report.locations)
+        if any(locations <= set(kept.locations) for kept in group):
+            continue
+        group[:] = [kept for kept in group if not set(kept.locations) < locations]
+        group.append(report)
+    return [report for group in groups.values() for report in group]
+
 
 def convert_quantity(value):
     '''Convert an extracted quantity to an integer.
@@ -0,0 +1,136 @@
+'''Method(s) for screening article content for displacement keywords.
+
+Fact extraction only reports facts anchored on a reporting term such as
+"displaced" or "destroyed", so an article that never uses one of the
+reporting terms or article keywords in idetect_fact_keywords is treated as
+not relevant without running the relevance model and its spaCy parses.
+Words are compared by their Porter stems so that inflections match.
+
+A classifier process keeps one screen, rebuilt by get_keyword_screen when
+the keywords in the database change.
+'''
+import logging
+import re
+import time
+from functools import lru_cache
+
+from nltk.stem import PorterStemmer
+
+from idetect.model import FactKeyword, KeywordType, keyword_version
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Keyword types whose terms indicate that an article may report displacement
+SCREEN_KEYWORD_TYPES = (KeywordType.PERSON_TERM, KeywordType.STRUCTURE_TERM, KeywordType.ARTICLE_KEYWORD)
+
+# Irregular forms that do not share a stem with their lemma
+IRREGULAR_FORMS = (
+    ('flee', 'fled'),
+    ('sweep', 'swept'),
+    ('stick', 'stuck'),
+    ('leave', 'left'),
+    ('shake', 'shook', 'shaken'),
+    ('blow', 'blew', 'blown'),
+)
+
+WORD = re.compile(r'[a-z]+')
+
+# How often the hit and skip counts are logged, in texts screened
+LOG_EVERY = 1000
+# Number of distinct words whose stems are remembered
+STEM_CACHE_SIZE = 100000
+# How often, in seconds, the keywords are checked for changes
+KEYWORD_CHECK_INTERVAL = 60
+
+_stemmer = PorterStemmer()
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    '''Return the Porter stem of a word'''
+    return _stemmer.stem(word)
+
+
+class KeywordScreen(object):
+    """Set based screen of texts for keyword stems.
+
+    Attributes:
+        stems (frozenset): stems of every word of the keywords.
+        keyword_version (str): keyword_version of the keywords, or None if they were given directly.
+        hits (int): number of texts screened that contain a keyword.
+        skips (int): number of texts screened that contain none.
+    """
+
+    def __init__(self, keywords, version=None):
+        stems = set()
+        for keyword in keywords:
+            stems.update(stem(w) for w in WORD.findall(keyword.lower()))
+        for forms in IRREGULAR_FORMS:
+            form_stems = [stem(f) for f in forms]
+            if stems.intersection(form_stems):
+                stems.update(form_stems)
+        self.stems = frozenset(stems)
+        self.keyword_version = version
+        self.hits = 0
+        self.skips = 0
+
+    @classmethod
+    def from_session(cls, session):
+        version = keyword_version(session)
+        keywords = [k.description for k in session.query(FactKeyword)
+                    .filter(FactKeyword.keyword_type.in_(SCREEN_KEYWORD_TYPES))]
+        return cls(keywords, version)
+
+    def matches(self, text):
+        '''Return whether text contains a word stemming to one of the keyword stems'''
+        if not text:
+            return False
+        for word in set(WORD.findall(text.lower())):
+            if stem(word) in self.stems:
+                return True
+        return False
+
+    def screen(self, text):
+        '''Screen a text and count the result'''
+        matched = self.matches(text)
+        if matched:
+            self.hits += 1
+        else:
+            self.skips += 1
+        if (self.hits + self.skips) % LOG_EVERY == 0:
+            self.log_stats()
+        return matched
+
+    def log_stats(self):
+        screened = self.hits + self.skips
+        if screened > 0:
+            logger.info("Keyword screen: {} of {} texts skipped ({:.1%})".format(
+                self.skips, screened, self.skips / screened))
+
+
+_keyword_screen = None
+_keywords_checked = None
+
+
+def get_keyword_screen(session):
+    '''Return the KeywordScreen of this process, recreating it only when the
+    keywords in the database have changed since it was created.
+    :params session: session object
+    :return: instance of KeywordScreen
+    '''
+    global _keyword_screen, _keywords_checked
+    now = time.monotonic()
+    if _keyword_screen is None:
+        _keyword_screen = KeywordScreen.from_session(session)
+    elif now - _keywords_checked > KEYWORD_CHECK_INTERVAL:
+        if keyword_version(session) != _keyword_screen.keyword_version:
+            previous = _keyword_screen
+            _keyword_screen = KeywordScreen.from_session(session)
+            # Keep counting from the previous screen's totals
+            _keyword_screen.hits = previous.hits
+            _keyword_screen.skips = previous.skips
+    else:
+        return _keyword_screen
+    _keywords_checked = now
+    return _keyword_screen
@@ -33,33 +33,31 @@ def load_countries(session):
                 session.commit()
 
 
-def load_terms(session):
-    # Load terms used for report extraction
-    person_reporting_terms = [
+# Keywords used for report extraction, loaded into idetect_fact_keywords by load_terms
+DEFAULT_KEYWORDS = {
+    KeywordType.PERSON_TERM: [
         'displaced', 'evacuated', 'forced', 'flee', 'homeless', 'relief camp',
         'sheltered', 'relocated', 'stranded', 'stuck', 'accommodated', 'refugee camp',
-        'refugee center','evicted','eviction','sacked']
-
-    structure_reporting_terms = [
+        'refugee center','evicted','eviction','sacked'],
+    KeywordType.STRUCTURE_TERM: [
         'destroyed', 'damaged', 'swept', 'collapsed',
         'flooded', 'washed', 'inundated', 'evacuate'
-    ]
-
-    person_reporting_units = ["families", "person", "people", "individuals", "locals",
+    ],
+    KeywordType.PERSON_UNIT: ["families", "person", "people", "individuals", "locals",
                               "villagers", "residents",
-                              "occupants", "citizens", "households", "refugee", "asylum seeker"]
+                              "occupants", "citizens", "households", "refugee", "asylum seeker"],
+    KeywordType.STRUCTURE_UNIT: [
+        "home", "house", "hut", "dwelling", "building"],
+    KeywordType.ARTICLE_KEYWORD: ['Rainstorm', 'hurricane',
+                                  'tornado', 'rain', 'storm', 'earthquake'],
+}
 
-    structure_reporting_units = [
-        "home", "house", "hut", "dwelling", "building"]
 
-    relevant_article_terms = ['Rainstorm', 'hurricane',
-                              'tornado', 'rain', 'storm', 'earthquake']
-
-    for term_list, keyword_type in zip([person_reporting_terms, structure_reporting_terms,
-                                        person_reporting_units, structure_reporting_units, relevant_article_terms],
-                                       [KeywordType.PERSON_TERM, KeywordType.STRUCTURE_TERM, KeywordType.PERSON_UNIT,
-                                        KeywordType.STRUCTURE_UNIT, KeywordType.ARTICLE_KEYWORD]):
-        for term in term_list:
+def load_terms(session):
+    # Load terms used for report extraction
+    for keyword_type in [KeywordType.PERSON_TERM, KeywordType.STRUCTURE_TERM, KeywordType.PERSON_UNIT,
+                         KeywordType.STRUCTURE_UNIT, KeywordType.ARTICLE_KEYWORD]:
+        for term in DEFAULT_KEYWORDS[keyword_type]:
             report_kw = FactKeyword(description=term, keyword_type=keyword_type)
             session.add(report_kw)
             session.commit()
@@ -0,0 +1,80 @@
+'''Process-wide cache of locations by name.
+
+The same few thousand place names account for most location mentions, so
+looking each one up in idetect_locations costs a round trip per mention.
+The cache keeps the id of recently used names. Names that have no location
+are not cached, since save_locations inserts every name it does not find.
+
+Only ids are cached: they never change, so cached ids stay valid in every
+process without invalidation. Geotags are read from idetect_locations.
+'''
+import logging
+from collections import OrderedDict
+
+from sqlalchemy import func
+
+from idetect.model import Location, fact_location
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Maximum number of names kept
+MAX_SIZE = 20000
+# Number of most referenced locations loaded by warm
+WARM_SIZE = 5000
+
+
+class LocationCache(object):
+    """Bounded LRU cache from location name to location id.
+
+    Attributes:
+        max_size (int): maximum number of names kept.
+        hits (int): number of names found in the cache.
+        misses (int): number of names saved through the database.
+    """
+
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def get(self, name):
+        """Return the location id for name, or None if it is not cached"""
+        location_id = self.entries.get(name)
+        if name in self.entries:
+            self.entries.move_to_end(name)
+        return location_id
+
+    def put(self, name, location_id):
+        """Remember the location id for name"""
+        self.entries[name] = location_id
+        self.entries.move_to_end(name)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def warm(self, session, limit=WARM_SIZE):
+        """Load the locations most referenced by facts"""
+        counts = session.query(fact_location.c.location.label('location'),
+                               func.count().label('references')) \
+            .group_by(fact_location.c.location) \
+            .order_by(func.count().desc()) \
+            .limit(limit) \
+            .subquery()
+        locations = session.query(Location.id, Location.location_name) \
+            .join(counts, Location.id == counts.c.location) \
+            .order_by(counts.c.references) \
+            .all()
+        # Least referenced first, so the most referenced are evicted last
+        for location_id, name in locations:
+            self.put(name, location_id)
+        logger.info("Location cache: loaded {} locations".format(len(locations)))
+
+
+location_cache = LocationCache()
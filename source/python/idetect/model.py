@@ -6,11 +6,11 @@ import string
 from sqlalchemy import Column, BigInteger, Integer, String, Date, DateTime, Boolean, \
     Numeric, ForeignKey, Table, Index, Text, UniqueConstraint
 from sqlalchemy.dialects import postgresql
-from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.dialects.postgresql import TSVECTOR, aggregate_order_by
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, object_session, relationship
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 
 
 Base = declarative_base()
@@ -37,6 +37,7 @@ def db_url():
 
 class Status:
     NEW = 'new'
+    SKIPPED = 'skipped'
     SCRAPING = 'scraping'
     SCRAPED = 'scraped'
     CLASSIFYING = 'classifying'
@@ -147,6 +148,8 @@ class Analysis(Base):
     content = relationship('DocumentContent', back_populates='analysis')
     error_msg = Column(String)
     processing_time = Column(Numeric)  # time it took to process to bring it to the current status
+    processing_profile = Column(String)  # JSON of time and calls per extraction stage, when profiling is stored
+    priority = Column(Numeric)  # triage score from the GKG themes and counts, higher is scraped first
 
     def __str__(self):
         return "<Analysis {} {} {}>".format(self.gkg_id, self.document.url)
@@ -187,6 +190,43 @@ class Analysis(Base):
         finally:
             session.rollback()  # make sure we release the FOR UPDATE lock
 
+    @classmethod
+    def create_new_versions(cls, analyses, new_status, clear_facts=False):
+        """
+        Create new versions of several analyses with the new status in a single transaction.
+        Analyses that are no longer the most recent version for their gkg_id are left out.
+        With clear_facts, the new versions start without facts, which stay on the histories.
+        Returns the list of analyses that were advanced.
+        """
+        if len(analyses) == 0:
+            return []
+        session = object_session(analyses[0])
+        try:
+            if not session:
+                raise RuntimeError("Object has not been persisted in a session.")
+
+            latest = dict(session.query(Analysis.gkg_id, Analysis.status)
+                          .filter(Analysis.gkg_id.in_([a.gkg_id for a in analyses]))
+                          .with_for_update().all())
+            advanced = []
+            for analysis in analyses:
+                if latest.get(analysis.gkg_id) != analysis.status:
+                    continue
+                columns = {c.name: analysis.__getattribute__(c.name) for c in Analysis.__table__.columns}
+                history = AnalysisHistory(**columns)
+                history.facts = list(analysis.facts)
+                session.add(history)
+
+                if clear_facts:
+                    analysis.facts = []
+                analysis.updated = func.now()
+                analysis.status = new_status
+                advanced.append(analysis)
+            session.commit()
+            return advanced
+        finally:
+            session.rollback()  # make sure we release the FOR UPDATE lock
+
     def tagged_text(self):
         # Add tags to article content for display purposes
         spans = self.get_unique_tag_spans()
@@ -258,6 +298,9 @@ class Analysis(Base):
 
 
 status_updated_index = Index('document_analyses_status_updated', Analysis.status, Analysis.updated)
+status_priority_index = Index('document_analyses_status_priority', Analysis.status,
+                              Analysis.priority.desc().nullslast(), Analysis.updated)
+content_index = Index('document_analyses_content', Analysis.content_id)
 
 
 class AnalysisHistory(Base):
@@ -286,6 +329,8 @@ class AnalysisHistory(Base):
     content = relationship('DocumentContent')
     error_msg = Column(String)
     processing_time = Column(Numeric)  # time it took to process to bring it to the current status
+    processing_profile = Column(String)  # JSON of time and calls per extraction stage, when profiling is stored
+    priority = Column(Numeric)  # triage score from the GKG themes and counts, higher is scraped first
 
 
 class DocumentContent(Base):
@@ -387,6 +432,31 @@ class Location(Base):
     facts = relationship('Fact', secondary=fact_location, back_populates='locations')
 
 
+class GkgLocation(Base):
+    """Places already geocoded by GDELT, used to geotag Locations without an external call"""
+    __tablename__ = 'idetect_gkg_locations'
+
+    location_name = Column(String, primary_key=True)
+    location_type = Column(String)
+    country_iso3 = Column(String(3))
+    latlong = Column(String)
+    ambiguous = Column(Boolean, default=False)  # seen in more than one country, so unusable
+
+
+class CachedPrediction(Base):
+    """A classifier prediction for a document content, keyed by content and model file hashes"""
+    __tablename__ = 'idetect_prediction_cache'
+
+    content_hash = Column(String(40), primary_key=True)
+    model_hash = Column(String(40), primary_key=True)
+    prediction = Column(String)  # JSON encoded
+    created = Column(DateTime(timezone=True), server_default=func.now())
+    last_used = Column(DateTime(timezone=True), server_default=func.now())
+
+
+prediction_last_used_index = Index('idetect_prediction_cache_last_used', CachedPrediction.last_used)
+
+
 class KeywordType:
     PERSON_TERM = 'person_term'
     PERSON_UNIT = 'person_unit'
@@ -401,3 +471,14 @@ class FactKeyword(Base):
     id = Column(Integer, primary_key=True)
     description = Column(String)
     keyword_type = Column(String)
+
+
+def keyword_version(session):
+    """
+    Return a marker that changes whenever the keywords in idetect_fact_keywords change.
+    param: session      SQLAlchemy session
+    return: A String, the md5 of all the keywords
+    """
+    return session.query(func.md5(func.coalesce(func.string_agg(
+        FactKeyword.keyword_type + ':' + FactKeyword.description,
+        aggregate_order_by(literal_column("'|'"), FactKeyword.id)), ''))).scalar()
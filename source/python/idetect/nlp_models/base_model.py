@@ -12,6 +12,8 @@ from scipy import sparse
 from gensim import matutils, models
 from gensim.sklearn_integration.sklearn_wrapper_gensim_lsimodel import SklLsiModel
 
+from idetect.nlp_models.model_files import file_hash
+from idetect.nlp_models.projection import project_lsi
 from idetect.geotagger import strip_accents, compare_strings, strip_words, LocationType, subdivision_country_code, match_country_name, city_subdivision_country
 
 class DownloadableModel(object):
@@ -21,8 +23,15 @@ class DownloadableModel(object):
     Attributes:
         model (sklearn model): a scikit-learn Transformer, Estimator, or
             Pipeline, which has the "predict" method.
+        mmap_mode (str): mode used to memory-map the model's numpy arrays,
+            or None to load them into the process's own memory.
+        model_path (str): where the pickled model is stored locally.
+        model_hash (str): hex digest of the model file, identifying the
+            model version for cached predictions.
     """
 
+    mmap_mode = 'r'
+
 #    def __init__(self, model_path, model_url):
 #        self.model = self.load_model(model_path, model_url)
 
@@ -40,6 +49,7 @@ class DownloadableModel(object):
             model (sklearn model): An unpickled sklearn model (Transformer,
                 Estimator, or Pipeline).
         """
+        self.model_path = model_path
         # Load users model if specified and exists
         if os.path.isfile(model_path):
             with open(model_path, 'rb') as f:
@@ -48,8 +58,8 @@ class DownloadableModel(object):
                 try:
                     fcntl.flock(f, fcntl.LOCK_EX)
                     if os.path.getsize(model_path) > 0:
-                        model = joblib.load(model_path)
-                        return model
+                        self.model_hash = file_hash(model_path)
+                        return self.load_pickle(model_path)
                 except IOError as e:
                     if e.errno != errno.EAGAIN:
                         raise
@@ -76,8 +86,39 @@ class DownloadableModel(object):
                 fcntl.flock(f, fcntl.LOCK_EX)
             finally:
                 fcntl.flock(f, fcntl.LOCK_UN)
-        model = joblib.load(model_path)
-        return model
+        self.model_hash = file_hash(model_path)
+        return self.load_pickle(model_path)
+
+    def load_pickle(self, model_path):
+        """Loads a pickled model from disk. With mmap_mode set, the model's
+        numpy arrays are memory-mapped so that every worker on a host shares
+        one copy of them in the page cache.
+
+        The downloaded pickle may be compressed, which rules out memory-mapping,
+        so on first use it is re-dumped uncompressed next to the original.
+
+        Args:
+            model_path (str): Path to a downloaded model.
+
+        Returns:
+            model (sklearn model): An unpickled sklearn model.
+        """
+        if self.mmap_mode is None:
+            return joblib.load(model_path)
+        mmap_path = model_path + '.mmap'
+        with open(mmap_path, 'ab+') as f:
+            # get exclusive lock in case currently being written by
+            # another worker
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.path.getsize(mmap_path) == 0 or \
+                        os.path.getmtime(mmap_path) < os.path.getmtime(model_path):
+                    tmp_path = '{}.{}'.format(mmap_path, os.getpid())
+                    joblib.dump(joblib.load(model_path), tmp_path)
+                    os.rename(tmp_path, mmap_path)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return joblib.load(mmap_path, mmap_mode=self.mmap_mode)
 
     def predict(self, text):
         """ This method should be overwritten to fit the specific case of the
@@ -132,6 +173,10 @@ class CustomSklLsiModel(SklLsiModel):
         # import pdb; pdb.set_trace()
         # check = lambda x: [x] if isinstance(x[0], tuple) else x
         # docs = check(docs)
+        if sparse.issparse(docs) and docs.shape[1] == self.gensim_model.num_terms:
+            # project the whole batch at once rather than document by document
+            u = self.gensim_model.projection.u[:, :self.gensim_model.num_topics]
+            return project_lsi(docs, u, self.num_topics)
         if sparse.issparse(docs):
             docs = matutils.Sparse2Corpus(docs, documents_columns=False)
         X = [[] for i in range(0, len(docs))];
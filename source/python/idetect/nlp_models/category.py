@@ -6,6 +6,8 @@ from nltk.stem import PorterStemmer
 from sklearn.base import TransformerMixin
 
 from idetect.model import DisplacementType
+from idetect.nlp_models import preprocessing
+from idetect.nlp_models.compiled import convert_category
 from idetect.nlp_models.base_model import DownloadableModel
 
 
@@ -16,17 +18,18 @@ class CategoryModel(DownloadableModel):
         self.model = self.load_model(model_path, model_url)
 
     def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
         try:
-            category = self.model.predict(pd.Series(text))[0]
-            if category == 'disaster':
-                return DisplacementType.DISASTER
-            elif category == 'conflict':
-                return DisplacementType.CONFLICT
-            else:
-                return DisplacementType.OTHER
+            categories = self.model.predict(pd.Series(texts))
         except ValueError:
             # error can occur if empty text is passed to model
             raise
+        return [self.convert_category(category) for category in categories]
+
+    def convert_category(self, category):
+        return convert_category(category)
 
 
 class Tokenizer(TransformerMixin):
@@ -35,12 +38,7 @@ class Tokenizer(TransformerMixin):
         self.tokenizer = WordPunctTokenizer()
 
     def prepare_tokens(self, text, stop_words):
-        tokens = self.tokenizer.tokenize(text)
-        tokens = [t for t in tokens if len(t) > 2]
-        tokens = [t for t in tokens if t not in stop_words]
-        tokens = [t.lower() for t in tokens]
-        tokens = [t for t in tokens if not t.isdigit()]
-        return tokens
+        return preprocessing.prepare_tokens(text, stop_words, self.tokenizer.tokenize)
 
     def fit(self, X, *args):
         return self
@@ -57,13 +55,7 @@ class Stemmer(TransformerMixin):
         self.stemmer = PorterStemmer()
 
     def prepare_stems(self, text, stop_words):
-        tokens = self.tokenizer.tokenize(text)
-        tokens = [t for t in tokens if len(t) > 2]
-        tokens = [t.lower() for t in tokens]
-        tokens = [t for t in tokens if t not in stop_words]
-        stems = [self.stemmer.stem(t) for t in tokens]
-        stems = [s for s in stems if not s.isdigit()]
-        return stems
+        return preprocessing.prepare_stems(text, stop_words, self.stemmer.stem, self.tokenizer.tokenize)
 
     def fit(self, X, *args):
         return self
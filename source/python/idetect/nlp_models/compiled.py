@@ -0,0 +1,349 @@
+'''Inference for classifier pipelines compiled by idetect.nlp_models.export.
+
+A compiled model is a single .npz file holding the fitted arrays of a
+pipeline (vocabularies, IDF weights, LSI projections and linear classifier
+coefficients) together with a JSON description of how they are connected.
+Running it needs numpy and scipy, plus spaCy or nltk for the text
+preprocessing steps that use them, but neither gensim nor scikit-learn,
+so it starts much faster and uses much less memory than the pickled model.
+'''
+import json
+import re
+import unicodedata
+
+import numpy as np
+from scipy import sparse
+
+from idetect.doc_cache import FULL, ENTITIES, TAGS
+from idetect.model import DisplacementType, Relevance
+from idetect.nlp_models import preprocessing
+from idetect.nlp_models.model_files import file_hash
+from idetect.nlp_models.projection import project_lsi, EPS
+from idetect.spacy_pipeline import get_doc_cache
+
+# gensim's TfidfModel drops weights at or below this magnitude
+GENSIM_TFIDF_EPS = 1e-12
+
+
+def convert_category(category):
+    if category == 'disaster':
+        return DisplacementType.DISASTER
+    elif category == 'conflict':
+        return DisplacementType.CONFLICT
+    else:
+        return DisplacementType.OTHER
+
+
+def convert_relevance(relevance):
+    if relevance == 1:
+        return Relevance.DISPLACEMENT
+    elif relevance == 0:
+        return Relevance.NOT_DISPLACEMENT
+
+
+def parse(texts, profile=FULL):
+    '''Parse texts with the spaCy pipeline shared with fact extraction'''
+    return get_doc_cache().pipe(texts, profile)
+
+
+def count_matrix(docs, vocabulary, n_columns, binary=False):
+    '''Count the terms of a vocabulary in tokenized documents.
+    :params docs: list of lists of terms
+    :params vocabulary: dict from term to column
+    :params n_columns: number of columns of the matrix
+    :return: scipy csr matrix of counts, with sorted column indices
+    '''
+    indices = []
+    data = []
+    indptr = [0]
+    for doc in docs:
+        counts = {}
+        for term in doc:
+            column = vocabulary.get(term)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        for column in sorted(counts):
+            indices.append(column)
+            data.append(1 if binary else counts[column])
+        indptr.append(len(indices))
+    return sparse.csr_matrix((np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32),
+                              np.array(indptr, dtype=np.int32)), shape=(len(docs), n_columns))
+
+
+def normalize_rows(X, norm):
+    '''Scale each row of a csr matrix in place to unit l1 or l2 norm'''
+    for i in range(X.shape[0]):
+        row = X.data[X.indptr[i]:X.indptr[i + 1]]
+        if norm == 'l2':
+            length = np.sqrt(np.dot(row, row))
+        else:
+            length = np.abs(row).sum()
+        if length > 0:
+            row /= length
+    return X
+
+
+def strip_accents_unicode(s):
+    normalized = unicodedata.normalize('NFKD', s)
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+def strip_accents_ascii(s):
+    return unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII')
+
+
+class Step(object):
+    '''A step of a compiled pipeline, built from its description and arrays.
+    Subclasses define transform, or predict for the final estimator of a pipeline.
+    '''
+    # spaCy pipeline components the step needs
+    profile = frozenset()
+
+    def __init__(self, spec, arrays):
+        self.spec = spec
+        self.arrays = {name: arrays[key] for name, key in spec.get('arrays', {}).items()}
+
+    def spacy_profile(self):
+        return self.profile
+
+
+class PipelineStep(Step):
+    def __init__(self, spec, arrays):
+        super().__init__(spec, arrays)
+        self.steps = [build_step(s, arrays) for s in spec['steps']]
+
+    def spacy_profile(self):
+        return frozenset().union(*[s.spacy_profile() for s in self.steps])
+
+    def transform(self, X):
+        for step in self.steps:
+            X = step.transform(X)
+        return X
+
+    def predict(self, X):
+        for step in self.steps[:-1]:
+            X = step.transform(X)
+        return self.steps[-1].predict(X)
+
+
+class UnionStep(Step):
+    def __init__(self, spec, arrays):
+        super().__init__(spec, arrays)
+        self.parts = [build_step(s, arrays) for s in spec['parts']]
+
+    def spacy_profile(self):
+        return frozenset().union(*[p.spacy_profile() for p in self.parts])
+
+    def transform(self, X):
+        Xs = []
+        for part, weight in zip(self.parts, self.spec['weights']):
+            Xt = part.transform(X)
+            Xs.append(Xt if weight is None else Xt * weight)
+        if any(sparse.issparse(Xt) for Xt in Xs):
+            return sparse.hstack(Xs).tocsr()
+        return np.hstack(Xs)
+
+
+class LocationStep(Step):
+    profile = ENTITIES
+
+    def transform(self, X):
+        return preprocessing.location_strings(parse(X, self.profile))
+
+
+class PhraseStep(Step):
+    # phrases follow the dependency heads
+    profile = FULL
+
+    def transform(self, X):
+        return preprocessing.phrase_strings(parse(X, self.profile))
+
+
+class POSStep(Step):
+    profile = TAGS
+
+    def transform(self, X):
+        return preprocessing.pos_strings(parse(X, self.profile), set(self.spec['stop_words']),
+                                         self.spec['pos_tags'], self.spec['rejoin'])
+
+
+class TokenizerStep(Step):
+    def transform(self, X):
+        stop_words = set(self.spec['stop_words'])
+        return [preprocessing.prepare_tokens(x, stop_words) for x in X]
+
+
+class StemmerStep(Step):
+    def __init__(self, spec, arrays):
+        super().__init__(spec, arrays)
+        from nltk.stem import PorterStemmer
+        self.stemmer = PorterStemmer(**({'mode': spec['mode']} if spec.get('mode') else {}))
+
+    def transform(self, X):
+        stop_words = set(self.spec['stop_words'])
+        return [preprocessing.prepare_stems(x, stop_words, self.stemmer.stem) for x in X]
+
+
+class VectorizerStep(Step):
+    '''scikit-learn's CountVectorizer with the default word analyzer'''
+
+    def __init__(self, spec, arrays):
+        super().__init__(spec, arrays)
+        self.vocabulary = dict(zip(self.arrays['terms'].tolist(), self.arrays['columns'].tolist()))
+        self.token_pattern = re.compile(spec['token_pattern'])
+        self.stop_words = set(spec['stop_words']) if spec['stop_words'] is not None else None
+        self.strip_accents = {'unicode': strip_accents_unicode, 'ascii': strip_accents_ascii} \
+            .get(spec['strip_accents'])
+
+    def analyze(self, text):
+        if self.spec['lowercase']:
+            text = text.lower()
+        if self.strip_accents is not None:
+            text = self.strip_accents(text)
+        tokens = self.token_pattern.findall(text)
+        if self.stop_words is not None:
+            tokens = [w for w in tokens if w not in self.stop_words]
+        min_n, max_n = self.spec['ngram_range']
+        if max_n != 1:
+            original_tokens = tokens
+            if min_n == 1:
+                tokens = list(original_tokens)
+                min_n += 1
+            else:
+                tokens = []
+            n_original_tokens = len(original_tokens)
+            for n in range(min_n, min(max_n + 1, n_original_tokens + 1)):
+                for i in range(n_original_tokens - n + 1):
+                    tokens.append(' '.join(original_tokens[i: i + n]))
+        return tokens
+
+    def transform(self, X):
+        return count_matrix([self.analyze(x) for x in X], self.vocabulary, len(self.vocabulary),
+                            self.spec['binary'])
+
+
+class TfidfStep(Step):
+    '''scikit-learn's TfidfTransformer'''
+
+    def transform(self, X):
+        X = X.copy()
+        if self.spec['sublinear_tf']:
+            np.log(X.data, X.data)
+            X.data += 1
+        if 'idf' in self.arrays:
+            X.data *= self.arrays['idf'][X.indices]
+        if self.spec['norm']:
+            X = normalize_rows(X, self.spec['norm'])
+        return X
+
+
+class GensimTfidfStep(Step):
+    '''gensim's Dictionary and normalized TfidfModel'''
+
+    def __init__(self, spec, arrays):
+        super().__init__(spec, arrays)
+        self.vocabulary = dict(zip(self.arrays['terms'].tolist(), self.arrays['ids'].tolist()))
+
+    def transform(self, X):
+        X = count_matrix(X, self.vocabulary, len(self.arrays['idfs']))
+        X.data *= self.arrays['idfs'][X.indices]
+        X = normalize_rows(X, 'l2')
+        X.data[np.abs(X.data) <= GENSIM_TFIDF_EPS] = 0
+        return X
+
+
+class LsiStep(Step):
+    '''gensim's LSI projection, as wrapped by CustomSklLsiModel or LsiTransformer'''
+
+    def transform(self, X):
+        u = self.arrays['u']
+        if X.shape[1] != u.shape[0]:
+            raise ValueError('Expected {} terms, got {}'.format(u.shape[0], X.shape[1]))
+        if self.spec['pad']:
+            return project_lsi(X, u, self.spec['num_topics'])
+        topics = np.asarray(X.astype(u.dtype).dot(u))
+        if not (np.abs(topics) > EPS).all():
+            # LsiTransformer does not pad, so the original model cannot classify these either
+            raise ValueError('Document has fewer than {} topics'.format(u.shape[1]))
+        return topics
+
+
+class LinearStep(Step):
+    '''A fitted scikit-learn linear classifier such as LinearSVC'''
+
+    def predict(self, X):
+        scores = X.dot(self.arrays['coef'].T) + self.arrays['intercept']
+        scores = np.asarray(scores)
+        classes = self.arrays['classes']
+        if scores.shape[1] == 1:
+            return classes[(scores.ravel() > 0).astype(int)]
+        return classes[scores.argmax(axis=1)]
+
+
+STEPS = {
+    'pipeline': PipelineStep,
+    'union': UnionStep,
+    'location_processor': LocationStep,
+    'phrase_processor': PhraseStep,
+    'pos_processor': POSStep,
+    'tokenizer': TokenizerStep,
+    'stemmer': StemmerStep,
+    'vectorizer': VectorizerStep,
+    'tfidf': TfidfStep,
+    'gensim_tfidf': GensimTfidfStep,
+    'lsi': LsiStep,
+    'linear': LinearStep,
+}
+
+
+def build_step(spec, arrays):
+    return STEPS[spec['type']](spec, arrays)
+
+
+class CompiledModel(object):
+    """A classifier pipeline loaded from a compiled .npz file.
+
+    Attributes:
+        model (Step): the root step of the compiled pipeline, which has the
+            "predict" method.
+        model_hash (str): hex digest identifying the model the pipeline was
+            compiled from, so that cached predictions stay valid.
+        profile (frozenset): spaCy pipeline components used by its steps.
+    """
+
+    def __init__(self, model_path):
+        with np.load(model_path, allow_pickle=False) as f:
+            arrays = {key: f[key] for key in f.files}
+        spec = json.loads(str(arrays.pop('spec')))
+        self.model = build_step(spec['model'], arrays)
+        self.model_hash = spec.get('model_hash') or file_hash(model_path)
+        self.profile = self.model.spacy_profile()
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        texts = list(texts)
+        if self.profile:
+            # parse once with every component the steps need
+            parse(texts, self.profile)
+        return [self.convert(label) for label in self.model.predict(texts)]
+
+    def convert(self, label):
+        return label
+
+
+class CompiledCategoryModel(CompiledModel):
+    def __init__(self, model_path='/home/idetect/python/idetect/nlp_models/category.npz'):
+        super().__init__(model_path)
+
+    def convert(self, label):
+        return convert_category(label)
+
+
+class CompiledRelevanceModel(CompiledModel):
+    def __init__(self, model_path='/home/idetect/python/idetect/nlp_models/relevance_classifier_svm_10132017.npz'):
+        super().__init__(model_path)
+
+    def convert(self, label):
+        return convert_relevance(label)
@@ -0,0 +1,153 @@
+'''Method(s) for compiling fitted classifier pipelines for idetect.nlp_models.compiled.
+
+Only the steps used by the category and relevance models are supported:
+Pipeline and FeatureUnion, the custom text processors, scikit-learn's
+count and TF-IDF vectorizers, gensim TF-IDF and LSI models, and linear
+classifiers. Any other step raises a ValueError, so a model that cannot be
+reproduced exactly is never exported.
+'''
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer, \
+    TfidfTransformer as SklTfidfTransformer
+from sklearn.linear_model.base import LinearClassifierMixin
+from sklearn.pipeline import Pipeline, FeatureUnion
+
+from idetect.nlp_models.base_model import CustomSklLsiModel
+from idetect.nlp_models.category import Tokenizer, Stemmer, TfidfTransformer, LsiTransformer
+from idetect.nlp_models.relevance import LocationProcessor, PhraseProcessor, POSProcessor
+
+
+def compiled_path(model_path):
+    '''Return the path of the compiled version of a pickled model'''
+    return os.path.splitext(model_path)[0] + '.npz'
+
+
+def stop_word_list(stop_words):
+    return sorted(stop_words) if stop_words is not None else None
+
+
+class Compiler(object):
+    '''Collects the arrays of a pipeline while describing its steps'''
+
+    def __init__(self):
+        self.arrays = {}
+
+    def add_arrays(self, **arrays):
+        keys = {}
+        for name, array in arrays.items():
+            key = 'arr_{}'.format(len(self.arrays))
+            self.arrays[key] = np.asarray(array)
+            keys[name] = key
+        return keys
+
+    def compile(self, estimator):
+        '''Describe an estimator as a compiled step
+        :params estimator: a fitted estimator or transformer
+        :return: dict describing the step, referring to arrays by key
+        '''
+        if isinstance(estimator, Pipeline):
+            return {'type': 'pipeline',
+                    'steps': [self.compile(e) for _, e in estimator.steps if e is not None]}
+        if isinstance(estimator, FeatureUnion):
+            weights = estimator.transformer_weights or {}
+            parts = [(name, t) for name, t in estimator.transformer_list if t is not None]
+            return {'type': 'union',
+                    'parts': [self.compile(t) for _, t in parts],
+                    'weights': [weights.get(name) for name, _ in parts]}
+        if isinstance(estimator, LocationProcessor):
+            return {'type': 'location_processor'}
+        if isinstance(estimator, PhraseProcessor):
+            return {'type': 'phrase_processor'}
+        if isinstance(estimator, POSProcessor):
+            return {'type': 'pos_processor', 'stop_words': stop_word_list(estimator.stop_words),
+                    'pos_tags': bool(estimator.pos_tags), 'rejoin': bool(estimator.rejoin)}
+        if isinstance(estimator, Tokenizer):
+            return {'type': 'tokenizer', 'stop_words': stop_word_list(estimator.stop_words)}
+        if isinstance(estimator, Stemmer):
+            return {'type': 'stemmer', 'stop_words': stop_word_list(estimator.stop_words),
+                    'mode': getattr(estimator.stemmer, 'mode', None)}
+        if isinstance(estimator, TfidfVectorizer):
+            return {'type': 'pipeline',
+                    'steps': [self.compile_vectorizer(estimator), self.compile_tfidf(estimator._tfidf)]}
+        if isinstance(estimator, CountVectorizer):
+            return self.compile_vectorizer(estimator)
+        if isinstance(estimator, SklTfidfTransformer):
+            return self.compile_tfidf(estimator)
+        if isinstance(estimator, TfidfTransformer):
+            return self.compile_gensim_tfidf(estimator)
+        if isinstance(estimator, LsiTransformer):
+            return {'type': 'pipeline',
+                    'steps': [self.compile_gensim_tfidf(estimator.tfidf_transformer),
+                              self.compile_lsi(estimator.lsi_model, estimator.lsi_model.num_topics, pad=False)]}
+        if isinstance(estimator, CustomSklLsiModel):
+            return self.compile_lsi(estimator.gensim_model, estimator.num_topics, pad=True)
+        if isinstance(estimator, LinearClassifierMixin):
+            return {'type': 'linear',
+                    'arrays': self.add_arrays(coef=estimator.coef_, intercept=estimator.intercept_,
+                                              classes=estimator.classes_)}
+        raise ValueError('Cannot compile {}'.format(type(estimator).__name__))
+
+    def compile_vectorizer(self, vectorizer):
+        if vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None \
+                or vectorizer.preprocessor is not None or vectorizer.input != 'content' \
+                or vectorizer.strip_accents not in (None, 'unicode', 'ascii'):
+            raise ValueError('Cannot compile a vectorizer with a custom analyzer')
+        terms, columns = zip(*sorted(vectorizer.vocabulary_.items(), key=lambda item: item[1]))
+        return {'type': 'vectorizer', 'lowercase': bool(vectorizer.lowercase),
+                'strip_accents': vectorizer.strip_accents, 'token_pattern': vectorizer.token_pattern,
+                'stop_words': stop_word_list(vectorizer.get_stop_words()),
+                'ngram_range': list(vectorizer.ngram_range), 'binary': bool(vectorizer.binary),
+                'arrays': self.add_arrays(terms=list(terms), columns=list(columns))}
+
+    def compile_tfidf(self, transformer):
+        spec = {'type': 'tfidf', 'norm': transformer.norm, 'sublinear_tf': bool(transformer.sublinear_tf)}
+        if transformer.use_idf:
+            spec['arrays'] = self.add_arrays(idf=transformer.idf_)
+        return spec
+
+    def compile_gensim_tfidf(self, transformer):
+        tfidf_model = transformer.tfidf_model
+        if tfidf_model.normalize is not True:
+            raise ValueError('Cannot compile a gensim TfidfModel without unit normalization')
+        token2id = transformer.dictionary.token2id
+        terms, ids = zip(*sorted(token2id.items(), key=lambda item: item[1]))
+        idfs = np.zeros(max(ids) + 1)
+        for term_id, idf in tfidf_model.idfs.items():
+            if term_id < len(idfs):
+                idfs[term_id] = idf
+        return {'type': 'gensim_tfidf', 'arrays': self.add_arrays(terms=list(terms), ids=list(ids), idfs=idfs)}
+
+    def compile_lsi(self, lsi_model, num_topics, pad):
+        u = lsi_model.projection.u[:, :lsi_model.num_topics]
+        return {'type': 'lsi', 'num_topics': num_topics, 'pad': pad, 'arrays': self.add_arrays(u=u)}
+
+
+def export_model(model, path, model_hash=None):
+    '''Compile a fitted pipeline and save it
+    :params model: a fitted scikit-learn Pipeline
+    :params path: where to write the .npz file
+    :params model_hash: hash of the pickled model, so that predictions cached
+        for it are reused by the compiled model
+    :return: None
+    '''
+    compiler = Compiler()
+    spec = {'model': compiler.compile(model), 'model_hash': model_hash}
+    tmp_path = '{}.{}.npz'.format(path, os.getpid())
+    np.savez(tmp_path, spec=np.array(json.dumps(spec)), **compiler.arrays)
+    os.rename(tmp_path, path)
+
+
+def verify_model(model, compiled, texts):
+    '''Compare the predictions of a pipeline and its compiled version
+    :params model: a fitted scikit-learn Pipeline
+    :params compiled: the CompiledModel loaded from its export
+    :params texts: list of Strings to classify
+    :return: list of the texts whose predictions differ
+    '''
+    expected = model.predict(pd.Series(texts))
+    actual = compiled.model.predict(list(texts))
+    return [t for t, e, a in zip(texts, expected, actual) if e != a]
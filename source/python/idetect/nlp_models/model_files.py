@@ -0,0 +1,15 @@
+'''Method(s) for identifying model files.
+
+Only the standard library is needed here, so the sklearn models and the
+compiled models can both use it.
+'''
+import hashlib
+
+
+def file_hash(model_path):
+    """Returns the hex digest of a model file, identifying the model version"""
+    digest = hashlib.sha1()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,138 @@
+'''Text preprocessing used by the classifier pipelines.
+
+These functions hold the logic of the custom transformers in category and
+relevance, without depending on scikit-learn, so that compiled models can
+run them too.
+'''
+import re
+
+from spacy.tokens.token import Token
+
+from idetect.geotagger import match_country_name, city_subdivision_country
+
+# The pattern used by nltk's WordPunctTokenizer
+WORD_PUNCT = re.compile(r'\w+|[^\w\s]+')
+
+
+def tag_entities(doc):
+    '''Replace countries and other places in a parsed document with common names,
+    numbers with a common number, and drop urls and emails.
+    '''
+    tokens = []
+    for token in doc:
+        if token.ent_type_ == 'GPE':
+            if match_country_name(token.text)[0]:
+                tokens.append('Switzerland')
+            elif city_subdivision_country(token.text):
+                tokens.append('Geneva')
+            else:
+                tokens.append('Geneva')
+        elif token.like_num:
+            tokens.append('1000')
+        elif token.like_url:
+            continue
+        elif token.like_email:
+            continue
+        else:
+            tokens.append(token.text)
+    return tokens
+
+
+def parse_phrases(doc):
+    '''Return a list of lists, with each sublist containing a token from the text,
+    it's parent token and it's grandparent token. Does not return any repeat tokens
+    in each phrase.'''
+    phrases = []
+    for d in doc:
+        if not d.is_punct:
+            if d.head != d:
+                if d.head.head != d.head:
+                    phrases.append([d, d.head, d.head.head])
+                else:
+                    phrases.append([d, d.head])
+    return phrases
+
+
+def join_phrases(phrases):
+    joined = []
+    for phrase in phrases:
+        tokens = []
+        for token in phrase:
+            if isinstance(token, Token):
+                tokens.append(token.lemma_)
+            else:
+                tokens.append(token)
+        if len(tokens) < 2:
+            continue
+        joined.append('_'.join(tokens))
+    return joined
+
+
+def single_string(texts):
+    strings = [' '.join(t) for t in texts]
+    return strings
+
+
+def tag_pos(doc):
+    return [(t, t.pos_) for t in doc]
+
+
+def get_lemmas(text):
+    return [t[0].lemma_ for t in text]
+
+
+def remove_noise(text, stop_words):
+    noise_tags = ['DET', 'NUM', 'SYM']
+    text = [t for t in text if t[0].text not in stop_words]
+    text = [t for t in text if len(t[0]) > 2]
+    text = [t for t in text if t[1] not in noise_tags]
+    text = [t for t in text if ~t[0].like_num]
+    return text
+
+
+def join_pos_lemmas(pos, lemmas):
+    return ['{}_{}'.format(l, p[1]).lower() for p, l
+            in zip(pos, lemmas)]
+
+
+def location_strings(docs):
+    '''LocationProcessor: parsed documents to strings with places replaced'''
+    return single_string([tag_entities(d) for d in docs])
+
+
+def phrase_strings(docs):
+    '''PhraseProcessor: parsed documents to strings of dependency phrases'''
+    return single_string([join_phrases(parse_phrases(d)) for d in docs])
+
+
+def pos_strings(docs, stop_words, pos_tags=True, rejoin=True):
+    '''POSProcessor: parsed documents to lemmas tagged with their part of speech'''
+    docs = [remove_noise(tag_pos(d), stop_words) for d in docs]
+    lemmas = [get_lemmas(d) for d in docs]
+    if pos_tags:
+        docs = [join_pos_lemmas(d, l) for d, l
+                in zip(docs, lemmas)]
+    if rejoin:
+        docs = single_string(docs)
+    return docs
+
+
+def prepare_tokens(text, stop_words, tokenize=WORD_PUNCT.findall):
+    '''Tokenizer: text to lower case tokens'''
+    tokens = tokenize(text)
+    tokens = [t for t in tokens if len(t) > 2]
+    tokens = [t for t in tokens if t not in stop_words]
+    tokens = [t.lower() for t in tokens]
+    tokens = [t for t in tokens if not t.isdigit()]
+    return tokens
+
+
+def prepare_stems(text, stop_words, stem, tokenize=WORD_PUNCT.findall):
+    '''Stemmer: text to stems of lower case tokens'''
+    tokens = tokenize(text)
+    tokens = [t for t in tokens if len(t) > 2]
+    tokens = [t.lower() for t in tokens]
+    tokens = [t for t in tokens if t not in stop_words]
+    stems = [stem(t) for t in tokens]
+    stems = [s for s in stems if not s.isdigit()]
+    return stems
@@ -0,0 +1,36 @@
+'''Method(s) for projecting document vectors onto LSI topics.
+
+Only numpy is needed here, so the projection can be used without gensim.
+'''
+import numpy as np
+
+# gensim drops topic weights at or below this magnitude when it sparsifies a document
+EPS = 1e-9
+# CustomSklLsiModel pads documents with fewer topics than expected with this value
+PADDING = 1e-12
+
+
+def project_lsi(X, u, num_topics):
+    '''Project a batch of documents onto LSI topics.
+    Equivalent to calling gensim's LsiModel[doc] on every row, keeping only the
+    topic weights and padding them to num_topics as CustomSklLsiModel does:
+    the weights gensim would drop are removed, the rest are moved left keeping
+    their order, and the remaining columns are filled with PADDING.
+    :params X: scipy sparse matrix (documents x terms) or numpy array
+    :params u: numpy array of the left singular vectors (terms x topics)
+    :params num_topics: width of the output
+    :return: numpy array (documents x num_topics)
+    '''
+    topics = np.asarray(X.astype(u.dtype).dot(u[:, :num_topics]))
+    if topics.shape[1] < num_topics:
+        # the model found fewer topics than requested
+        topics = np.hstack([topics, np.zeros((topics.shape[0], num_topics - topics.shape[1]), dtype=topics.dtype)])
+    kept = np.abs(topics) > EPS
+    if kept.all():
+        return topics
+    # A stable sort on the dropped flags moves the kept weights left in order
+    order = np.argsort(~kept, axis=1, kind='mergesort')
+    rows = np.arange(topics.shape[0])[:, np.newaxis]
+    topics = topics[rows, order]
+    topics[~kept[rows, order]] = PADDING
+    return topics
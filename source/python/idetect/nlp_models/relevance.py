@@ -8,8 +8,11 @@ from sklearn.svm import LinearSVC
 from spacy.tokens.token import Token
 
 from idetect.model import Relevance
+from idetect.nlp_models import preprocessing
+from idetect.nlp_models.compiled import convert_relevance
 from idetect.nlp_models.base_model import DownloadableModel, CustomSklLsiModel
-from idetect.fact_extractor import nlp
+from idetect.spacy_pipeline import get_doc_cache
+from idetect.doc_cache import FULL, ENTITIES, TAGS
 from idetect.geotagger import strip_accents, compare_strings, strip_words, LocationType, subdivision_country_code, match_country_name, city_subdivision_country
 
 
@@ -17,70 +20,56 @@ class RelevanceModel(DownloadableModel):
     def __init__(self, model_path='/home/idetect/python/idetect/nlp_models/relevance_classifier_svm_10132017.pkl',
             model_url='https://s3-us-west-2.amazonaws.com/idmc-idetect/relevance_models/relevance_classifier_svm_10132017.pkl'):
         self.model = self.load_model(model_path, model_url)
+        self.profile = spacy_profile(self.model)
 
     def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        if self.profile:
+            # parse once with every component the processors need, so that
+            # each of them finds the article in the cache
+            get_doc_cache().pipe(texts, self.profile)
         try:
-            relevance = self.model.predict(pd.Series(text))[0]
-            if relevance == 1:
-                return Relevance.DISPLACEMENT
-            elif relevance == 0:
-                return Relevance.NOT_DISPLACEMENT
+            relevances = self.model.predict(pd.Series(texts))
         except ValueError:
             # error can occur if empty text is passed to model
             raise
+        return [self.convert_relevance(relevance) for relevance in relevances]
+
+    def convert_relevance(self, relevance):
+        return convert_relevance(relevance)
+
+
+def spacy_profile(estimator):
+    '''Return the spaCy pipeline components needed by the processors in a fitted pipeline'''
+    if isinstance(estimator, Pipeline):
+        return frozenset().union(*[spacy_profile(e) for _, e in estimator.steps if e is not None])
+    if isinstance(estimator, FeatureUnion):
+        return frozenset().union(*[spacy_profile(t) for _, t in estimator.transformer_list if t is not None])
+    return getattr(estimator, 'profile', frozenset())
 
 
 class LocationProcessor(BaseEstimator, TransformerMixin):
     """Transformer that replaces all country and subdivisions
         mentioned in text with common names.
     """
+    profile = ENTITIES
 
     def tag_entities(self, text):
-        tokens = []
-        for token in text:
-            if token.ent_type_ == 'GPE':
-                if match_country_name(token.text)[0]:
-                    tokens.append('Switzerland')
-                elif city_subdivision_country(token.text):
-                    tokens.append('Geneva')
-                else:
-                    tokens.append('Geneva')
-            elif token.like_num:
-                tokens.append('1000')
-            elif token.like_url:
-                continue
-            elif token.like_email:
-                continue
-            else:
-                tokens.append(token.text)
-        return tokens
+        return preprocessing.tag_entities(text)
 
     def join_phrases(self, phrases):
-        joined = []
-        for phrase in phrases:
-            tokens = []
-            for token in phrase:
-                if isinstance(token, Token):
-                    tokens.append(token.lemma_)
-                else:
-                    tokens.append(token)
-            if len(tokens) < 2:
-                continue
-            joined.append('_'.join(tokens))
-        return joined
+        return preprocessing.join_phrases(phrases)
 
     def single_string(self, texts):
-        strings = [' '.join(t) for t in texts]
-        return strings
+        return preprocessing.single_string(texts)
 
     def fit(self, texts, *args):
         return self
 
     def transform(self, texts, *args):
-        texts = [nlp(t) for t in texts]
-        texts = [self.tag_entities(t) for t in texts]
-        texts = self.single_string(texts)
-        return texts
+        return preprocessing.location_strings(get_doc_cache().pipe(texts, self.profile))
 
 
 class PhraseProcessor(BaseEstimator, TransformerMixin):
@@ -95,6 +84,9 @@ class PhraseProcessor(BaseEstimator, TransformerMixin):
     stop_words : book, required
         Whether to remove stop words.
     """
+    # Phrases follow the dependency heads, so this needs the parser, and a
+    # pipeline using it is parsed with every component
+    profile = FULL
 
     def __init__(self, stop_words):
         self.stop_words = stop_words
@@ -103,44 +95,19 @@ class PhraseProcessor(BaseEstimator, TransformerMixin):
         '''Return a list of lists, with each sublist containing a token from the text,
         it's parent token and it's grandparent token. Does not return any repeat tokens
         in each phrase.'''
-        phrases = []
-        for d in doc:
-            if not d.is_punct:
-                if d.head != d:
-                    if d.head.head != d.head:
-                        phrases.append([d, d.head, d.head.head])
-                    else:
-                        phrases.append([d, d.head])
-        return phrases
+        return preprocessing.parse_phrases(doc)
 
     def join_phrases(self, phrases):
-        joined = []
-        for phrase in phrases:
-            tokens = []
-            for token in phrase:
-                if isinstance(token, Token):
-                    tokens.append(token.lemma_)
-                else:
-                    tokens.append(token)
-            if len(tokens) < 2:
-                continue
-            joined.append('_'.join(tokens))
-        return joined
+        return preprocessing.join_phrases(phrases)
 
     def single_string(self, texts):
-        strings = [' '.join(t) for t in texts]
-        return strings
+        return preprocessing.single_string(texts)
 
     def fit(self, texts, *args):
         return self
 
     def transform(self, texts, *args):
-#         import pdb; pdb.set_trace()
-        docs = [nlp(t) for t in texts]
-        phrases = [self.parse_phrases(d) for d in docs]
-        joined = [self.join_phrases(p) for p in phrases]
-        text = self.single_string(joined)
-        return text
+        return preprocessing.phrase_strings(get_doc_cache().pipe(texts, self.profile))
 
 
 class POSProcessor(BaseEstimator, TransformerMixin):
@@ -156,6 +123,7 @@ class POSProcessor(BaseEstimator, TransformerMixin):
     stop_words : book, required
         Whether to remove stop words.
     """
+    profile = TAGS
 
     def __init__(self, stop_words, pos_tags=True,
                 rejoin=True):
@@ -164,38 +132,22 @@ class POSProcessor(BaseEstimator, TransformerMixin):
         self.rejoin = rejoin
 
     def tag_pos(self, text):
-        return [(t, t.pos_) for t in text]
+        return preprocessing.tag_pos(text)
 
     def get_lemmas(self, text):
-        return [t[0].lemma_ for t in text]
+        return preprocessing.get_lemmas(text)
 
     def remove_noise(self, text):
-        noise_tags = ['DET', 'NUM', 'SYM']
-        text = [t for t in text if t[0].text not in self.stop_words]
-        text = [t for t in text if len(t[0]) > 2]
-        text = [t for t in text if t[1] not in noise_tags]
-        text = [t for t in text if ~t[0].like_num]
-        return text
+        return preprocessing.remove_noise(text, self.stop_words)
 
     def join_pos_lemmas(self, pos, lemmas):
-        return ['{}_{}'.format(l, p[1]).lower() for p, l
-                in zip(pos, lemmas)]
+        return preprocessing.join_pos_lemmas(pos, lemmas)
 
     def fit(self, texts, *args):
         return self
 
     def single_string(self, texts):
-        strings = [' '.join(t) for t in texts]
-        return strings
+        return preprocessing.single_string(texts)
 
     def transform(self, texts, *args):
-        docs = [nlp(sent) for sent in texts]
-        docs = [self.tag_pos(d) for d in docs]
-        docs = [self.remove_noise(d) for d in docs]
-        lemmas = [self.get_lemmas(d) for d in docs]
-        if self.pos_tags:
-            docs = [self.join_pos_lemmas(d, l) for d, l
-                    in zip(docs, lemmas)]
-        if self.rejoin:
-            docs = self.single_string(docs)
-        return docs
+        return preprocessing.pos_strings(get_doc_cache().pipe(texts, self.profile), self.stop_words, self.pos_tags, self.rejoin)
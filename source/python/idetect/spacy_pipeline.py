@@ -0,0 +1,131 @@
+'''The spaCy pipelines of fact extraction and the classifiers.
+
+The English models are loaded once per process and shared. The classifiers
+parse with spaCy's own tokenizer, as their models were trained with it. Fact
+extraction runs the same models over a tokenizer of its own, which also
+keeps hyphenated numbers such as "twenty-five" as single tokens. Each
+tokenization has its own DocCache, so parses are shared between the
+consumers that tokenize alike.
+
+The pipelines and caches are loaded on first use, so that modules needing
+them for some inputs only, such as the compiled classifier models, neither
+load spaCy's models on import nor import fact extraction for them.
+'''
+import spacy
+from spacy.symbols import ORTH, LEMMA, POS
+
+from idetect.doc_cache import DocCache
+from idetect.doc_store import DocStore, model_version
+
+# Identifies the extraction tokenizer in the doc store's model version
+EXTRACTION_TOKENIZER = 'hyphened-numbers'
+
+_nlp = None
+_doc_cache = None
+_extraction_nlp = None
+_extraction_doc_cache = None
+
+
+def tokenizer_add_hyphened_numbers(nlp, pre, post):
+    for p1, p2 in [(pre, post), (pre.capitalize(), post), (pre.capitalize(), post.capitalize())]:
+        nlp.tokenizer.add_special_case(u'{}-{}'.format(p1, p2),
+                                       [{
+                                           ORTH: u'{}-{}'.format(p1, p2),
+                                           LEMMA: u'{}'.format(pre, post),
+                                           POS: u'NUM'
+                                       }])
+
+
+def load_custom_tokenizer_cases(nlp):
+    # the special cases only need registering once per pipeline
+    if getattr(nlp, 'idetect_tokenizer_cases', False):
+        return
+    for pre in ['twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']:
+        for post in ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine']:
+            tokenizer_add_hyphened_numbers(nlp, pre, post)
+    nlp.idetect_tokenizer_cases = True
+
+
+class TokenizedPipeline(object):
+    """The components of a loaded spaCy 1.x pipeline run over the Docs of
+    another tokenizer, with the same calls as the pipeline itself.
+
+    Attributes:
+        nlp (spacy Language): the pipeline whose components are run.
+        tokenizer (spacy Tokenizer): makes the Docs, sharing nlp's vocab.
+    """
+
+    def __init__(self, nlp, tokenizer):
+        self.nlp = nlp
+        self.tokenizer = tokenizer
+        self.vocab = nlp.vocab
+
+    def components(self, tag=True, parse=True, entity=True):
+        skipped = [c for c, run in ((self.nlp.tagger, tag), (self.nlp.parser, parse), (self.nlp.entity, entity))
+                   if not run]
+        return [c for c in self.nlp.pipeline if c is not None and not any(c is s for s in skipped)]
+
+    def __call__(self, text, tag=True, parse=True, entity=True):
+        doc = self.tokenizer(text)
+        for component in self.components(tag, parse, entity):
+            component(doc)
+        return doc
+
+    def pipe(self, texts, tag=True, parse=True, entity=True, n_threads=2, batch_size=1000):
+        stream = (self.tokenizer(text) for text in texts)
+        for component in self.components(tag, parse, entity):
+            if hasattr(component, 'pipe'):
+                stream = component.pipe(stream, n_threads=n_threads, batch_size=batch_size)
+            else:
+                stream = apply_component(component, stream)
+        return stream
+
+
+def apply_component(component, docs):
+    for doc in docs:
+        component(doc)
+        yield doc
+
+
+def get_nlp():
+    '''Return the English pipeline the classifiers parse with, loaded on first use'''
+    global _nlp
+    if _nlp is None:
+        _nlp = spacy.load("en_default")
+        print("Loaded Spacy English Language NLP Models.")
+    return _nlp
+
+
+def get_extraction_nlp():
+    '''Return the pipeline fact extraction parses with: the English models
+    over a tokenizer with the custom cases, created on first use
+    '''
+    global _extraction_nlp
+    if _extraction_nlp is None:
+        nlp = get_nlp()
+        _extraction_nlp = TokenizedPipeline(nlp, nlp.Defaults.create_tokenizer(nlp))
+        load_custom_tokenizer_cases(_extraction_nlp)
+    return _extraction_nlp
+
+
+def get_doc_cache():
+    '''Return the parses shared by the classifiers, and across processes
+    when IDETECT_DOC_STORE is set, created on first use
+    '''
+    global _doc_cache
+    if _doc_cache is None:
+        nlp = get_nlp()
+        _doc_cache = DocCache(nlp, store=DocStore.from_environment(model_version(nlp)))
+    return _doc_cache
+
+
+def get_extraction_doc_cache():
+    '''Return the parses shared by the Interpreters, and across processes
+    when IDETECT_DOC_STORE is set, created on first use
+    '''
+    global _extraction_doc_cache
+    if _extraction_doc_cache is None:
+        nlp = get_extraction_nlp()
+        version = model_version(get_nlp(), EXTRACTION_TOKENIZER)
+        _extraction_doc_cache = DocCache(nlp, store=DocStore.from_environment(version))
+    return _extraction_doc_cache
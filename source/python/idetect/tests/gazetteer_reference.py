@@ -0,0 +1,26 @@
+'''The original linear scans over pycountry, kept as references for the
+geotagger's country and subdivision indexes.
+'''
+import pycountry
+
+from idetect.geotagger import compare_strings
+
+
+def linear_country_name(place_name):
+    '''The original scan over all countries, kept as a reference for the country index'''
+    for country in pycountry.countries:
+        if country.name == place_name:
+            return country.alpha_3, country.name
+        elif hasattr(country, 'common_name') and country.common_name == place_name:
+            return country.alpha_3, country.common_name
+        elif hasattr(country, 'official_name') and country.official_name == place_name:
+            return country.alpha_3, country.name
+    return None, None
+
+
+def linear_subdivision_country_code(place_name):
+    '''The original scan over all subdivisions, kept as a reference for the subdivision index'''
+    for sub_division in pycountry.subdivisions:
+        if compare_strings(sub_division.name, place_name):
+            return sub_division.country.alpha_3, sub_division.country.name
+    return None, None
@@ -0,0 +1,82 @@
+import os
+from unittest import TestCase
+
+from sqlalchemy import create_engine, func
+
+from idetect.backfill import backfill, backfill_query, keyword_prefixes, new_keywords
+from idetect.model import Base, Session, Status, Gkg, Analysis, AnalysisHistory, DocumentContent, Fact, \
+    FactKeyword, KeywordType, remove_wordcloud_stopwords
+
+
+class TestBackfillQuery(TestCase):
+
+    def test_prefixes(self):
+        """Keywords are searched by prefixes matching their inflections"""
+        self.assertEqual({'evict'}, keyword_prefixes(['evicted', 'eviction']))
+        self.assertEqual({'relief', 'camp'}, keyword_prefixes(['relief camp']))
+        self.assertIn('fled', keyword_prefixes(['flee']))
+        # removed from content_ts, so it cannot be searched for
+        self.assertEqual(set(), keyword_prefixes(['people']))
+
+    def test_query(self):
+        """New units and article keywords only match alongside the words they qualify"""
+        displaced = FactKeyword(description='displaced', keyword_type=KeywordType.PERSON_TERM)
+        evicted = FactKeyword(description='evicted', keyword_type=KeywordType.PERSON_TERM)
+        tenants = FactKeyword(description='tenants', keyword_type=KeywordType.PERSON_UNIT)
+        storm = FactKeyword(description='storm', keyword_type=KeywordType.ARTICLE_KEYWORD)
+        every = [displaced, evicted, tenants, storm]
+        self.assertEqual('(evict:*)', backfill_query([evicted], every))
+        self.assertEqual('((tenant:*) & (displac:* | evict:*))', backfill_query([tenants], every))
+        self.assertEqual('((storm:*) & (affect:*))', backfill_query([storm], every))
+        self.assertIsNone(backfill_query([], every))
+
+
+class TestBackfill(TestCase):
+
+    def setUp(self):
+        db_host = os.environ.get('DB_HOST')
+        db_url = 'postgresql://{user}:{passwd}@{db_host}/{db}'.format(
+            user='tester', passwd='tester', db_host=db_host, db='idetect_test')
+        engine = create_engine(db_url)
+        Session.configure(bind=engine)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add(FactKeyword(description='displaced', keyword_type=KeywordType.PERSON_TERM))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.rollback()
+        for article in self.session.query(Gkg).all():
+            self.session.delete(article)
+        self.session.commit()
+
+    def add_analysis(self, text, status):
+        content = DocumentContent(content_clean=text,
+                                  content_ts=func.to_tsvector('simple_english', remove_wordcloud_stopwords(text)))
+        analysis = Analysis(gkg=Gkg(), status=status, content=content)
+        analysis.facts.append(Fact(unit='Person', term='Displaced'))
+        self.session.add(analysis)
+        self.session.commit()
+        return analysis
+
+    def test_requeues_matches(self):
+        """Only extracted analyses of the contents using the new keywords are requeued, without their facts"""
+        since_id = self.session.query(func.max(FactKeyword.id)).scalar()
+        self.session.add(FactKeyword(description='evicted', keyword_type=KeywordType.PERSON_TERM))
+        self.session.commit()
+        matching = self.add_analysis("2000 people were forcibly evicted from their homes", Status.GEOTAGGED)
+        other = self.add_analysis("2000 people were displaced from their homes", Status.GEOTAGGED)
+        edited = self.add_analysis("The evictions went ahead", Status.EDITED)
+        keywords = new_keywords(self.session, since_id=since_id)
+        self.assertEqual(['evicted'], [k.description for k in keywords])
+        self.assertEqual(2, backfill(self.session, keywords, dry_run=True))
+        self.assertEqual(1, backfill(self.session, keywords, chunk_size=1, poll_seconds=0))
+        self.session.refresh(matching)
+        self.assertEqual(Status.CLASSIFIED, matching.status)
+        self.assertEqual([], matching.facts)
+        history = self.session.query(AnalysisHistory).filter_by(gkg_id=matching.gkg_id).one()
+        self.assertEqual(1, len(history.facts))
+        self.assertEqual(Status.GEOTAGGED, other.status)
+        self.assertEqual(1, len(other.facts))
+        self.assertEqual(Status.EDITED, edited.status)
@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from idetect.benchmark import build_corpus, count_sentences, compare, measure, FIXTURE_SENTENCES
+
+
+class TestBenchmark(TestCase):
+
+    def results(self, articles_per_second, peak_rss_mb):
+        return {'corpus': {'articles': 20, 'sentences': 5, 'seed': 0},
+                'stages': {'parse': {'articles_per_second': articles_per_second,
+                                     'sentences_per_second': 5 * articles_per_second,
+                                     'peak_rss_mb': peak_rss_mb},
+                           'classify': {'skipped': True}}}
+
+    def test_corpus(self):
+        """The corpus starts with the fixture sentences and is the same for the same seed"""
+        corpus = build_corpus(20, 5, seed=0)
+        self.assertEqual(20, len(corpus))
+        self.assertEqual(FIXTURE_SENTENCES, corpus[:len(FIXTURE_SENTENCES)])
+        self.assertEqual(corpus, build_corpus(20, 5, seed=0))
+        self.assertNotEqual(corpus, build_corpus(20, 5, seed=1))
+        self.assertEqual(len(FIXTURE_SENTENCES) + 5 * (20 - len(FIXTURE_SENTENCES)), count_sentences(corpus))
+
+    def test_compare(self):
+        """Throughput drops and memory growth beyond the tolerance are regressions"""
+        baseline = self.results(100.0, 500.0)
+        rows = compare(baseline, self.results(95.0, 600.0), tolerance=0.1)
+        self.assertEqual([('parse', 'articles_per_second', False),
+                          ('parse', 'sentences_per_second', False),
+                          ('parse', 'peak_rss_mb', True)],
+                         [(row[0], row[1], row[-1]) for row in rows])
+        self.assertTrue(all(row[-1] for row in compare(baseline, self.results(50.0, 600.0))))
+        other = self.results(100.0, 500.0)
+        other['corpus']['seed'] = 1
+        with self.assertRaises(ValueError):
+            compare(baseline, other)
+
+    def test_measure(self):
+        """Measures the throughput and memory of a stage"""
+        result = measure('screen', build_corpus(20, 5))
+        self.assertEqual(20, result['articles'])
+        self.assertGreater(result['articles_per_second'], 0)
+        self.assertGreater(result['peak_rss_mb'], 0)
+        self.assertGreater(result['matches'], 0)
@@ -0,0 +1,62 @@
+import os
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from sqlalchemy import create_engine
+
+from idetect.classifier import predict_cached, evict_predictions
+from idetect.doc_cache import content_hash
+from idetect.model import Base, Session, CachedPrediction
+
+
+class CountingModel(object):
+    """Stand-in for a DownloadableModel that records what it predicts"""
+    model_hash = 'abc'
+
+    def __init__(self):
+        self.predicted = []
+
+    def predict_batch(self, texts):
+        self.predicted.extend(texts)
+        return [len(t) for t in texts]
+
+
+class TestClassifier(TestCase):
+    def setUp(self):
+        db_host = os.environ.get('DB_HOST')
+        db_url = 'postgresql://{user}:{passwd}@{db_host}/{db}'.format(
+            user='tester', passwd='tester', db_host=db_host, db='idetect_test')
+        engine = create_engine(db_url)
+        Session.configure(bind=engine)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+
+    def tearDown(self):
+        self.session.rollback()
+        self.session.query(CachedPrediction).delete()
+        self.session.commit()
+
+    def test_predict_cached(self):
+        model = CountingModel()
+        self.assertEqual(predict_cached(self.session, model, ['one', 'three', 'one']), [3, 5, 3])
+        self.assertEqual(model.predicted, ['one', 'three'])
+        self.session.commit()
+
+        self.assertEqual(predict_cached(self.session, model, ['three', 'four']), [5, 4])
+        self.assertEqual(model.predicted, ['one', 'three', 'four'])
+
+        model.model_hash = 'def'
+        self.assertEqual(predict_cached(self.session, model, ['one']), [3])
+        self.assertEqual(model.predicted, ['one', 'three', 'four', 'one'])
+
+    def test_evict_predictions(self):
+        model = CountingModel()
+        for i, text in enumerate(['one', 'two', 'three']):
+            self.session.add(CachedPrediction(content_hash=content_hash(text), model_hash=model.model_hash,
+                                              prediction='3', last_used=datetime.utcnow() - timedelta(days=i)))
+        self.session.commit()
+        self.assertEqual(evict_predictions(self.session), 0)
+        self.assertEqual(evict_predictions(self.session, max_rows=1), 2)
+        self.assertEqual(self.session.query(CachedPrediction).count(), 1)
+        self.assertEqual(evict_predictions(self.session, max_age=timedelta(seconds=-1)), 1)
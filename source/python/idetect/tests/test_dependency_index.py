@@ -0,0 +1,94 @@
+import random
+from unittest import TestCase
+
+from idetect.dependency_index import DependencyIndex
+
+
+class StubToken(object):
+    """Stands in for a spaCy Token, with only its index and head"""
+
+    def __init__(self, doc, i):
+        self.doc = doc
+        self.i = i
+
+    @property
+    def head(self):
+        return self.doc[self.doc.heads[self.i]]
+
+
+class StubDoc(list):
+    """Stands in for a spaCy Doc built from the index of each token's head"""
+
+    def __init__(self, heads):
+        super().__init__()
+        self.heads = heads
+        self.extend(StubToken(self, i) for i in range(len(heads)))
+
+
+def random_heads(rng, sentence_lengths):
+    """Heads of a document whose sentences are random trees"""
+    heads = []
+    for length in sentence_lengths:
+        start = len(heads)
+        order = list(range(start, start + length))
+        rng.shuffle(order)
+        sentence_heads = {order[0]: order[0]}
+        for position in range(1, length):
+            sentence_heads[order[position]] = order[rng.randrange(position)]
+        heads.extend(sentence_heads[i] for i in range(start, start + length))
+    return heads
+
+
+def path_to_root(heads, i):
+    path = [i]
+    while heads[i] != i:
+        i = heads[i]
+        path.append(i)
+    return path
+
+
+class TestDependencyIndex(TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.heads = random_heads(rng, [1, 7, 30, 12])
+        self.index = DependencyIndex(StubDoc(self.heads))
+        self.n = len(self.heads)
+
+    def test_depth_and_subtree(self):
+        """Depths and subtree sizes match walks along the heads"""
+        for i in range(self.n):
+            self.assertEqual(len(path_to_root(self.heads, i)) - 1, self.index.depth[i])
+            size = sum(1 for j in range(self.n) if i in path_to_root(self.heads, j))
+            self.assertEqual(size, self.index.subtree_size(i))
+
+    def test_ancestors(self):
+        """Ancestor tests match walks along the heads"""
+        for a in range(self.n):
+            for b in range(self.n):
+                path = path_to_root(self.heads, b)
+                self.assertEqual(a in path[1:], self.index.is_ancestor(a, b))
+                self.assertEqual(a in path, self.index.is_ancestor_or_self(a, b))
+
+    def test_lca_and_distance(self):
+        """Lowest common ancestors and distances match walks along the heads"""
+        for a in range(self.n):
+            path_a = path_to_root(self.heads, a)
+            for b in range(self.n):
+                path_b = path_to_root(self.heads, b)
+                common = [t for t in path_a if t in path_b]
+                if common:
+                    self.assertEqual(common[0], self.index.lca(a, b))
+                    self.assertEqual(path_a.index(common[0]) + path_b.index(common[0]),
+                                     self.index.distance(a, b))
+                else:
+                    self.assertIsNone(self.index.lca(a, b))
+                    self.assertIsNone(self.index.distance(a, b))
+
+    def test_chain(self):
+        """Handles trees deeper than a power of two"""
+        heads = [0] + list(range(0, 99))
+        index = DependencyIndex(StubDoc(heads))
+        self.assertEqual(99, index.depth[99])
+        self.assertEqual(50, index.lca(50, 99))
+        self.assertEqual(49, index.distance(50, 99))
@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from idetect.doc_cache import DocCache, FULL, ENTITIES, TAGS
+
+
+class CountingNlp(object):
+    """Stands in for a spaCy pipeline, recording how often each text is parsed"""
+
+    def __init__(self):
+        self.parsed = []
+        self.components = []
+
+    def __call__(self, text, tag=True, parse=True, entity=True):
+        self.parsed.append(text)
+        self.components.append((tag, parse, entity))
+        return text.split()
+
+    def pipe(self, texts, tag=True, parse=True, entity=True, **kwargs):
+        for text in texts:
+            yield self(text, tag=tag, parse=parse, entity=entity)
+
+
+class TestDocCache(TestCase):
+
+    def test_parses_once(self):
+        """Each text is parsed once however many consumers ask for it"""
+        nlp = CountingNlp()
+        cache = DocCache(nlp)
+        texts = ["floods displaced 500 people", "the storm destroyed 20 homes"]
+        first = cache.pipe(texts)
+        second = cache.pipe(texts)
+        third = cache(texts[0])
+        self.assertEqual(nlp.parsed, texts)
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[0], third)
+        self.assertEqual(cache.hits, 3)
+
+    def test_duplicates_in_batch(self):
+        """Duplicate texts within one batch are parsed once"""
+        nlp = CountingNlp()
+        cache = DocCache(nlp)
+        docs = cache.pipe(["a b", "c d", "a b"])
+        self.assertEqual(nlp.parsed, ["a b", "c d"])
+        self.assertIs(docs[0], docs[2])
+
+    def test_bounded(self):
+        """Least recently used parses are evicted beyond max_size"""
+        nlp = CountingNlp()
+        cache = DocCache(nlp, max_size=2)
+        cache("a")
+        cache("b")
+        cache("a")
+        cache("c")
+        self.assertEqual(len(cache.docs), 2)
+        cache("a")
+        cache("b")
+        self.assertEqual(nlp.parsed, ["a", "b", "c", "b"])
+
+    def test_profiles(self):
+        """Only the components of a profile are run, and fuller parses are reused"""
+        nlp = CountingNlp()
+        cache = DocCache(nlp)
+        cache("a", TAGS)
+        cache("b", FULL)
+        self.assertEqual(nlp.components, [(True, False, False), (True, True, True)])
+        # "b" already has every component, "a" lacks the entity recognizer
+        cache.pipe(["a", "b"], ENTITIES)
+        self.assertEqual(nlp.parsed, ["a", "b", "a"])
+        self.assertEqual(nlp.components[-1], (True, False, True))
+        cache("a", TAGS)
+        cache("a", FULL)
+        self.assertEqual(nlp.parsed, ["a", "b", "a", "a"])
@@ -0,0 +1,88 @@
+import os
+import time
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from idetect.doc_cache import DocCache, content_hash
+from idetect.doc_store import DocStore
+
+
+class TestDocStore(TestCase):
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()
+        self.store = DocStore(self.dir.name, 'v1')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def age(self, key, seconds):
+        past = time.time() - seconds
+        os.utime(self.store.file_path(key), (past, past))
+
+    def test_round_trip(self):
+        """Stored bytes are read back, and missing keys return None"""
+        self.store.put('abcdef', b'parsed')
+        self.assertEqual(b'parsed', self.store.get('abcdef'))
+        self.assertIsNone(self.store.get('123456'))
+        self.assertIsNone(DocStore(self.dir.name, 'v2').get('abcdef'))
+        self.assertEqual([], [n for n in os.listdir(os.path.dirname(self.store.file_path('abcdef')))
+                              if n.endswith('.tmp')])
+
+    def test_evicts_old(self):
+        """Docs unused for longer than max_age are removed"""
+        self.store.max_age = 100
+        self.store.put('aa1', b'x')
+        self.store.put('aa2', b'x')
+        self.age('aa1', 200)
+        self.store.evict()
+        self.assertIsNone(self.store.get('aa1'))
+        self.assertEqual(b'x', self.store.get('aa2'))
+
+    def test_evicts_least_recently_used(self):
+        """The least recently used Docs are removed until the store fits max_bytes"""
+        self.store.max_bytes = 25
+        for i, key in enumerate(['bb1', 'bb2', 'bb3']):
+            self.store.put(key, b'0123456789')
+            self.age(key, 30 - i)
+        self.age('bb1', 1)  # used most recently
+        self.store.evict()
+        self.assertEqual(b'0123456789', self.store.get('bb1'))
+        self.assertIsNone(self.store.get('bb2'))
+        self.assertEqual(b'0123456789', self.store.get('bb3'))
+
+    def test_evicts_retired_versions(self):
+        """Docs of other model versions are removed once no process has used them for max_age"""
+        self.store.max_age = 100
+        DocStore(self.dir.name, 'v0').put('cc1', b'x')
+        DocStore(self.dir.name, 'v2').put('cc1', b'z')
+        self.store.put('cc1', b'y')
+        past = time.time() - 200
+        os.utime(os.path.join(self.dir.name, 'v0'), (past, past))
+        self.store.evict()
+        self.assertEqual(['v1', 'v2'], sorted(os.listdir(self.dir.name)))
+        self.assertEqual(b'z', DocStore(self.dir.name, 'v2').get('cc1'))
+
+
+class TestDocCacheStore(TestCase):
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_reuses_stored_parse(self):
+        """A process with an empty cache deserializes the parse another process stored"""
+        from idetect.fact_extractor import nlp
+        text = "2000 people have been evicted from their homes in Bosnia"
+        first = DocCache(nlp, store=DocStore(self.dir.name, 'v1'))
+        parsed = first(text)
+        second = DocCache(nlp, store=DocStore(self.dir.name, 'v1'))
+        loaded = second.pipe([text])[0]
+        self.assertEqual(0, second.misses)
+        self.assertEqual(1, second.store.hits)
+        self.assertEqual(parsed.to_bytes(), loaded.to_bytes())
+        self.assertEqual([(t.text, t.tag_, t.lemma_, t.dep_, t.head.i, t.ent_type_) for t in parsed],
+                         [(t.text, t.tag_, t.lemma_, t.dep_, t.head.i, t.ent_type_) for t in loaded])
+        self.assertTrue(os.path.isfile(second.store.file_path(content_hash(text))))
@@ -1,12 +1,17 @@
 import os
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from sqlalchemy import create_engine
 
+from idetect import fact_extractor
 from idetect.model import Base, Session, Status, Gkg, Analysis, DocumentContent, Country, Location, \
-    FactTerm, FactKeyword
-from idetect.fact_extractor import extract_facts, process_location
+    FactTerm, FactUnit, FactKeyword, KeywordType, Fact
+from idetect.fact_extractor import extract_facts, extract_facts_batch, process_location, get_interpreter, save_facts
+from idetect import interpreter as interpreter_module
+from idetect.interpreter import Report
+from idetect.doc_cache import TAGS, ENTITIES
 from idetect.load_data import load_countries, load_terms
+from idetect.worker import BatchWorker
 
 
 class TestFactExtractor(TestCase):
@@ -29,6 +34,18 @@ class TestFactExtractor(TestCase):
             self.session.delete(article)
         self.session.commit()
 
+    def test_reuses_interpreter_until_keywords_change(self):
+        """Keeps one Interpreter per process and rebuilds it when the keywords change"""
+        interpreter = get_interpreter(self.session)
+        self.assertIs(interpreter, get_interpreter(self.session))
+        self.session.add(FactKeyword(description='uprooted', keyword_type=KeywordType.PERSON_TERM))
+        self.session.commit()
+        fact_extractor._keywords_checked -= fact_extractor.KEYWORD_CHECK_INTERVAL + 1
+        reloaded = get_interpreter(self.session)
+        self.assertIsNot(interpreter, reloaded)
+        self.assertNotEqual(interpreter.keyword_version, reloaded.keyword_version)
+        self.assertIs(reloaded, get_interpreter(self.session))
+
     def test_extract_facts_simple(self):
         """Extracts simple facts when present and saves to DB"""
         gkg = Gkg()
@@ -44,6 +61,98 @@ class TestFactExtractor(TestCase):
         self.assertEqual(1, len(analysis.facts))
 
 
+    def test_extract_facts_batch(self):
+        """Extracts the same facts from a batch of analyses as from each one alone"""
+        contents = ["It was early Saturday when a flash flood hit the area and washed away more than 500 houses",
+                    "The election results were announced on Monday.",
+                    "2000 people have been evicted from their homes in Bosnia"]
+        analyses = []
+        for content_clean in contents:
+            analysis = Analysis(gkg=Gkg(), status=Status.NEW)
+            self.session.add(analysis)
+            content = DocumentContent(content_clean=content_clean)
+            self.session.add(content)
+            self.session.commit()
+            analysis.content_id = content.id
+            self.session.commit()
+            analyses.append(analysis)
+        extract_facts_batch(analyses, batch_size=2)
+        self.assertEqual([1, 0, 1], [len(a.facts) for a in analyses])
+        self.assertEqual(FactTerm.EVICTED, analyses[2].facts[0].term)
+
+    def test_failed_batch_keeps_no_facts(self):
+        """A batch failing on its second analysis saves no facts until each analysis is retried alone"""
+        contents = ["2000 people have been evicted from their homes in Bosnia",
+                    "Fighting in Aleppo forced 15,000 families to flee to Turkey on Monday."]
+        for content_clean in contents:
+            content = DocumentContent(content_clean=content_clean)
+            self.session.add(Analysis(gkg=Gkg(), status=Status.CLASSIFIED, content=content))
+            self.session.commit()
+        interpreter = get_interpreter(self.session)
+        process_parsed = interpreter.process_parsed
+
+        def fail_second(content, doc):
+            if content == contents[1]:
+                raise ValueError("Failed")
+            return process_parsed(content, doc)
+
+        worker = BatchWorker(lambda query: query.filter(Analysis.status == Status.CLASSIFIED),
+                             Status.EXTRACTING, Status.EXTRACTED, Status.EXTRACTING_FAILED,
+                             extract_facts_batch, self.session.get_bind(), batch_size=2)
+        with mock.patch.object(interpreter, 'process_parsed', side_effect=fail_second):
+            self.assertTrue(worker.work())
+        self.session.expire_all()
+        analyses = {a.content.content_clean: a for a in self.session.query(Analysis)}
+        self.assertEqual(Status.EXTRACTED, analyses[contents[0]].status)
+        self.assertEqual(1, len(analyses[contents[0]].facts))
+        self.assertEqual(Status.EXTRACTING_FAILED, analyses[contents[1]].status)
+        self.assertEqual(1, self.session.query(Fact).count())
+
+    def test_batch_saves_locations_once(self):
+        """Adds the locations of a whole batch in one call, before any of its facts"""
+        contents = ["Fighting in Aleppo forced 15,000 families to flee to Turkey on Monday.",
+                    "2000 people have been evicted from their homes in Bosnia"]
+        analyses = []
+        for content_clean in contents:
+            analysis = Analysis(gkg=Gkg(), status=Status.CLASSIFIED,
+                                content=DocumentContent(content_clean=content_clean))
+            self.session.add(analysis)
+            analyses.append(analysis)
+        self.session.commit()
+        with mock.patch.object(fact_extractor, 'save_locations',
+                               wraps=fact_extractor.save_locations) as save_locations:
+            extract_facts_batch(analyses)
+        save_locations.assert_called_once()
+        names = save_locations.call_args[0][0]
+        self.assertIn('Aleppo', names)
+        self.assertIn('Bosnia', names)
+        self.assertEqual(2, self.session.query(Fact).count())
+
+    def test_reparses_partial_profiles(self):
+        """Extracts the same reports after the classifier cached partial parses"""
+        stories = ["2000 people have been evicted from their homes in Bosnia",
+                   "Fighting in Aleppo forced 15,000 families to flee to Turkey on Monday."]
+        interpreter = get_interpreter(self.session)
+        fact_extractor.doc_cache.clear()
+        expected = [repr(r) for r in interpreter.process_articles(stories)]
+        fact_extractor.doc_cache.clear()
+        fact_extractor.doc_cache.pipe(stories[:1], TAGS)
+        fact_extractor.doc_cache.pipe(stories[1:], ENTITIES)
+        self.assertEqual(expected, [repr(r) for r in interpreter.process_articles(stories)])
+
+    def test_skips_sentences_without_terms(self):
+        """Sentences without a reporting term are skipped but still remember their locations"""
+        interpreter = get_interpreter(self.session)
+        story = interpreter.parse("Heavy fighting broke out in Aleppo on Monday. "
+                                  "More than 2000 people were displaced.")
+        first, second = list(story.sents)
+        self.assertFalse(interpreter.sentence_relevance(first))
+        self.assertTrue(interpreter.sentence_relevance(second))
+        self.assertEqual([], interpreter.process_sentence_new(first, [], story))
+        reports = interpreter.process_doc(story)
+        self.assertEqual(1, len(reports))
+        self.assertEqual(['Aleppo'], reports[0].locations)
+
     def test_extract_refugee_facts(self):
         """Extracts refugee-related facts with Refugee Term"""
         gkg = Gkg()
@@ -168,3 +277,74 @@ class TestFactExtractor(TestCase):
         extracted_location = fact.locations[0]
         self.assertEqual(location.id, extracted_location.id)
 
+    def test_save_facts_in_bulk(self):
+        """Saves several facts sharing new and existing locations"""
+        analysis = Analysis(gkg=Gkg(), status=Status.NEW)
+        self.session.add(analysis)
+        existing = Location(location_name='Bosnia')
+        self.session.add(existing)
+        self.session.commit()
+        reports = [Report(FactUnit.PEOPLE, FactTerm.EVICTED, ['Bosnia', 'Sarajevo', 'Bosnia'], 0, 40),
+                   Report(FactUnit.HOUSEHOLDS, FactTerm.DESTROYED, ['Sarajevo'], 41, 80),
+                   Report(FactUnit.PEOPLE, FactTerm.DISPLACED, [], 81, 120)]
+        save_facts(analysis, reports, self.session)
+        facts = sorted(analysis.facts, key=lambda f: f.excerpt_start)
+        self.assertEqual([FactTerm.EVICTED, FactTerm.DESTROYED, FactTerm.DISPLACED], [f.term for f in facts])
+        self.assertEqual({'Bosnia', 'Sarajevo'}, {l.location_name for l in facts[0].locations})
+        self.assertEqual(['Sarajevo'], [l.location_name for l in facts[1].locations])
+        self.assertEqual([], facts[2].locations)
+        self.assertIn(existing.id, [l.id for l in facts[0].locations])
+        self.assertEqual(1, self.session.query(Location).filter_by(location_name='Sarajevo').count())
+
+    def test_chunked_extraction(self):
+        """Long stories are processed in chunks with offsets into the whole story"""
+        interpreter = get_interpreter(self.session)
+        story = ("Heavy fighting broke out in Aleppo on Monday. " * 5 +
+                 "More than 2000 people were displaced. " +
+                 "The election results were announced on Tuesday. " * 5)
+        expected = interpreter.process_article_new(story)
+        interpreter.chunk_size = 250
+        try:
+            reports = interpreter.process_article_new(story)
+        finally:
+            interpreter.chunk_size = interpreter_module.CHUNK_SIZE
+        self.assertEqual(expected, reports)
+        report = reports[0]
+        self.assertEqual("More than 2000 people were displaced.",
+                         story[report.sentence_start:report.sentence_end])
+        # the locations come from a sentence in the previous chunk
+        self.assertEqual(['Aleppo'], report.locations)
+        self.assertEqual(expected[0].tag_spans, report.tag_spans)
+
+    def test_chunked_article_relevance(self):
+        """Chunks are processed with the relevance of the whole article"""
+        interpreter = get_interpreter(self.session)
+        story = ("A powerful earthquake struck the region on Sunday. " +
+                 "The election results were announced on Monday. " * 5 +
+                 "The disaster affected 2000 people in Bosnia.")
+        expected = interpreter.process_article_new(story)
+        self.assertEqual(1, len(expected))
+        interpreter.chunk_size = 150
+        try:
+            with mock.patch.object(interpreter, 'nlp', wraps=interpreter.nlp) as nlp:
+                reports = interpreter.process_article_new(story)
+        finally:
+            interpreter.chunk_size = interpreter_module.CHUNK_SIZE
+        self.assertEqual(expected, reports)
+        # one parse per chunk
+        self.assertEqual(len(list(interpreter_module.chunk_text(story, 150))), nlp.call_count)
+
+    def test_chunked_article_relevance_found_later(self):
+        """Chunks processed before the article is found relevant are processed again"""
+        interpreter = get_interpreter(self.session)
+        story = ("The disaster affected 2000 people in Bosnia. " +
+                 "The election results were announced on Monday. " * 5 +
+                 "A powerful earthquake struck the region on Sunday.")
+        expected = interpreter.process_article_new(story)
+        self.assertEqual(1, len(expected))
+        interpreter.chunk_size = 150
+        try:
+            reports = interpreter.process_article_new(story)
+        finally:
+            interpreter.chunk_size = interpreter_module.CHUNK_SIZE
+        self.assertEqual(expected, reports)
@@ -0,0 +1,21 @@
+from unittest import TestCase
+
+import pycountry
+
+from idetect.geotagger import match_country_name, subdivision_country_code
+from idetect.tests.gazetteer_reference import linear_country_name, linear_subdivision_country_code
+
+
+class TestGazetteer(TestCase):
+    names = ['Syria', 'Bolivia, Plurinational State of', 'Bolivia', 'Republic of Chile', 'Taiwan',
+             'Ontario', 'ontario', 'Bavaria', 'Bayern', 'Quebec', 'Québec', 'Texas', 'Aleppo',
+             'Paris', 'Atlantis', '']
+
+    def test_country_name_matches_scan(self):
+        names = self.names + [c.name for c in pycountry.countries]
+        for name in names:
+            self.assertEqual(match_country_name(name), linear_country_name(name), name)
+
+    def test_subdivision_matches_scan(self):
+        for name in self.names:
+            self.assertEqual(subdivision_country_code(name), linear_subdivision_country_code(name), name)
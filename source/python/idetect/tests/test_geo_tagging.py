@@ -6,7 +6,8 @@ from sqlalchemy import create_engine
 from idetect.model import Base, Session, Status, Gkg, Analysis, DocumentContent, Country, Location, LocationType, Fact
 from idetect.load_data import load_countries
 from idetect.fact_extractor import extract_facts
-from idetect.geotagger import get_geo_info, process_locations, nominatim_coordinates, GeotagException
+from idetect.geotagger import get_geo_info, process_locations, nominatim_coordinates, GeotagException, \
+    seed_gkg_locations, get_gkg_geo_info
 
 
 class TestGeoTagger(TestCase):
@@ -147,4 +148,50 @@ class TestGeoTagger(TestCase):
         with self.assertRaises(GeotagException):
             process_locations(analysis)
 
+    @mock.patch('idetect.geotagger.nominatim_coordinates')
+    def test_geotag_from_gkg_locations(self, nominatim):
+        """Uses the locations geocoded by GDELT instead of calling Nominatim"""
+        gkg = Gkg(
+            id=3771256,
+            document_identifier="http://www.example.com/aleppo",
+            locations="4#Aleppo, Halab, Syria#SY#SY09#36.2028#37.1586#-2232744;"
+                      "4#Paris, Ile-de-France, France#FR#FRA8#48.8667#2.33333#-1456928;"
+                      "3#Paris, Texas, United States#US#USTX#33.6609#-95.5555#1343477"
+        )
+        self.session.add(gkg)
+        analysis = Analysis(gkg=gkg, status=Status.NEW)
+        self.session.add(analysis)
+        seed_gkg_locations(self.session, [gkg])
+        self.session.commit()
+        self.assertIsNone(get_gkg_geo_info("Paris", self.session))
+
+        fact = Fact(unit='person', term='displaced')
+        fact.locations.append(Location(location_name="Aleppo"))
+        analysis.facts.append(fact)
+        self.session.commit()
+        process_locations(analysis)
+        location = fact.locations[0]
+        self.assertEqual('SYR', location.country_iso3)
+        self.assertEqual(LocationType.CITY, location.location_type)
+        self.assertEqual('36.2028,37.1586', location.latlong)
+        assert not nominatim.called
+
+    @mock.patch('idetect.geotagger.nominatim_coordinates')
+    def test_country_name_before_gkg_locations(self, nominatim):
+        """Matches country names exactly before using the locations geocoded by GDELT"""
+        nominatim.return_value = {'place_name': 'Georgia', 'type': LocationType.COUNTRY,
+                                  'country_code': 'GEO', 'coordinates': '42.0,43.5', 'flag': 'single-result'}
+        gkg = Gkg(
+            id=3771257,
+            document_identifier="http://www.example.com/georgia",
+            locations="2#Georgia, United States#US#USGA#32.9866#-83.6487#GA"
+        )
+        self.session.add(gkg)
+        seed_gkg_locations(self.session, [gkg])
+        self.session.commit()
+        self.assertEqual('USA', get_gkg_geo_info("Georgia", self.session)['country_code'])
 
+        results = get_geo_info("Georgia", self.session)
+        self.assertEqual('GEO', results['country_code'])
+        self.assertEqual('country', results['type'])
+        nominatim.assert_called_once_with("Georgia", 'GEO')
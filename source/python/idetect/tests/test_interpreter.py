@@ -0,0 +1,78 @@
+from datetime import datetime
+from unittest import TestCase
+
+from idetect.interpreter import get_absolute_date, resolve_date, cached_resolve_date, Report, merge_reports, \
+    chunk_text
+from idetect.model import FactUnit, FactTerm
+
+
+class TestAbsoluteDate(TestCase):
+
+    def setUp(self):
+        cached_resolve_date.cache_clear()
+        self.publication_date = datetime(2017, 3, 15)
+
+    def test_matches_uncached(self):
+        """Cached resolutions equal resolving each string afresh"""
+        for date_string in ["last week", "on Monday", "2015", "12 March", "yesterday", "no date here"]:
+            self.assertEqual(resolve_date(date_string.lower(), self.publication_date),
+                             get_absolute_date(date_string, self.publication_date))
+
+    def test_reuses_resolution(self):
+        """Repeated strings differing only in case are resolved once per publication date"""
+        first = get_absolute_date("Last week", self.publication_date)
+        self.assertEqual(first, get_absolute_date("last week ", self.publication_date))
+        self.assertEqual(1, cached_resolve_date.cache_info().hits)
+        get_absolute_date("last week", datetime(2017, 4, 1))
+        self.assertEqual(2, cached_resolve_date.cache_info().misses)
+
+    def test_without_publication_date(self):
+        """Dates relative to the current time are not cached"""
+        get_absolute_date("last week")
+        self.assertEqual(0, cached_resolve_date.cache_info().currsize)
+
+
+class TestReports(TestCase):
+
+    def report(self, locations, term=FactTerm.DISPLACED, start=0):
+        return Report(FactUnit.PEOPLE, term, locations, start, 40)
+
+    def test_value_identity(self):
+        """Reports stating the same fact are equal, whatever the order of their locations"""
+        self.assertEqual(self.report(['Aleppo', 'Syria']), self.report(['Syria', 'Aleppo']))
+        self.assertEqual(1, len({self.report(['Aleppo']), self.report(['Aleppo'])}))
+        self.assertNotEqual(self.report(['Aleppo']), self.report(['Aleppo'], term=FactTerm.EVICTED))
+        self.assertNotEqual(self.report(['Aleppo']), self.report(['Aleppo'], start=1))
+
+    def test_merge(self):
+        """Duplicates and reports with fewer locations are merged, keeping the order found"""
+        evicted = self.report([], term=FactTerm.EVICTED)
+        aleppo = self.report(['Aleppo'])
+        both = self.report(['Aleppo', 'Syria'])
+        homs = self.report(['Homs'])
+        merged = merge_reports([evicted, aleppo, self.report(['Aleppo']), homs, both, self.report([])])
+        self.assertEqual([evicted, homs, both], merged)
+        self.assertIs(both, merged[2])
+
+
+class TestChunkText(TestCase):
+
+    def test_sentence_aligned(self):
+        """Chunks cover the text, fit the size and end at sentence breaks"""
+        text = " ".join("Sentence number {} is here.".format(i) for i in range(200))
+        chunks = list(chunk_text(text, 100))
+        self.assertEqual(text, "".join(chunk for _, chunk in chunks))
+        for offset, chunk in chunks:
+            self.assertEqual(text[offset:offset + len(chunk)], chunk)
+            self.assertLessEqual(len(chunk), 100)
+        for _, chunk in chunks[:-1]:
+            self.assertTrue(chunk.endswith(". "))
+
+    def test_long_sentence(self):
+        """A sentence longer than a chunk is split at a space, or anywhere without one"""
+        self.assertEqual([(0, "aaa bbb "), (8, "ccc")], list(chunk_text("aaa bbb ccc", 9)))
+        self.assertEqual([(0, "aaaa"), (4, "aaaa"), (8, "a")], list(chunk_text("a" * 9, 4)))
+
+    def test_short(self):
+        self.assertEqual([(0, "Short.")], list(chunk_text("Short.", 100)))
+        self.assertEqual([], list(chunk_text("", 100)))
@@ -0,0 +1,73 @@
+import os
+from unittest import TestCase
+
+from sqlalchemy import create_engine
+
+from idetect import keyword_screen
+from idetect.keyword_screen import KeywordScreen, get_keyword_screen
+from idetect.load_data import load_terms
+from idetect.model import Base, Session, FactKeyword, KeywordType
+
+
+class TestKeywordScreen(TestCase):
+
+    def setUp(self):
+        self.screen = KeywordScreen(['displaced', 'flee', 'relief camp', 'destroyed', 'Rainstorm'])
+
+    def test_matches_inflections(self):
+        self.assertTrue(self.screen.matches("Thousands were displaced by the floods"))
+        self.assertTrue(self.screen.matches("The displacement of villagers continued"))
+        self.assertTrue(self.screen.matches("Houses destroying everything"))
+        self.assertTrue(self.screen.matches("Heavy rainstorms hit the coast"))
+
+    def test_matches_irregular_forms(self):
+        self.assertTrue(self.screen.matches("Families fled the fighting"))
+
+    def test_matches_words_of_phrases(self):
+        self.assertTrue(self.screen.matches("They moved to a camp outside the city"))
+
+    def test_no_keywords(self):
+        self.assertFalse(self.screen.matches("The election results were announced on Monday"))
+        self.assertFalse(self.screen.matches(""))
+        self.assertFalse(self.screen.matches(None))
+
+    def test_counts(self):
+        self.screen.screen("Families fled the fighting")
+        self.screen.screen("The match was cancelled")
+        self.screen.screen("The election results were announced")
+        self.assertEqual(self.screen.hits, 1)
+        self.assertEqual(self.screen.skips, 2)
+
+
+class TestGetKeywordScreen(TestCase):
+
+    def setUp(self):
+        db_host = os.environ.get('DB_HOST')
+        db_url = 'postgresql://{user}:{passwd}@{db_host}/{db}'.format(
+            user='tester', passwd='tester', db_host=db_host, db='idetect_test')
+        engine = create_engine(db_url)
+        Session.configure(bind=engine)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        load_terms(self.session)
+
+    def tearDown(self):
+        self.session.rollback()
+        self.session.query(FactKeyword).delete()
+        self.session.commit()
+
+    def test_reuses_screen_until_keywords_change(self):
+        """Keeps one KeywordScreen per process and rebuilds it when the keywords change"""
+        screen = get_keyword_screen(self.session)
+        self.assertIs(screen, get_keyword_screen(self.session))
+        self.assertFalse(screen.matches("Villagers were uprooted on Monday"))
+        screen.screen("The election results were announced")
+        self.session.add(FactKeyword(description='uprooted', keyword_type=KeywordType.PERSON_TERM))
+        self.session.commit()
+        keyword_screen._keywords_checked -= keyword_screen.KEYWORD_CHECK_INTERVAL + 1
+        reloaded = get_keyword_screen(self.session)
+        self.assertIsNot(screen, reloaded)
+        self.assertTrue(reloaded.matches("Villagers were uprooted on Monday"))
+        self.assertEqual(1, reloaded.skips)
+        self.assertIs(reloaded, get_keyword_screen(self.session))
@@ -0,0 +1,52 @@
+import os
+from unittest import TestCase
+
+from sqlalchemy import create_engine
+
+from idetect.location_cache import LocationCache
+from idetect.model import Base, Session, Location, Fact, Country
+
+
+class TestLocationCache(TestCase):
+    def setUp(self):
+        db_host = os.environ.get('DB_HOST')
+        db_url = 'postgresql://{user}:{passwd}@{db_host}/{db}'.format(
+            user='tester', passwd='tester', db_host=db_host, db='idetect_test')
+        engine = create_engine(db_url)
+        Session.configure(bind=engine)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add(Country(iso3='SYR', preferred_term='Syria'))
+        self.syria = Location(location_name='Syria', country_iso3='SYR', location_type='country')
+        self.aleppo = Location(location_name='Aleppo', country_iso3='SYR', location_type='city')
+        self.session.add_all([self.syria, self.aleppo])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.rollback()
+        self.session.query(Fact).delete()
+        self.session.query(Location).delete()
+        self.session.commit()
+
+    def test_bounded(self):
+        """Least recently used names are evicted beyond max_size"""
+        cache = LocationCache(max_size=2)
+        cache.put('Syria', self.syria.id)
+        cache.put('Aleppo', self.aleppo.id)
+        cache.get('Syria')
+        cache.put('Atlantis', self.aleppo.id + 1)
+        self.assertIn('Syria', cache)
+        self.assertNotIn('Aleppo', cache)
+
+    def test_warm(self):
+        """Loads the locations most referenced by facts"""
+        for locations in [[self.aleppo], [self.aleppo, self.syria], [self.aleppo]]:
+            fact = Fact(unit='Person', term='Displaced')
+            fact.locations.extend(locations)
+            self.session.add(fact)
+        self.session.commit()
+        cache = LocationCache()
+        cache.warm(self.session, limit=1)
+        self.assertEqual(self.aleppo.id, cache.get('Aleppo'))
+        self.assertNotIn('Syria', cache)
@@ -0,0 +1,104 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+from scipy import sparse
+from sklearn.externals import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+from sklearn.pipeline import Pipeline, FeatureUnion
+from sklearn.svm import LinearSVC
+
+from idetect.nlp_models.base_model import DownloadableModel, CustomSklLsiModel
+from idetect.nlp_models.compiled import CompiledModel
+from idetect.nlp_models.export import export_model, verify_model
+
+
+class TestDownloadableModel(TestCase):
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()
+        self.model_path = os.path.join(self.dir.name, 'svm.pkl')
+        X = np.random.RandomState(0).rand(20, 5)
+        y = (X[:, 0] > 0.5).astype(int)
+        self.svm = LinearSVC().fit(X, y)
+        self.X = X
+        joblib.dump(self.svm, self.model_path, compress=3)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_memory_maps_arrays(self):
+        """Loads model arrays memory-mapped from an uncompressed copy"""
+        model = DownloadableModel().load_model(self.model_path, None)
+        self.assertIsInstance(model.coef_, np.memmap)
+        self.assertTrue(os.path.isfile(self.model_path + '.mmap'))
+        np.testing.assert_array_equal(model.predict(self.X), self.svm.predict(self.X))
+
+    def test_without_mmap(self):
+        """Loads model arrays into memory when mmap_mode is None"""
+        loader = DownloadableModel()
+        loader.mmap_mode = None
+        model = loader.load_model(self.model_path, None)
+        self.assertNotIsInstance(model.coef_, np.memmap)
+        self.assertFalse(os.path.isfile(self.model_path + '.mmap'))
+
+
+class TestCustomSklLsiModel(TestCase):
+
+    def setUp(self):
+        texts = ['thousands of people fled the floods', 'the floods destroyed houses',
+                 'people were displaced by fighting', 'fighting destroyed the village',
+                 'the election results were announced', 'the results of the match']
+        self.X = TfidfVectorizer().fit_transform(texts)
+        self.lsi = CustomSklLsiModel(num_topics=4).fit(self.X)
+
+    def transform_by_document(self, X):
+        """Transform documents in gensim's bag of words format, which projects them one at a time"""
+        return self.lsi.transform([list(zip(row.indices, row.data)) for row in X])
+
+    def test_batch_projection_matches_loop(self):
+        """Projecting the sparse matrix at once gives the same topics as the per document loop"""
+        X = sparse.vstack([self.X, sparse.csr_matrix((1, self.X.shape[1]))]).tocsr()
+        np.testing.assert_allclose(self.lsi.transform(X), self.transform_by_document(X), rtol=1e-6, atol=1e-12)
+
+
+class TestCompiledModel(TestCase):
+    texts = ['thousands of people fled the floods', 'the floods destroyed 200 houses',
+             'people were displaced by fighting', 'fighting destroyed the village',
+             'the election results were announced', 'the results of the match',
+             'evacuations after the earthquake', 'the match was cancelled after floods']
+    labels = [1, 1, 1, 1, 0, 0, 1, 0]
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'model.npz')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def check_export(self, model):
+        model.fit(self.texts, self.labels)
+        export_model(model, self.path, 'abc')
+        compiled = CompiledModel(self.path)
+        self.assertEqual(compiled.model_hash, 'abc')
+        unseen = ['floods displaced thousands', 'the results of the election', '']
+        self.assertEqual(verify_model(model, compiled, self.texts + unseen), [])
+
+    def test_tfidf_lsi_svm(self):
+        """Reproduces a TF-IDF, LSI and linear SVM pipeline"""
+        self.check_export(Pipeline([
+            ('tfidf', TfidfVectorizer(ngram_range=(1, 2), stop_words='english', sublinear_tf=True)),
+            ('lsi', CustomSklLsiModel(num_topics=3)),
+            ('clf', LinearSVC()),
+        ]))
+
+    def test_feature_union(self):
+        """Reproduces a union of weighted feature pipelines"""
+        self.check_export(Pipeline([
+            ('features', FeatureUnion([
+                ('counts', CountVectorizer(binary=True)),
+                ('tfidf', Pipeline([('tfidf', TfidfVectorizer(norm='l1')), ('lsi', CustomSklLsiModel(num_topics=2))])),
+            ], transformer_weights={'tfidf': 0.5})),
+            ('clf', LinearSVC()),
+        ]))
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from idetect.doc_cache import FULL, ENTITIES, TAGS, profile_kwargs
+from idetect.fact_extractor import nlp
+from idetect.nlp_models import preprocessing
+from idetect.spacy_pipeline import get_nlp, TokenizedPipeline
+
+STOP_WORDS = {'the', 'and', 'were', 'from', 'their', 'have', 'been'}
+
+TEXTS = [
+    "It was early Saturday when a flash flood hit the area and washed away more than 500 houses",
+    "2000 people have been evicted from their homes in Bosnia",
+    "Fighting in Aleppo, Syria forced 15,000 families to flee to Turkey on 12 March 2017.",
+    "The hurricane destroyed 300 homes in Texas and left thousands homeless.",
+    "The election results were announced on Monday.",
+]
+
+
+class TestNlpProfiles(TestCase):
+
+    def parse(self, profile):
+        return [nlp(text, **profile_kwargs(profile)) for text in TEXTS]
+
+    def test_location_profile(self):
+        """Places are tagged the same without the dependency parser"""
+        self.assertEqual(preprocessing.location_strings(self.parse(ENTITIES)),
+                         preprocessing.location_strings(self.parse(FULL)))
+
+    def test_pos_profile(self):
+        """Part of speech tags and lemmas are the same from the tagger alone"""
+        self.assertEqual(preprocessing.pos_strings(self.parse(TAGS), STOP_WORDS),
+                         preprocessing.pos_strings(self.parse(FULL), STOP_WORDS))
+
+    def test_date_entities(self):
+        """Date entities are the same without the dependency parser"""
+        def dates(docs):
+            return [[(e.start, e.end) for e in d.ents if e.label_ == 'DATE'] for d in docs]
+        self.assertEqual(dates(self.parse(ENTITIES)), dates(self.parse(FULL)))
+
+    def test_tokenized_pipeline(self):
+        """Running the components over the pipeline's own tokenizer parses as the pipeline does"""
+        plain = get_nlp()
+        pipeline = TokenizedPipeline(plain, plain.tokenizer)
+
+        def tokens(docs):
+            return [[(t.text, t.tag_, t.lemma_, t.dep_, t.head.i, t.ent_type_) for t in d] for d in docs]
+        for profile in (FULL, ENTITIES, TAGS):
+            expected = tokens(plain(text, **profile_kwargs(profile)) for text in TEXTS)
+            self.assertEqual(expected, tokens(pipeline(text, **profile_kwargs(profile)) for text in TEXTS))
+            self.assertEqual(expected, tokens(pipeline.pipe(TEXTS, **profile_kwargs(profile))))
+
+    def test_extraction_tokenizer(self):
+        """Hyphenated numbers are single tokens for fact extraction only, not for the classifiers"""
+        text = "Forty-five families fled the village"
+        self.assertEqual('Forty-five', nlp(text, **profile_kwargs(TAGS))[0].text)
+        self.assertNotEqual('Forty-five', get_nlp()(text, **profile_kwargs(TAGS))[0].text)
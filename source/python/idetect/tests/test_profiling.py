@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+from idetect import profiling
+from idetect.profiling import profiled, collect, timed, Profile
+
+
+@profiled()
+def outer(n):
+    return sum(inner(i) for i in range(n))
+
+
+@profiled('inner step')
+def inner(i):
+    return i
+
+
+class TestProfiling(TestCase):
+
+    def setUp(self):
+        self.enabled = profiling.ENABLED
+        profiling.ENABLED = True
+
+    def tearDown(self):
+        profiling.ENABLED = self.enabled
+
+    def test_collect(self):
+        """Records calls and inclusive times in the open profiles"""
+        total_calls = profiling.totals.calls.get('inner step', 0)
+        with collect() as profile:
+            self.assertEqual(3, outer(3))
+        self.assertEqual({'outer': 1, 'inner step': 3}, profile.calls)
+        self.assertGreaterEqual(profile.seconds['outer'], profile.seconds['inner step'])
+        self.assertEqual(total_calls + 3, profiling.totals.calls['inner step'])
+        outer(1)
+        self.assertEqual(1, profile.calls['outer'])
+
+    def test_nested(self):
+        """Nested collections both record the calls made inside the inner one"""
+        with collect() as batch:
+            inner(0)
+            with collect() as article:
+                inner(1)
+        self.assertEqual(2, batch.calls['inner step'])
+        self.assertEqual(1, article.calls['inner step'])
+
+    def test_timed(self):
+        """Timed blocks are recorded like profiled calls, including the profiled calls inside them"""
+        with collect() as profile:
+            with timed('block'):
+                outer(2)
+        self.assertEqual(1, profile.calls['block'])
+        self.assertGreaterEqual(profile.seconds['block'], profile.seconds['outer'])
+
+    def test_disabled(self):
+        """Nothing is recorded when profiling is disabled"""
+        profiling.ENABLED = False
+        with collect() as profile:
+            outer(2)
+            with timed('block'):
+                inner(0)
+        self.assertEqual({}, profile.calls)
+
+    def test_merge(self):
+        """Merged profiles add a share of the time and all the calls"""
+        batch = Profile()
+        batch.add('parse', 4.0)
+        article = Profile()
+        article.add('parse', 1.0)
+        article.merge(batch, 0.25)
+        self.assertEqual({'parse': {'calls': 2, 'seconds': 2.0}}, article.as_dict())
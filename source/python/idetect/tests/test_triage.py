@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from idetect.gdelt import parse_themes, parse_counts
+from idetect.model import Gkg, Status
+from idetect.triage import triage, score_gkg
+
+
+class TestTriage(TestCase):
+
+    def test_parse_themes(self):
+        """Parses both V1 and V2 enhanced theme fields"""
+        self.assertEqual(parse_themes("REFUGEES;TAX_FNCACT_REFUGEES;"), ["REFUGEES", "TAX_FNCACT_REFUGEES"])
+        self.assertEqual(parse_themes("REFUGEES,120;UNHCR,240;"), ["REFUGEES", "UNHCR"])
+        self.assertEqual(parse_themes(None), [])
+
+    def test_parse_counts(self):
+        """Parses counts and skips malformed blocks"""
+        counts = parse_counts("AFFECT#5000#people#1#Kenya#KE#KE#1#38#KE#123;KILL#x#people;")
+        self.assertEqual(counts, [("AFFECT", 5000, "people")])
+
+    def test_skips_irrelevant(self):
+        """Skips records whose themes have nothing to do with displacement"""
+        gkg = Gkg(v2_themes="SOC_POINTSOFINTEREST,10;TAX_SPORTS,40;ECON_STOCKMARKET,80;")
+        self.assertEqual(triage(gkg)[0], Status.SKIPPED)
+
+    def test_keeps_records_without_themes(self):
+        """Records without enough themes are always scraped"""
+        self.assertEqual(triage(Gkg())[0], Status.NEW)
+        self.assertEqual(triage(Gkg(v2_themes="TAX_SPORTS,40;"))[0], Status.NEW)
+
+    def test_prioritises_displacement(self):
+        """Displacement themes and counts score higher than generic disaster themes"""
+        displacement = Gkg(v2_themes="TAX_FNCACT_REFUGEES,10;DISPLACED,40;NATURAL_DISASTER_FLOODS,80;",
+                           v2_counts="AFFECT#5000#people#1#Kenya#KE#KE#1#38#KE#123;")
+        disaster = Gkg(v2_themes="NATURAL_DISASTER_FLOODS,80;TAX_SPORTS,40;ECON_STOCKMARKET,80;")
+        status, priority = triage(displacement)
+        self.assertEqual(status, Status.NEW)
+        self.assertGreater(priority, score_gkg(disaster)[0])
+        self.assertGreater(score_gkg(disaster)[0], 0)
@@ -9,7 +9,8 @@ from unittest import TestCase
 from sqlalchemy import create_engine, func
 
 from idetect.model import Base, Session, Status, Gkg, Analysis
-from idetect.worker import Worker, Initiator
+from idetect.triage import triage
+from idetect.worker import Worker, BatchWorker, Initiator
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -215,3 +216,77 @@ class TestWorker(TestCase):
         self.assertEqual(self.session.query(Analysis).count(), 0)
         self.assertEqual(initiator.work_all(), 1)
         self.assertEqual(self.session.query(Analysis).filter(Analysis.status == Status.NEW).count(), 3)
+
+    def test_initiator_triage(self):
+        relevant = Gkg(document_identifier="http://example.com/relevant",
+                       v2_themes="REFUGEES,10;DISPLACED,40;NATURAL_DISASTER_FLOODS,80;")
+        irrelevant = Gkg(document_identifier="http://example.com/irrelevant",
+                         v2_themes="TAX_SPORTS,10;ECON_STOCKMARKET,40;SOC_POINTSOFINTEREST,80;")
+        self.session.add_all([relevant, irrelevant])
+        self.session.commit()
+        initiator = Initiator(self.engine, triage_function=triage)
+        self.assertEqual(initiator.work_all(), 1)
+        self.assertEqual(self.session.query(Analysis).filter(Analysis.status == Status.NEW).count(), 1)
+        self.assertEqual(self.session.query(Analysis).filter(Analysis.status == Status.SKIPPED).count(), 1)
+
+        worker = Worker(scraping_filter, Status.SCRAPING, Status.SCRAPED, Status.SCRAPING_FAILED,
+                        TestWorker.nap_fn, self.engine,
+                        order_by=(Analysis.priority.desc().nullslast(), Analysis.updated))
+        self.assertEqual(worker.work_all(), 1)
+        scraped = self.session.query(Analysis).filter(Analysis.status == Status.SCRAPED).one()
+        self.assertEqual(scraped.gkg_id, relevant.id)
+
+    @staticmethod
+    def batch_nap_fn(analyses):
+        for analysis in analyses:
+            TestWorker.nap_fn(analysis)
+
+    @staticmethod
+    def batch_err_fn(analyses):
+        for analysis in analyses:
+            if analysis.gkg.document_identifier.endswith("bad"):
+                raise RuntimeError("Nope")
+
+    @staticmethod
+    def batch_stall_fn(analyses):
+        if len(analyses) > 1:
+            raise RuntimeError("Retry one at a time")
+        if analyses[0].gkg.document_identifier.endswith("slow"):
+            time.sleep(5)
+
+    def test_batch_work(self):
+        worker = BatchWorker(scraping_filter, Status.SCRAPING, Status.SCRAPED, Status.SCRAPING_FAILED,
+                             TestWorker.batch_nap_fn, self.engine, batch_size=2)
+        for i in range(3):
+            gkg = Gkg(document_identifier="http://www.example.com/{}".format(i))
+            self.session.add(Analysis(gkg=gkg, status=Status.NEW))
+            self.session.commit()
+        self.assertEqual(worker.work_all(), 2)
+        self.assertEqual(self.session.query(Analysis).filter(Analysis.status == Status.SCRAPED).count(), 3)
+        self.assertFalse(worker.work(), "Worker found work")
+
+    def test_batch_work_failure(self):
+        worker = BatchWorker(scraping_filter, Status.SCRAPING, Status.SCRAPED, Status.SCRAPING_FAILED,
+                             TestWorker.batch_err_fn, self.engine, batch_size=3)
+        for url in ["http://www.example.com/good", "http://www.example.com/bad", "http://www.example.com/fine"]:
+            self.session.add(Analysis(gkg=Gkg(document_identifier=url), status=Status.NEW))
+            self.session.commit()
+        self.assertTrue(worker.work(), "Worker didn't find work")
+        self.assertEqual(self.session.query(Analysis).filter(Analysis.status == Status.SCRAPED).count(), 2)
+        failed = self.session.query(Analysis).filter(Analysis.status == Status.SCRAPING_FAILED).one()
+        self.assertEqual(failed.gkg.document_identifier, "http://www.example.com/bad")
+        self.assertIn("Nope", failed.error_msg)
+
+    def test_batch_work_single_timeouts(self):
+        """Each analysis retried on its own gets its own timeout"""
+        worker = BatchWorker(scraping_filter, Status.SCRAPING, Status.SCRAPED, Status.SCRAPING_FAILED,
+                             TestWorker.batch_stall_fn, self.engine, batch_size=3, timeout_seconds=3)
+        for url in ["http://www.example.com/slow", "http://www.example.com/also-slow", "http://www.example.com/fine"]:
+            self.session.add(Analysis(gkg=Gkg(document_identifier=url), status=Status.NEW))
+            self.session.commit()
+        self.assertTrue(worker.work(), "Worker didn't find work")
+        self.assertEqual(self.session.query(Analysis).filter(Analysis.status == Status.SCRAPED).count(), 1)
+        failed = self.session.query(Analysis).filter(Analysis.status == Status.SCRAPING_FAILED).all()
+        self.assertEqual(2, len(failed))
+        for analysis in failed:
+            self.assertIn(os.strerror(errno.ETIME), analysis.error_msg)
@@ -0,0 +1,102 @@
+'''Method(s) for triaging GDELT records before they are scraped.
+
+GDELT already tags every GKG record with themes and extracted counts.
+Records whose tags say nothing about displacement, disasters or conflict are
+very unlikely to yield facts, so they are skipped rather than scraped, and
+the remaining records are prioritised by how promising their tags look.
+'''
+from idetect.gdelt import parse_themes, parse_counts
+from idetect.model import Status
+
+# Weights for individual GKG themes
+THEME_WEIGHTS = {
+    'DISPLACED': 10,
+    'REFUGEES': 10,
+    'EVICTION': 10,
+    'EVACUATION': 8,
+    'CRISISLEX_T10_DISPLACEDRELOCATEDEVACUATED': 10,
+    'CRISISLEX_C05_NEED_OF_SHELTERS': 8,
+    'CRISISLEX_C07_SAFETY': 2,
+    'CRISISLEX_T03_DEAD': 2,
+    'CRISISLEX_T02_INJURED': 2,
+    'CRISISLEX_T08_MISSINGFOUNDTRAPPEDPEOPLE': 4,
+    'CRISISLEX_CRISISLEXREC': 2,
+    'HOMELESSNESS': 6,
+    'UNHCR': 6,
+    'HUMANITARIAN_CRISIS': 4,
+    'ARMEDCONFLICT': 3,
+    'REBELLION': 2,
+    'TERROR': 2,
+    'KILL': 1,
+}
+
+# Weights for families of GKG themes, matched on the start of the theme code
+THEME_PREFIX_WEIGHTS = (
+    ('TAX_FNCACT_REFUGEE', 10),
+    ('TAX_FNCACT_EVACUEE', 8),
+    ('TAX_FNCACT_MIGRANT', 4),
+    ('NATURAL_DISASTER', 5),
+    ('MANMADE_DISASTER', 3),
+    ('CRISISLEX_', 1),
+    ('WB_2433_CONFLICT_AND_VIOLENCE', 2),
+)
+
+# Weights for GKG count types, scaled by how large the count is
+COUNT_WEIGHTS = {
+    'DISPLACED': 10,
+    'EVACUATION': 8,
+    'REFUGEES': 8,
+    'AFFECT': 5,
+    'KILL': 1,
+    'WOUND': 1,
+}
+
+# Records with fewer themes than this are never skipped: too little signal
+MIN_THEMES_TO_SKIP = 3
+
+_theme_score_cache = {}
+
+
+def theme_score(theme):
+    '''Return the weight of a single theme code.
+    Prefix matches are resolved once per distinct theme and memoised.
+    '''
+    try:
+        return _theme_score_cache[theme]
+    except KeyError:
+        pass
+    score = THEME_WEIGHTS.get(theme)
+    if score is None:
+        score = max((w for p, w in THEME_PREFIX_WEIGHTS if theme.startswith(p)), default=0)
+    _theme_score_cache[theme] = score
+    return score
+
+
+def count_score(count_type, number):
+    '''Return the weight of a single count, growing with the order of magnitude of the count'''
+    weight = COUNT_WEIGHTS.get(count_type, 0)
+    if weight == 0 or number <= 0:
+        return 0
+    return weight * len(str(number))
+
+
+def score_gkg(gkg):
+    '''Score a GKG record using its themes and counts
+    :params gkg: instance of Gkg
+    :return: tuple (score, number of themes)
+    '''
+    themes = set(parse_themes(gkg.v2_themes))
+    score = sum(theme_score(t) for t in themes)
+    score += sum(count_score(c, n) for c, n, _ in parse_counts(gkg.v2_counts))
+    return score, len(themes)
+
+
+def triage(gkg):
+    '''Decide whether a GKG record should be scraped, and with what priority
+    :params gkg: instance of Gkg
+    :return: tuple (status, priority) for the new Analysis
+    '''
+    score, num_themes = score_gkg(gkg)
+    if score == 0 and num_themes >= MIN_THEMES_TO_SKIP:
+        return Status.SKIPPED, score
+    return Status.NEW, score
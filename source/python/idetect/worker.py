@@ -6,6 +6,8 @@ import signal
 import time
 from multiprocessing import Process
 
+from sqlalchemy.orm import object_session
+
 from idetect.model import Analysis, Session, Gkg, Status
 
 logger = logging.getLogger(__name__)
@@ -14,11 +16,12 @@ logger.setLevel(logging.INFO)
 
 class Worker:
     def __init__(self, filter_function, working_status, success_status, failure_status, function, engine,
-                 max_sleep=60, timeout_seconds=300):
+                 max_sleep=60, timeout_seconds=300, order_by=None):
         """
         Create a Worker that looks for Analyses with a given status. When it finds one, it marks it with
         working_status and runs a function. If the function returns without an exception, it advances the Analysis to
         success_status. If the function raises an exception, it advances the Analysis to failure_status.
+        Analyses are picked in order_by order, oldest updated first by default.
         """
         self.filter_function = filter_function
         self.working_status = working_status
@@ -29,6 +32,7 @@ class Worker:
         self.terminated = False
         self.max_sleep = max_sleep
         self.timeout_seconds = timeout_seconds
+        self.order_by = order_by if order_by is not None else (Analysis.updated,)
         signal.signal(signal.SIGINT, self.terminate)
         signal.signal(signal.SIGTERM, self.terminate)
         signal.signal(signal.SIGALRM, self.timeout)
@@ -52,11 +56,11 @@ class Worker:
             # Get an analysis
             # ... and lock it for updates
             # ... that meets the conditions specified in the filter function
-            # ... sort by updated date
-            # ... pick the first (oldest)
+            # ... sort by the worker's ordering (updated date by default)
+            # ... pick the first
             analysis = self.filter_function(session.query(Analysis)) \
                 .with_for_update() \
-                .order_by(Analysis.updated) \
+                .order_by(*self.order_by) \
                 .first()
             if analysis is None:
                 return False  # no work to be done
@@ -117,24 +121,130 @@ class Worker:
                 sleep = min(self.max_sleep, sleep * 2)
 
     @staticmethod
-    def start_processes(num, status, working_status, success_status, failure_status, function, engine, max_sleep=60):
+    def start_processes(num, status, working_status, success_status, failure_status, function, engine, max_sleep=60,
+                        order_by=None):
         processes = []
         engine.dispose()  # each Worker must have its own session, made in-Process
         for i in range(num):
-            worker = Worker(status, working_status, success_status, failure_status, function, engine, max_sleep)
+            worker = Worker(status, working_status, success_status, failure_status, function, engine, max_sleep,
+                            order_by=order_by)
             process = Process(target=worker.work_indefinitely, daemon=True)
             processes.append(process)
             process.start()
         return processes
 
 
+class BatchWorker(Worker):
+    def __init__(self, filter_function, working_status, success_status, failure_status, function, engine,
+                 max_sleep=60, timeout_seconds=300, order_by=None, batch_size=32):
+        """
+        Create a Worker that claims up to batch_size Analyses at a time and runs function on the whole list.
+        If the function raises an exception for the batch, each Analysis is retried on its own so that only
+        the ones that actually fail are advanced to failure_status.
+        """
+        super().__init__(filter_function, working_status, success_status, failure_status, function, engine,
+                         max_sleep=max_sleep, timeout_seconds=timeout_seconds, order_by=order_by)
+        self.batch_size = batch_size
+
+    def work(self):
+        """
+        Look for a batch of analyses in the given session and run function on them
+        if any are found, managing status appropriately. Return True iff some Analyses were processed (successfully or not)
+        """
+        # start a new session for each batch
+        session = Session()
+        try:
+            # Get up to batch_size analyses
+            # ... and lock them for updates
+            # ... that meet the conditions specified in the filter function
+            # ... sort by the worker's ordering
+            analyses = self.filter_function(session.query(Analysis)) \
+                .with_for_update() \
+                .order_by(*self.order_by) \
+                .limit(self.batch_size) \
+                .all()
+            if len(analyses) == 0:
+                return False  # no work to be done
+            analyses = Analysis.create_new_versions(analyses, self.working_status)
+            logger.info("Worker {} claimed {} Analyses".format(os.getpid(), len(analyses)))
+        finally:
+            # make sure to release a FOR UPDATE lock, if we got one
+            session.rollback()
+        if len(analyses) == 0:
+            session.close()
+            return True  # all claimed by another worker in the meantime
+
+        try:
+            # set a timeout so if this worker stalls, we recover
+            signal.alarm(self.timeout_seconds)
+            start = time.time()
+            try:
+                # actually run the work function on the whole batch
+                self.function(analyses)
+                failures = {}
+            except TimeoutError as e:
+                logger.warning("Worker {} timed out processing a batch of {} Analyses".format(
+                    os.getpid(), len(analyses)))
+                session.rollback()
+                failures = {a.gkg_id: str(e) for a in analyses}
+            except Exception as e:
+                logger.warning("Worker {} failed to process a batch of {} Analyses, retrying one at a time".format(
+                    os.getpid(), len(analyses)), exc_info=e)
+                session.rollback()
+                failures = self.work_singly(analyses)
+            delta = (time.time() - start) / len(analyses)
+            succeeded = [a for a in analyses if a.gkg_id not in failures]
+            failed = [a for a in analyses if a.gkg_id in failures]
+            for analysis in succeeded:
+                analysis.error_msg = None
+                analysis.processing_time = delta
+            for analysis in failed:
+                analysis.error_msg = failures[analysis.gkg_id]
+                analysis.processing_time = delta
+            Analysis.create_new_versions(succeeded, self.success_status)
+            Analysis.create_new_versions(failed, self.failure_status)
+            logger.info("Worker {} processed {} Analyses {} -> {}, {} -> {} {}s each".format(
+                os.getpid(), len(succeeded), self.working_status, self.success_status,
+                len(failed), self.failure_status, delta))
+        finally:
+            # clear the timeout
+            signal.alarm(0)
+            if session is not None:
+                session.rollback()
+                session.close()
+        return True
+
+    def work_singly(self, analyses):
+        """Run function on each analysis on its own. Return a dict of gkg_id to error message for the failures"""
+        failures = {}
+        for analysis in analyses:
+            # give each analysis its own timeout, so one stall cannot leave the rest without one
+            signal.alarm(self.timeout_seconds)
+            try:
+                self.function([analysis])
+            except Exception as e:
+                logger.warning("Worker {} failed to process Analysis {}".format(os.getpid(), analysis.gkg_id),
+                               exc_info=e)
+                object_session(analysis).rollback()
+                failures[analysis.gkg_id] = str(e)
+            finally:
+                signal.alarm(0)
+        return failures
+
+
 class Initiator(Worker):
-    def __init__(self, engine, max_sleep=60):
+    def __init__(self, engine, max_sleep=60, triage_function=None, locations_function=None):
         """
         Create a Worker that looks for Documents that have no Analysis. When if finds one, it creates
         an Analysis with Status.NEW
+        If a triage_function is given, it is called with each Gkg and returns the (status, priority)
+        for the new Analysis instead.
+        If a locations_function is given, it is called with the session and each batch of Gkgs
+        before their Analyses are created, e.g. to seed the geocoder.
         """
         self.engine = engine
+        self.triage_function = triage_function
+        self.locations_function = locations_function
         self.terminated = False
         self.max_sleep = max_sleep
         signal.signal(signal.SIGINT, self.terminate)
@@ -160,8 +270,13 @@ class Initiator(Worker):
                 .limit(1000).all()
             if len(gkgs) == 0:
                 return False  # no work to be done
-            for gkg in gkgs:
-                analysis = Analysis(gkg=gkg, status=Status.NEW)
+            # triage and seed before the first commit expires the Gkgs
+            triaged = [(Status.NEW, None) if self.triage_function is None else self.triage_function(gkg)
+                       for gkg in gkgs]
+            if self.locations_function is not None:
+                self.locations_function(session, gkgs)
+            for gkg, (status, priority) in zip(gkgs, triaged):
+                analysis = Analysis(gkg=gkg, status=status, priority=priority)
                 session.add(analysis)
                 session.commit()
                 logger.info("Worker {} created Analysis {} in status {}".format(
@@ -0,0 +1,47 @@
+"""
+Requeue for extraction the articles whose facts may change with new keywords,
+such as those added by db/add_eviction_keywords.sql.
+"""
+import argparse
+import logging
+import sys
+
+from sqlalchemy import create_engine
+
+from idetect.backfill import backfill, new_keywords, CHUNK_SIZE, MAX_QUEUE, POLL_SECONDS
+from idetect.model import db_url, Base, Session
+
+if __name__ == "__main__":
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.root.addHandler(handler)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--since-id', type=int,
+                        help='backfill the keywords with an id greater than this one')
+    parser.add_argument('--keywords', nargs='+',
+                        help='backfill the keywords with these descriptions')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='number of contents requeued per transaction')
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE,
+                        help='number of analyses waiting for extraction above which requeueing waits')
+    parser.add_argument('--poll-seconds', type=float, default=POLL_SECONDS)
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only count the matching contents')
+    args = parser.parse_args()
+    if args.since_id is None and not args.keywords:
+        parser.error('one of --since-id or --keywords is required')
+
+    engine = create_engine(db_url())
+    Session.configure(bind=engine)
+    Base.metadata.create_all(engine)
+    session = Session()
+    try:
+        keywords = new_keywords(session, args.since_id, args.keywords)
+        logger.info("Backfilling keywords {}".format([k.description for k in keywords]))
+        count = backfill(session, keywords, args.chunk_size, args.max_queue, args.poll_seconds, args.dry_run)
+        logger.info("{} {}".format(count, "contents match" if args.dry_run else "analyses requeued"))
+    finally:
+        session.close()
@@ -0,0 +1,52 @@
+"""
+Benchmark fact extraction, classification and geotagging lookups over a fixed corpus,
+comparing the results with the baseline saved by a previous run.
+Needs neither the database nor the network.
+"""
+import argparse
+import logging
+import sys
+
+from idetect.benchmark import STAGES, ARTICLES, SENTENCES_PER_ARTICLE, SEED, TOLERANCE, BASELINE_PATH, \
+    run_benchmark, load_baseline, save_baseline, compare, report, report_comparison
+
+if __name__ == "__main__":
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.root.addHandler(handler)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--articles', type=int, default=ARTICLES,
+                        help='number of articles in the corpus')
+    parser.add_argument('--sentences', type=int, default=SENTENCES_PER_ARTICLE,
+                        help='number of sentences per synthetic article')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='JSON file of the results to compare with')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='relative change reported as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.stages, args.articles, args.sentences, args.seed)
+    print(report(results))
+
+    regressed = False
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        logger.info("No baseline at {}".format(args.baseline))
+    elif baseline['corpus'] != results['corpus']:
+        logger.warning("Baseline at {} was run on a different corpus, not comparing".format(args.baseline))
+    else:
+        rows = compare(baseline, results, args.tolerance)
+        print(report_comparison(rows))
+        regressed = any(row[-1] for row in rows)
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        logger.info("Saved baseline to {}".format(args.baseline))
+    sys.exit(1 if regressed else 0)
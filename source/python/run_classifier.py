@@ -1,17 +1,29 @@
 import logging
+import os
 import sys
 
 from sqlalchemy import create_engine
+from sqlalchemy.orm import object_session
 import re
 import string
 import numpy as np
 import pandas as pd
-from idetect.classifier import classify
-from idetect.nlp_models.category import * 
-from idetect.nlp_models.relevance import * 
-from idetect.nlp_models.base_model import CustomSklLsiModel
+from idetect.classifier import classify_batch, evict_predictions
+from idetect.keyword_screen import get_keyword_screen
+from idetect.nlp_models.compiled import CompiledCategoryModel, CompiledRelevanceModel
+
+CATEGORY_PATH = '/home/idetect/python/idetect/nlp_models/category.npz'
+RELEVANCE_PATH = '/home/idetect/python/idetect/nlp_models/relevance_classifier_svm_10132017.npz'
+# Use the models compiled by export_models.py if there are any, which load without gensim or sklearn
+USE_COMPILED = os.path.isfile(CATEGORY_PATH) and os.path.isfile(RELEVANCE_PATH)
+if not USE_COMPILED:
+    from idetect.nlp_models.category import *
+    from idetect.nlp_models.relevance import *
+    from idetect.nlp_models.base_model import CustomSklLsiModel
 from idetect.model import db_url, Base, Session, Status, Analysis
-from idetect.worker import Worker
+from idetect.worker import BatchWorker
+
+BATCH_SIZE = 32
 
 if __name__ == "__main__":
     logger = logging.getLogger(__name__)
@@ -24,12 +36,29 @@ if __name__ == "__main__":
     Session.configure(bind=engine)
     Base.metadata.create_all(engine)
 
-    c_m = CategoryModel()
-    r_m = RelevanceModel()
+    session = Session()
+    logger.info("Evicted {} cached predictions".format(evict_predictions(session)))
+    get_keyword_screen(session)
+    session.close()
+
+    if USE_COMPILED:
+        logger.info("Using compiled models")
+        c_m = CompiledCategoryModel(CATEGORY_PATH)
+        r_m = CompiledRelevanceModel(RELEVANCE_PATH)
+    else:
+        c_m = CategoryModel()
+        r_m = RelevanceModel()
+
+    def classify_screened(analyses):
+        # The screen is rebuilt when the keywords change
+        classify_batch(analyses, c_m, r_m, get_keyword_screen(object_session(analyses[0])))
 
-    worker = Worker(lambda query: query.filter(Analysis.status == Status.SCRAPED), Status.CLASSIFYING,
-                    Status.CLASSIFIED, Status.CLASSIFYING_FAILED,
-                    lambda article: classify(article, c_m, r_m), engine)
+    worker = BatchWorker(lambda query: query.filter(Analysis.status == Status.SCRAPED), Status.CLASSIFYING,
+                         Status.CLASSIFIED, Status.CLASSIFYING_FAILED, classify_screened, engine,
+                         batch_size=BATCH_SIZE)
     logger.info("Starting worker...")
-    worker.work_indefinitely()
+    try:
+        worker.work_indefinitely()
+    finally:
+        get_keyword_screen(session).log_stats()
     logger.info("Worker stopped.")
@@ -1,12 +1,18 @@
 import logging
+import os
 import sys
 
 from sqlalchemy import create_engine
 
-from idetect.fact_extractor import extract_facts
+from idetect.fact_extractor import extract_facts_batch, doc_cache
 from idetect.load_data import load_countries, load_terms
+from idetect.location_cache import location_cache
 from idetect.model import db_url, Base, Session, Status, Analysis, Country, FactKeyword
-from idetect.worker import Worker
+from idetect.worker import BatchWorker
+
+BATCH_SIZE = 32
+# Threads spaCy's parser uses for each batch
+N_THREADS = int(os.environ.get('EXTRACTOR_THREADS', 2))
 
 if __name__ == "__main__":
     logger = logging.getLogger(__name__)
@@ -30,11 +36,19 @@ if __name__ == "__main__":
     keywords = session.query(FactKeyword).all()
     if len(keywords) == 0:
         load_terms(session)
+
+    # Cache the most referenced locations
+    location_cache.warm(session)
     session.close()
 
-    worker = Worker(lambda query: query.filter(Analysis.status == Status.CLASSIFIED),
-                    Status.EXTRACTING, Status.EXTRACTED, Status.EXTRACTING_FAILED,
-                    extract_facts, engine)
+    # Trim the store of parsed articles, if there is one
+    if doc_cache.store is not None:
+        doc_cache.store.evict()
+
+    worker = BatchWorker(lambda query: query.filter(Analysis.status == Status.CLASSIFIED),
+                         Status.EXTRACTING, Status.EXTRACTED, Status.EXTRACTING_FAILED,
+                         lambda analyses: extract_facts_batch(analyses, BATCH_SIZE, N_THREADS), engine,
+                         timeout_seconds=900, batch_size=BATCH_SIZE)
     logger.info("Starting worker...")
     worker.work_indefinitely()
     logger.info("Worker stopped.")
@@ -3,7 +3,9 @@ import sys
 
 from sqlalchemy import create_engine
 
+from idetect.geotagger import seed_gkg_locations
 from idetect.model import db_url, Base, Session
+from idetect.triage import triage
 from idetect.worker import Initiator
 
 if __name__ == "__main__":
@@ -17,7 +19,7 @@ if __name__ == "__main__":
     Session.configure(bind=engine)
     Base.metadata.create_all(engine)
 
-    worker = Initiator(engine)
+    worker = Initiator(engine, triage_function=triage, locations_function=seed_gkg_locations)
     logger.info("Starting worker...")
     worker.work_indefinitely()
     logger.info("Worker stopped.")
@@ -35,8 +35,9 @@ if __name__ == "__main__":
     Session.configure(bind=engine)
     Base.metadata.create_all(engine)
 
+    # Scrape the most promising analyses first, as scored by triage
     worker = Worker(scraping_filter, Status.SCRAPING, Status.SCRAPED, Status.SCRAPING_FAILED,
-                    scrape, engine)
+                    scrape, engine, order_by=(Analysis.priority.desc().nullslast(), Analysis.updated))
     logger.info("Starting worker...")
     worker.work_indefinitely()
     logger.info("Worker stopped.")